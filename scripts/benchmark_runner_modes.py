@@ -0,0 +1,40 @@
+"""
+比较 BacktestRunner 的 default 和 lean 运行模式：耗时、Python内存峰值，以及结果是否一致
+
+用法: python scripts/benchmark_runner_modes.py [数据文件] [回测次数]
+"""
+import sys
+import time
+import tracemalloc
+
+from maru_quant.strategy.trendtracking.breakout import PivotBreakout
+from maru_quant.utils.backtest_runner import BacktestRunner
+from maru_quant.utils.config_manager import config_manager
+from maru_quant.utils.dataloader import load_data
+
+def benchmark(runner, data_feed, runs):
+    params = [{'take_profit_atr': 3 + i} for i in range(runs)]
+    start = time.perf_counter()
+    results = runner.run_batch(PivotBreakout, data_feed, params)
+    elapsed = time.perf_counter() - start
+
+    # 内存峰值单独测一次，tracemalloc会拖慢运行
+    tracemalloc.start()
+    runner.run(PivotBreakout, data_feed, params[0])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed / runs, peak / 2**20, results
+
+if __name__ == '__main__':
+    data_file = sys.argv[1] if len(sys.argv) > 1 else config_manager.data_file
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    config_manager.logger_config['log_level'] = 'WARNING'
+    data_feed = load_data(data_file)
+    print(f"{data_file}: {len(data_feed.arrays['close'])} bars, {runs} runs")
+
+    baseline = None
+    for mode in BacktestRunner.MODES:
+        runner = BacktestRunner(**config_manager.get_backtest_params(), use_cache=False, mode=mode)
+        per_run, peak, results = benchmark(runner, data_feed, runs)
+        baseline = baseline or results
+        print(f"{mode:>8}: {per_run:6.2f} s/run, peak {peak:6.1f} MiB, results identical: {results == baseline}")
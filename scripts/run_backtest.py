@@ -2,6 +2,7 @@ from maru_quant.strategy.trendtracking.breakout import PivotBreakout, MultiPivot
 from maru_quant.utils.dataloader import load_data
 from maru_quant.utils.fileoperator import extract_dates_from_filename
 from maru_quant.utils.optimizer import GridSearchOptimizer
+from maru_quant.utils.param_grid import ParamGrid
 from maru_quant.utils.walkforward import WalkForwardAnalyzer
 from maru_quant.utils.logger import setup_logger
 from maru_quant.utils.backtest_runner import BacktestRunner
@@ -63,16 +64,17 @@ def run_optimization():
         **config_manager.get_backtest_params()
     )
     
-    # 定义参数网格
-    param_grid = {
+    # 定义参数网格（参数名按策略声明校验，止盈过小的组合不回测）
+    param_grid = ParamGrid({
         'window': [16],  # 滑动窗口大小
-        'threshold': [0],  # 区间阈值
         'max_hold_bars': [24],  # 最大持仓时间
         'take_profit_atr': [2.0, 4.0, 6.0, 8.0, 10.0],  # 止盈ATR倍数
         'stop_loss_atr': [1.5, 3.0, 5, 7, 10],  # 止损ATR倍数
         'atr_period': [10, 14, 20],  # ATR周期
         'sma_period': [10, 20, 30],  # 均线周期
-    }
+    }, strategy_class=PivotBreakout, constraints=[
+        'take_profit_atr >= 0.5 * stop_loss_atr',
+    ])
     
     # 执行优化
     results_df = optimizer.optimize(param_grid)
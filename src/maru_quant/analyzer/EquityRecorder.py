@@ -0,0 +1,46 @@
+import backtrader as bt
+import numpy as np
+
+from .WinLossRatioAnalyzer import TradeLedger
+
+class EquityRecorder(bt.Analyzer):
+    '''
+    记录每根bar的账户净值和每笔已平仓交易，供事后按时间窗口切片计算指标
+    净值数组按数据长度预分配，避免逐bar追加Python列表
+    '''
+
+    def start(self):
+        # preload模式下数据长度已知，直接预分配；否则按需扩容
+        size = max(self.data.buflen(), 1)
+        self._dt = np.empty(size, dtype=np.float64)
+        self._value = np.empty(size, dtype=np.float64)
+        self._len = 0
+        self._current_value = self.strategy.broker.getvalue()
+        self.start_value = self._current_value
+
+        self._trades = TradeLedger()
+
+    def notify_fund(self, cash, value, fundvalue, shares):
+        self._current_value = value
+
+    def notify_order(self, order):
+        self._trades.notify_order(order)
+
+    def notify_trade(self, trade):
+        self._trades.notify_trade(trade)
+
+    def next(self):
+        if self._len == len(self._value):
+            self._dt = np.resize(self._dt, self._len * 2)
+            self._value = np.resize(self._value, self._len * 2)
+        self._dt[self._len] = self.strategy.datetime[0]
+        self._value[self._len] = self._current_value
+        self._len += 1
+
+    def get_analysis(self):
+        return {
+            'start_value': self.start_value,
+            'datetime': self._dt[:self._len],  # backtrader数值日期（UTC）
+            'value': self._value[:self._len],
+            'trades': self._trades.to_records(),  # TRADE_DTYPE结构化数组
+        }
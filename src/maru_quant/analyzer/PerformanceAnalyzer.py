@@ -0,0 +1,159 @@
+import math
+import backtrader as bt
+import numpy as np
+
+from .equity_metrics import robust_ratio
+from .quantile_sketch import MedianMAD
+
+class PeriodReturns:
+    """
+    逐bar净值按 compression 分钟划分收益周期，口径同 TimeReturn(timeframe=Minutes)
+
+    数值日期换算为分钟再分桶，与TimeReturn按日内边界划分周期一致，但不需要逐bar构造datetime
+    """
+
+    def __init__(self, start_value, compression=30):
+        self.compression = compression
+        self._period = None
+        self._value_start = self._last_value = start_value
+        self._period_return = None
+
+    def update(self, dtnum, value):
+        """
+        记录一根bar的净值
+
+        Returns:
+            进入新周期时返回上一个周期的收益率，否则返回None
+        """
+        completed = None
+        period = math.floor(dtnum * 1440 + 1e-4) // self.compression
+        if period != self._period:
+            completed = self._period_return
+            self._period = period
+            self._value_start = self._last_value
+        self._period_return = value / self._value_start - 1.0
+        self._last_value = value
+        return completed
+
+    def flush(self):
+        """结束时返回最后一个（可能不完整的）周期的收益率"""
+        completed, self._period_return = self._period_return, None
+        return completed
+
+class PerformanceAnalyzer(bt.Analyzer):
+    '''
+    单遍计算回测结果所需的全部指标，替代 SharpeRatio_30min + DrawDown + WinLossRatioAnalyzer
+
+    每根bar只做常数次运算：
+      - 夏普率：按 compression 分钟划分收益周期（口径同 TimeReturn），周期结束时
+        用Welford方法更新均值和二阶矩，不保存收益列表
+      - 稳健夏普率：周期收益写入 MedianMAD（口径同 RobustSharpe_30min），
+        收益数超过 robust_exact_limit 后转为t-digest估计
+      - 回撤：维护净值峰值和最大回撤（口径同 DrawDown）
+      - 胜负统计：累计笔数和盈亏总和（口径同 WinLossRatioAnalyzer）
+    逐bar净值写入按数据长度预分配的数组
+    '''
+    params = (
+        ('riskfreerate', 0.0),  # 无风险利率（黄金交易通常设为0）
+        ('factor', 252 * 23 * 2),  # 30分钟年化因子：252个交易日 * 23小时 * 2个30分钟
+        ('annualize', True),  # 是否年化
+        ('stddev_sample', False),  # 贝塞尔校正
+        ('compression', 30),  # 收益周期（分钟）
+        ('robust_mode', 'auto'),  # 稳健夏普率的计算模式，见 MedianMAD
+        ('robust_exact_limit', 100000),  # auto模式下精确计算的收益数上限
+    )
+
+    def start(self):
+        size = max(self.data.buflen(), 1)
+        self._value = np.empty(size, dtype=np.float64)
+        self._len = 0
+        self._current_value = self.strategy.broker.getvalue()
+
+        self._returns = PeriodReturns(self._current_value, self.p.compression)
+        # Welford累计量
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._robust = MedianMAD(self.p.robust_mode, self.p.robust_exact_limit)
+
+        # 回撤
+        self._peak = float('-inf')
+        self._max_drawdown = 0.0
+        self._max_moneydown = 0.0
+
+        # 胜负统计
+        self._trades = 0
+        self._wins = 0
+        self._win_total = 0
+        self._loss_total = 0
+
+    def notify_fund(self, cash, value, fundvalue, shares):
+        self._current_value = value
+        self._peak = max(self._peak, value)
+
+    def notify_trade(self, trade):
+        if trade.isclosed:
+            self._trades += 1
+            # 与 WinLossRatioAnalyzer 相同，按扣除佣金后的净盈亏统计
+            if trade.pnlcomm > 0:
+                self._wins += 1
+                self._win_total += trade.pnlcomm
+            else:
+                self._loss_total += trade.pnlcomm
+
+    def _push_return(self, ret):
+        self._count += 1
+        delta = ret - self._mean
+        self._mean += delta / self._count
+        self._m2 += delta * (ret - self._mean)
+        self._robust.add(ret - self.p.riskfreerate)
+
+    def next(self):
+        value = self._current_value
+        completed = self._returns.update(self.strategy.datetime[0], value)
+        if completed is not None:
+            self._push_return(completed)
+
+        moneydown = self._peak - value
+        self._max_moneydown = max(self._max_moneydown, moneydown)
+        self._max_drawdown = max(self._max_drawdown, 100.0 * moneydown / self._peak)
+
+        if self._len == len(self._value):
+            self._value = np.resize(self._value, self._len * 2)
+        self._value[self._len] = value
+        self._len += 1
+
+    def stop(self):
+        completed = self._returns.flush()
+        if completed is not None:
+            self._push_return(completed)
+
+    def _sharpe_ratio(self):
+        if self._count - self.p.stddev_sample <= 0:
+            return None
+        retdev = math.sqrt(self._m2 / (self._count - self.p.stddev_sample))
+        if retdev == 0:
+            return None
+        ratio = (self._mean - self.p.riskfreerate) / retdev
+        if self.p.factor is not None and self.p.annualize:
+            ratio = math.sqrt(self.p.factor) * ratio
+        return ratio
+
+    def get_analysis(self):
+        losses = self._trades - self._wins
+        avg_win = self._win_total / self._wins if self._wins else 0
+        avg_loss = self._loss_total / losses if losses else 0
+        return {
+            'sharperatio': self._sharpe_ratio(),
+            'robust_sharpe': robust_ratio(*self._robust.median_mad(), self.p.factor, self.p.annualize),
+            'max_drawdown': self._max_drawdown,
+            'max_moneydown': self._max_moneydown,
+            'total_trades': self._trades,
+            'win_rate': (self._wins / self._trades) * 100 if self._trades else 0,
+            'wins': self._wins,
+            'losses': losses,
+            'avg_win': avg_win,
+            'avg_loss': avg_loss,
+            'P/L_ratio': abs(avg_win / avg_loss) if avg_loss != 0 else float('inf'),
+            'value': self._value[:self._len],
+        }
@@ -1,37 +1,113 @@
 import backtrader as bt
+import numpy as np
+import pandas as pd
+
+# 已平仓交易的记录格式，bar下标从0开始，与数据数组对齐
+TRADE_DTYPE = np.dtype([
+    ('ref', np.int64),            # backtrader交易编号
+    ('entry_bar', np.int64),      # 开仓bar下标
+    ('exit_bar', np.int64),       # 平仓bar下标
+    ('dtopen', np.float64),       # 开仓时间（backtrader数值日期）
+    ('dtclose', np.float64),      # 平仓时间
+    ('entry_price', np.float64),  # 开仓均价
+    ('exit_price', np.float64),   # 平仓均价
+    ('size', np.float64),         # 持仓数量峰值，空单为负
+    ('pnl', np.float64),          # 毛盈亏
+    ('pnlcomm', np.float64),      # 扣除佣金后的净盈亏
+    ('bars_held', np.int64),      # 持仓bar数
+])
+
+class TradeLedger:
+    '''
+    已平仓交易的定长记录表，按 TRADE_DTYPE 预分配，容量不足时倍增
+
+    to_records() 返回底层数组的视图，不复制数据
+    '''
+
+    def __init__(self, capacity=64):
+        self._data = np.empty(max(capacity, 1), dtype=TRADE_DTYPE)
+        self._len = 0
+        self._peak_size = {}  # 未平仓交易的持仓峰值，按交易编号
+        self._closing = {}  # 每个数据源上尚未归入交易的平仓成交：[数量, 成交额]
+
+    def __len__(self):
+        return self._len
+
+    def append(self, ref, entry_bar, exit_bar, dtopen, dtclose, entry_price, exit_price, size, pnl, pnlcomm):
+        """追加一笔已平仓交易"""
+        if self._len == len(self._data):
+            self._data = np.resize(self._data, self._len * 2)
+        self._data[self._len] = (ref, entry_bar, exit_bar, dtopen, dtclose, entry_price, exit_price,
+                                 size, pnl, pnlcomm, exit_bar - entry_bar)
+        self._len += 1
+
+    def notify_order(self, order):
+        """累计订单中平仓部分的成交，backtrader在交易通知之前发出订单通知"""
+        if order.status not in (order.Partial, order.Completed):
+            return
+        for bit in order.executed.iterpending():
+            if bit.closed:
+                closing = self._closing.setdefault(order.data, [0.0, 0.0])
+                closing[0] += abs(bit.closed)
+                closing[1] += abs(bit.closed) * bit.price
+
+    def notify_trade(self, trade):
+        """处理交易通知：未平仓时记录持仓峰值，平仓时写入一条记录"""
+        if not trade.isclosed:
+            peak = self._peak_size.get(trade.ref, 0)
+            if abs(trade.size) > abs(peak):
+                self._peak_size[trade.ref] = trade.size
+            return
+
+        size = self._peak_size.pop(trade.ref, 0)
+        closed, notional = self._closing.pop(trade.data, (0.0, 0.0))
+        exit_price = notional / closed if closed else float('nan')
+        self.append(trade.ref, trade.baropen - 1, trade.barclose - 1, trade.dtopen, trade.dtclose,
+                    trade.price, exit_price, size, trade.pnl, trade.pnlcomm)
+
+    def to_records(self):
+        """已平仓交易的结构化数组（视图）"""
+        return self._data[:self._len]
+
+    def to_dataframe(self):
+        """已平仓交易的DataFrame，每个字段一列"""
+        return pd.DataFrame(self.to_records())
 
 class WinLossRatioAnalyzer(bt.Analyzer):
+    '''
+    胜负统计（按扣除佣金后的净盈亏 pnlcomm），并把每笔已平仓交易写入 TradeLedger
+
+    get_analysis() 返回汇总指标；逐笔明细通过 self.ledger.to_records() / to_dataframe() 导出
+    '''
+
     def __init__(self):
         self.wins = 0
         self.losses = 0
-        self.win_profits = []
-        self.loss_profits = []
-        self.win_profit_rates = []
-        self.loss_profit_rates = []
+        self.win_total = 0
+        self.loss_total = 0
         self.trades = 0
+        self.ledger = TradeLedger()
+
+    def notify_order(self, order):
+        self.ledger.notify_order(order)
 
     def notify_trade(self, trade):
+        self.ledger.notify_trade(trade)
         if trade.isclosed:
-            pnl = trade.pnl
-            # entry_price = trade.price
-            # profit_rate = (pnl / entry_price) * 100  # 利润率百分比算不对？
+            pnl = trade.pnlcomm  # 按扣除佣金后的净盈亏统计胜负
 
             self.trades += 1
             if pnl > 0:
                 self.wins += 1
-                self.win_profits.append(pnl)
-                # self.win_profit_rates.append(profit_rate)
+                self.win_total += pnl
             else:
                 self.losses += 1
-                self.loss_profits.append(pnl)
-                # self.loss_profit_rates.append(profit_rate)
+                self.loss_total += pnl
 
     def get_analysis(self):
         win_rate = (self.wins / self.trades) * 100 if self.trades else 0
-        avg_win = sum(self.win_profits) / len(self.win_profits) if self.win_profits else 0
-        avg_loss = sum(self.loss_profits) / len(self.loss_profits) if self.loss_profits else 0
-        # avg_win_rate = sum(self.win_profit_rates) / len(self.win_profit_rates) if self.win_profit_rates else 0
-        # avg_loss_rate = sum(self.loss_profit_rates) / len(self.loss_profit_rates) if self.loss_profit_rates else 0
+        avg_win = self.win_total / self.wins if self.wins else 0
+        avg_loss = self.loss_total / self.losses if self.losses else 0
         profit_loss_ratio = abs(avg_win / avg_loss) if avg_loss != 0 else float('inf')
         return {
             'total_trades': self.trades,
@@ -40,7 +116,5 @@ class WinLossRatioAnalyzer(bt.Analyzer):
             'losses': self.losses,
             'avg_win': avg_win,
             'avg_loss': avg_loss,
-            # 'avg_win_rate': avg_win_rate,
-            # 'avg_loss_rate': avg_loss_rate,
             'P/L_ratio': profit_loss_ratio
         }
@@ -1,2 +1,4 @@
 from .sharperatio_30min import *
-from .WinLossRatioAnalyzer import *
\ No newline at end of file
+from .WinLossRatioAnalyzer import *
+from .EquityRecorder import *
+from .PerformanceAnalyzer import *
\ No newline at end of file
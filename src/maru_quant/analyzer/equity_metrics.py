@@ -0,0 +1,329 @@
+"""
+基于净值曲线和交易记录的事后指标计算
+
+输入为 EquityRecorder 记录的数组，所有计算都是向量化的NumPy运算，
+口径与回测中使用的 SharpeRatio_30min / RobustSharpe_30min / DrawDown / WinLossRatioAnalyzer 一致。
+新增指标直接在这里加函数，不需要再写一个在事件循环里运行的Analyzer。
+"""
+import math
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+# 30分钟年化因子：252个交易日 * 23小时 * 2个30分钟
+FACTOR_30MIN = 252 * 23 * 2
+
+def annualization_factor(bar_minutes=30, trading_days=252, hours_per_day=23):
+    """每年的收益周期数，默认口径同 SharpeRatio_30min（252个交易日，每天交易23小时）"""
+    return trading_days * hours_per_day * 60 / bar_minutes
+
+def infer_bar_minutes(dt):
+    """由backtrader数值日期数组推断bar周期（分钟），取相邻bar间隔的中位数，跳过休市缺口"""
+    dt = np.asarray(dt, dtype=np.float64)
+    if len(dt) < 2:
+        return None
+    return float(np.round(np.median(np.diff(dt)) * 1440, 6))
+
+def returns_from_values(values, start_value):
+    """逐bar收益率，第一根bar相对start_value计算（与TimeReturn一致）"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return values
+    prev = np.empty_like(values)
+    prev[0] = start_value
+    prev[1:] = values[:-1]
+    return values / prev - 1.0
+
+def period_ends(dt, compression=30):
+    """按 compression 分钟划分周期（同 PerformanceAnalyzer 的 PeriodReturns），每个周期最后一根bar的下标"""
+    period = np.floor(np.asarray(dt, dtype=np.float64) * 1440 + 1e-4).astype(np.int64) // compression
+    return np.flatnonzero(np.append(period[1:] != period[:-1], True))
+
+def period_returns(dt, values, start_value, compression=30):
+    """
+    逐bar净值按 compression 分钟划分周期后的周期收益率，与 PerformanceAnalyzer 的 PeriodReturns 逐位相同
+
+    每个周期的收益率为周期最后一根bar的净值相对上一周期最后净值（第一个周期相对start_value）
+
+    Args:
+        dt: backtrader数值日期数组，与 values 等长
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return values
+    return returns_from_values(values[period_ends(dt, compression)], start_value)
+
+def moment_ratio(mean, std, factor=FACTOR_30MIN, annualize=True):
+    """由超额收益的均值和标准差计算夏普率，波动为0时返回None"""
+    if std == 0 or not np.isfinite(std):
+        return None
+    ratio = mean / std
+    if factor is not None and annualize:
+        ratio = math.sqrt(factor) * ratio
+    return float(ratio)
+
+def sharpe_ratio(returns, riskfreerate=0.0, factor=FACTOR_30MIN, annualize=True):
+    """夏普率（总体标准差），无收益数据或波动为0时返回None"""
+    returns = np.asarray(returns, dtype=np.float64)
+    if len(returns) == 0:
+        return None
+    ret_free = returns - riskfreerate
+    return moment_ratio(ret_free.mean(), ret_free.std(), factor, annualize)
+
+def robust_ratio(median, mad, factor=FACTOR_30MIN, annualize=True):
+    """由超额收益的中位数和MAD计算稳健夏普率，MAD为0时返回None"""
+    if median is None or mad is None or mad == 0 or not np.isfinite(mad):
+        return None
+    ratio = median / mad
+    if factor is not None and annualize:
+        ratio = math.sqrt(factor) * ratio
+    return float(ratio)
+
+def robust_sharpe_ratio(returns, riskfreerate=0.0, factor=FACTOR_30MIN, annualize=True):
+    """稳健夏普率：超额收益的中位数 / MAD（精确计算），无收益数据时返回None"""
+    returns = np.asarray(returns, dtype=np.float64)
+    if len(returns) == 0:
+        return None
+    ret_free = returns - riskfreerate
+    median = np.median(ret_free)
+    return robust_ratio(median, np.median(np.abs(ret_free - median)), factor, annualize)
+
+def sortino_ratio(returns, riskfreerate=0.0, factor=FACTOR_30MIN, annualize=True):
+    """索提诺比率：超额收益均值 / 下行偏差（负超额收益的均方根），没有下行波动时返回None"""
+    returns = np.asarray(returns, dtype=np.float64)
+    if len(returns) == 0:
+        return None
+    ret_free = returns - riskfreerate
+    downside = math.sqrt(np.mean(np.minimum(ret_free, 0.0) ** 2))
+    if downside == 0 or not np.isfinite(downside):
+        return None
+    ratio = ret_free.mean() / downside
+    if factor is not None and annualize:
+        ratio = math.sqrt(factor) * ratio
+    return float(ratio)
+
+def drawdown_series(values):
+    """逐bar回撤（百分比），峰值从序列第一个值开始计算"""
+    values = np.asarray(values, dtype=np.float64)
+    peak = np.maximum.accumulate(values)
+    return 100.0 * (peak - values) / peak
+
+def max_drawdown(values):
+    """最大回撤（百分比），峰值从序列第一个值开始计算"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return 0.0
+    return float(drawdown_series(values).max())
+
+def drawdown_duration(values):
+    """
+    回撤持续时间（bar数）
+
+    Returns:
+        {'max_duration': 最长的连续低于前高的bar数, 'current_duration': 序列结束时仍在回撤中的bar数}
+    """
+    values = np.asarray(values, dtype=np.float64)
+    underwater = values < np.maximum.accumulate(values)
+    # 每段连续回撤的起止位置
+    edges = np.diff(np.concatenate(([0], underwater.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    durations = ends - starts
+    return {
+        'max_duration': int(durations.max()) if len(durations) else 0,
+        'current_duration': int(durations[-1]) if len(durations) and ends[-1] == len(values) else 0,
+    }
+
+def annual_return(values, start_value, factor=FACTOR_30MIN):
+    """按bar数折算的年化复合收益率"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0 or start_value <= 0 or values[-1] <= 0:
+        return None
+    return float((values[-1] / start_value) ** (factor / len(values)) - 1.0)
+
+def calmar_ratio(values, start_value, factor=FACTOR_30MIN):
+    """卡玛比率：年化收益率 / 最大回撤（小数），没有回撤时返回None"""
+    annual = annual_return(values, start_value, factor)
+    mdd = max_drawdown(values) / 100.0
+    if annual is None or mdd == 0:
+        return None
+    return annual / mdd
+
+def rolling_sharpe(returns, window, riskfreerate=0.0, factor=FACTOR_30MIN, annualize=True):
+    """
+    滚动夏普率（总体标准差），前 window-1 个位置和波动为0的窗口为NaN
+
+    用累计和计算窗口均值和方差，整段O(n)
+    """
+    returns = np.asarray(returns, dtype=np.float64) - riskfreerate
+    out = np.full(len(returns), np.nan)
+    if window <= 0 or len(returns) < window:
+        return out
+    csum = np.concatenate(([0.0], np.cumsum(returns)))
+    csq = np.concatenate(([0.0], np.cumsum(returns ** 2)))
+    mean = (csum[window:] - csum[:-window]) / window
+    var = np.maximum((csq[window:] - csq[:-window]) / window - mean ** 2, 0.0)
+    std = np.sqrt(var)
+    # 累计和的舍入误差使零波动窗口的方差变成极小的正数，按均方的相对量级视为0
+    flat = var <= 1e-12 * np.maximum((csq[window:] - csq[:-window]) / window, np.finfo(np.float64).tiny)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(flat, np.nan, mean / std)
+    if factor is not None and annualize:
+        ratio = math.sqrt(factor) * ratio
+    out[window - 1:] = ratio
+    return out
+
+def rolling_return(values, window):
+    """滚动收益率：每根bar相对 window 根bar之前的净值，前 window 个位置为NaN"""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    if 0 < window < len(values):
+        out[window:] = values[window:] / values[:-window] - 1.0
+    return out
+
+def trade_summary(trades, wins, win_sum, loss_sum):
+    """
+    由交易笔数、盈利笔数和盈利/亏损交易的净盈亏合计得到 trade_stats 的各字段
+
+    批量回测按组合分组求和后直接调用，不需要逐组合保留盈亏数组
+    """
+    trades, wins = int(trades), int(wins)
+    losses = trades - wins
+    avg_win = float(win_sum / wins) if wins else 0
+    avg_loss = float(loss_sum / losses) if losses else 0
+    return {
+        'total_trades': trades,
+        'win_rate': (wins / trades) * 100 if trades else 0,
+        'wins': wins,
+        'losses': losses,
+        'avg_win': avg_win,
+        'avg_loss': avg_loss,
+        'P/L_ratio': abs(avg_win / avg_loss) if avg_loss != 0 else float('inf'),
+    }
+
+def trade_stats(pnls):
+    """
+    胜率、平均盈亏和盈亏比，字段与 WinLossRatioAnalyzer 一致
+
+    Args:
+        pnls: 逐笔扣除佣金后的净盈亏（TradeLedger 的 'pnlcomm'），与 ledger_stats 口径相同
+    """
+    pnls = np.asarray(pnls, dtype=np.float64)
+    win_mask = pnls > 0
+    return trade_summary(len(pnls), win_mask.sum(), pnls[win_mask].sum(), pnls[~win_mask].sum())
+
+def _longest_run(mask):
+    """布尔数组中最长的连续True长度"""
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    runs = np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+    return int(runs.max()) if len(runs) else 0
+
+def ledger_stats(trades):
+    """
+    TradeLedger 记录的逐笔统计
+
+    Args:
+        trades: TRADE_DTYPE结构化数组（EquityRecorder 的 'trades' 或 TradeLedger.to_records()）
+    """
+    pnl = np.asarray(trades['pnlcomm'], dtype=np.float64)
+    gross_win = float(pnl[pnl > 0].sum())
+    gross_loss = float(-pnl[pnl <= 0].sum())
+    return {
+        'expectancy': float(pnl.mean()) if len(pnl) else 0.0,
+        'profit_factor': gross_win / gross_loss if gross_loss else float('inf'),
+        'max_consecutive_wins': _longest_run(pnl > 0),
+        'max_consecutive_losses': _longest_run(pnl <= 0),
+        'avg_bars_held': float(trades['bars_held'].mean()) if len(pnl) else 0.0,
+    }
+
+def equity_report(recording, factor=None, rolling_window=None):
+    """
+    由 EquityRecorder 的记录一次计算全部事后指标
+
+    Args:
+        recording: EquityRecorder.get_analysis() 的结果
+        factor: 年化因子，默认按记录的bar周期推断
+        rolling_window: 滚动指标的窗口（bar数），为None时不计算
+
+    Returns:
+        指标字典；给出 rolling_window 时包含 'rolling_sharpe' 和 'rolling_return' 数组
+    """
+    values = recording['value']
+    start_value = recording['start_value']
+    if factor is None:
+        bar_minutes = infer_bar_minutes(recording['datetime'])
+        factor = annualization_factor(bar_minutes) if bar_minutes else FACTOR_30MIN
+    returns = returns_from_values(values, start_value)
+    final_value = float(values[-1]) if len(values) else float(start_value)
+
+    report = {
+        'factor': factor,
+        'total_return': (final_value - start_value) / start_value,
+        'annual_return': annual_return(values, start_value, factor),
+        'sharpe_ratio': sharpe_ratio(returns, factor=factor),
+        'robust_sharpe': robust_sharpe_ratio(returns, factor=factor),
+        'sortino_ratio': sortino_ratio(returns, factor=factor),
+        'calmar_ratio': calmar_ratio(values, start_value, factor),
+        'max_drawdown': max_drawdown(values),
+        **drawdown_duration(values),
+        **trade_stats(recording['trades']['pnlcomm']),
+        **ledger_stats(recording['trades']),
+    }
+    if rolling_window:
+        report['rolling_sharpe'] = rolling_sharpe(returns, rolling_window, factor=factor)
+        report['rolling_return'] = rolling_return(values, rolling_window)
+    return report
+
+def _to_num(date):
+    """日期字符串/时间戳转为backtrader数值日期（UTC）"""
+    ts = pd.Timestamp(date)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert('UTC').tz_localize(None)
+    return bt.date2num(ts.to_pydatetime())
+
+def window_metrics(recording, start_date, end_date, factor=FACTOR_30MIN):
+    """
+    从整段回测的记录中切出一个时间窗口 [start_date, end_date] 计算指标
+
+    窗口边界的处理口径：
+      - 净值类指标（夏普、回撤、收益率）按逐bar盯市净值计算，窗口开始前已持有的
+        仓位，其在窗口内的浮动盈亏计入本窗口；窗口第一根bar的收益率相对窗口前
+        最后一根bar的净值计算
+      - 交易类指标（胜率、盈亏比等）只统计平仓时间落在窗口内的交易，跨越窗口
+        边界的交易完整地计入其平仓所在的窗口
+      - 指标的预热期使用窗口之前的数据，而不是像单独回测那样在窗口内重新预热
+
+    Args:
+        recording: EquityRecorder.get_analysis() 的结果
+        start_date: 窗口开始（包含）
+        end_date: 窗口结束（包含）
+
+    Returns:
+        与 BacktestRunner.run 相同字段的结果字典
+    """
+    dt = recording['datetime']
+    values = recording['value']
+    lo = int(np.searchsorted(dt, _to_num(start_date), side='left'))
+    hi = int(np.searchsorted(dt, _to_num(end_date), side='right'))
+
+    base = values[lo - 1] if lo > 0 else recording['start_value']
+    window_values = values[lo:hi]
+    final_value = float(window_values[-1]) if len(window_values) else float(base)
+
+    trades = recording['trades']
+    in_window = (trades['dtclose'] >= _to_num(start_date)) & (trades['dtclose'] <= _to_num(end_date))
+    stats = trade_stats(trades['pnlcomm'][in_window])
+
+    returns = returns_from_values(window_values, base)
+    return {
+        'sharpe_ratio': sharpe_ratio(returns, factor=factor),
+        'robust_sharpe': robust_sharpe_ratio(returns, factor=factor),
+        'max_drawdown': max_drawdown(window_values),
+        'total_return': (final_value - base) / base,
+        'total_trade': stats['total_trades'],
+        'win_rate': stats['win_rate'],
+        'avg_win': stats['avg_win'],
+        'avg_loss': stats['avg_loss'],
+        'P/L_ratio': stats['P/L_ratio'],
+        'final_value': final_value,
+    }
@@ -0,0 +1,168 @@
+"""
+有界内存的分位数估计
+
+TDigest 把样本压缩为按值排序的带权质心，用于在长回测中流式估计中位数和MAD。
+这里使用均匀的尺度函数（每个质心最多约占 2/compression 的样本），中位数附近的
+精度与尾部相同；秩误差约为 1/compression。
+"""
+import numpy as np
+
+class TDigest:
+    """
+    合并式t-digest：新样本先写入缓冲区，缓冲区满时与已有质心一起排序、分组合并
+
+    Args:
+        compression: 压缩参数，质心数不超过 compression / 2 + 1，分位数的秩误差约为 1/compression
+        buffer_size: 缓冲区大小，默认为 5 * compression
+    """
+
+    def __init__(self, compression=1000, buffer_size=None):
+        if compression <= 0:
+            raise ValueError(f"compression 必须为正数: {compression}")
+        self.compression = compression
+        self.count = 0
+        self.min = float('inf')
+        self.max = float('-inf')
+        self._means = np.empty(0, dtype=np.float64)
+        self._weights = np.empty(0, dtype=np.float64)
+        self._buffer = np.empty(buffer_size or int(5 * compression), dtype=np.float64)
+        self._buffered = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, x):
+        """加入一个样本"""
+        self._buffer[self._buffered] = x
+        self._buffered += 1
+        self.count += 1
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+        if self._buffered == len(self._buffer):
+            self._merge()
+
+    def extend(self, values):
+        """批量加入样本"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if len(values) == 0:
+            return
+        self._merge(values)
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def _merge(self, extra=None):
+        parts = [self._means, self._buffer[:self._buffered]]
+        weights = [self._weights, np.ones(self._buffered)]
+        if extra is not None:
+            parts.append(extra)
+            weights.append(np.ones(len(extra)))
+        means = np.concatenate(parts)
+        weights = np.concatenate(weights)
+        self._buffered = 0
+        if len(means) == 0:
+            return
+
+        order = np.argsort(means, kind='stable')
+        means = means[order]
+        weights = weights[order]
+        # 按质心中点的累计秩分组：k(q) = compression * q / 2，每组的k跨度不超过1
+        total = weights.sum()
+        q_mid = (np.cumsum(weights) - weights / 2) / total
+        groups = np.floor(q_mid * self.compression / 2).astype(np.int64)
+        groups = np.unique(groups, return_inverse=True)[1]
+
+        merged_weights = np.bincount(groups, weights=weights)
+        self._means = np.bincount(groups, weights=means * weights) / merged_weights
+        self._weights = merged_weights
+
+    def _centroids(self):
+        if self._buffered:
+            self._merge()
+        return self._means, self._weights
+
+    @staticmethod
+    def _interpolate(target, means, weights, lower, upper):
+        # 质心视为位于其累计权重中点的样本，两端用最小/最大值补齐后线性插值
+        positions = np.concatenate(([0.0], np.cumsum(weights) - weights / 2, [weights.sum()]))
+        values = np.concatenate(([lower], means, [upper]))
+        return float(np.interp(target, positions, values))
+
+    def quantile(self, q):
+        """估计第q分位数，无样本时返回NaN"""
+        means, weights = self._centroids()
+        if self.count == 0:
+            return float('nan')
+        return self._interpolate(q * self.count, means, weights, self.min, self.max)
+
+    def median_abs_deviation(self, center):
+        """估计 |x - center| 的中位数"""
+        means, weights = self._centroids()
+        if self.count == 0:
+            return float('nan')
+        deviations = np.abs(means - center)
+        order = np.argsort(deviations, kind='stable')
+        upper = max(abs(self.min - center), abs(self.max - center))
+        return self._interpolate(self.count / 2, deviations[order], weights[order], 0.0, upper)
+
+class MedianMAD:
+    """
+    中位数和MAD（绝对偏差的中位数）的累计估计
+
+    Args:
+        mode: 'exact' 保存全部样本，用NumPy精确计算；
+              'streaming' 使用t-digest，内存有界；
+              'auto' 样本数不超过 exact_limit 时精确计算，超过后转为t-digest
+        exact_limit: auto模式下精确计算的样本数上限
+        compression: t-digest的压缩参数，秩误差约为 1/compression
+    """
+
+    MODES = ('auto', 'exact', 'streaming')
+
+    def __init__(self, mode='auto', exact_limit=100000, compression=1000):
+        if mode not in self.MODES:
+            raise ValueError(f"不支持的模式: {mode}，可选 {self.MODES}")
+        self.mode = mode
+        self.exact_limit = exact_limit
+        self.compression = compression
+        self._count = 0
+        self._digest = TDigest(compression) if mode == 'streaming' else None
+        self._values = None if self._digest is not None else np.empty(1024, dtype=np.float64)
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def is_exact(self):
+        """当前结果是否为精确值"""
+        return self._digest is None
+
+    def add(self, x):
+        """加入一个样本"""
+        self._count += 1
+        if self._digest is not None:
+            self._digest.add(x)
+            return
+        if self._count > len(self._values):
+            self._values = np.resize(self._values, len(self._values) * 2)
+        self._values[self._count - 1] = x
+        if self.mode == 'auto' and self._count > self.exact_limit:
+            self._digest = TDigest(self.compression)
+            self._digest.extend(self._values[:self._count])
+            self._values = None
+
+    def median_mad(self):
+        """
+        Returns:
+            (中位数, MAD)，无样本时为 (None, None)
+        """
+        if self._count == 0:
+            return None, None
+        if self._digest is not None:
+            median = self._digest.quantile(0.5)
+            return median, self._digest.median_abs_deviation(median)
+        values = self._values[:self._count]
+        median = np.median(values)
+        return median, np.median(np.abs(values - median))
@@ -1,68 +1,58 @@
 import backtrader as bt
-import numpy as np
-import math
-from backtrader import TimeFrame
-from backtrader.analyzers import TimeReturn
-from backtrader.mathsupport import average, standarddev
-from backtrader.utils.py3 import itervalues
+
+from .equity_metrics import robust_ratio
+from .PerformanceAnalyzer import PeriodReturns
+from .quantile_sketch import MedianMAD
 
 class RobustSharpe_30min(bt.Analyzer):
+    '''
+    稳健夏普率：30分钟超额收益的中位数 / MAD
+
+    mode 为 'exact' 时保存全部收益精确计算；'streaming' 时用t-digest估计，内存有界，
+    秩误差约为 1/compression；'auto' 在收益数超过 exact_limit 后转为流式估计
+    '''
     params = (
         ('riskfreerate', 0.0),  # 无风险利率（黄金交易通常设为0）
         ('factor', 252 * 23 * 2),  # 30分钟年化因子：252个交易日 * 23小时 * 2个30分钟
         ('annualize', True),  # 是否年化
         ('stddev_sample', False),  # 贝塞尔校正
+        ('mode', 'auto'),  # 计算模式：auto / exact / streaming
+        ('exact_limit', 100000),  # auto模式下精确计算的收益数上限
+        ('compression', 1000),  # t-digest压缩参数
     )
-    
-    def __init__(self):
-        # 使用30分钟时间框架的TimeReturn分析器
-        self.timereturn = TimeReturn(
-            timeframe=TimeFrame.Minutes,
-            compression=30,
-            fund=None
-        )
-        
+
     def start(self):
         # 初始化结果字典
         self.rets = {}
-        
+        # 按30分钟周期计算收益，口径同 TimeReturn(timeframe=Minutes, compression=30)
+        self._current_value = self.strategy.broker.getvalue()
+        self._returns = PeriodReturns(self._current_value, 30)
+        self._estimator = MedianMAD(self.p.mode, self.p.exact_limit, self.p.compression)
+
+    def notify_fund(self, cash, value, fundvalue, shares):
+        self._current_value = value
+
+    def _push_return(self, ret):
+        if ret is not None:
+            self._estimator.add(ret - self.p.riskfreerate)
+
+    def next(self):
+        self._push_return(self._returns.update(self.strategy.datetime[0], self._current_value))
+
     def stop(self):
         super(RobustSharpe_30min, self).stop()
-        
-        # 从TimeReturn分析器获取收益率
-        returns = list(itervalues(self.timereturn.get_analysis()))
-        
-        rate = self.p.riskfreerate
-        factor = self.p.factor
-        
+        self._push_return(self._returns.flush())
+
         # 检查是否有足够的数据计算
-        lrets = len(returns) - self.p.stddev_sample
-        
-        if lrets <= 0:
-            # 没有足够的收益数据
+        if len(self._estimator) - self.p.stddev_sample <= 0:
             ratio = None
         else:
-            try:
-                # 计算超额收益
-                ret_free = [r - rate for r in returns]
-                ret_free_median = np.median(ret_free)
-                mad = np.median([abs(r - ret_free_median) for r in ret_free])
+            median, mad = self._estimator.median_mad()
+            ratio = robust_ratio(median, mad, self.p.factor, self.p.annualize)
 
-                if mad == 0:
-                    ratio = None
-                else:
-                    ratio = ret_free_median / mad
-                    
-                    # 如果需要年化
-                    if factor is not None and self.p.annualize:
-                        ratio = math.sqrt(factor) * ratio
-                        
-            except (ValueError, TypeError, ZeroDivisionError):
-                ratio = None
-        
         self.ratio = ratio
         self.rets['sharperatio'] = self.ratio
-        
+
     def get_analysis(self):
         """返回夏普率分析结果"""
-        return self.rets
\ No newline at end of file
+        return self.rets
@@ -1,4 +1,7 @@
+import array
+
 import backtrader as bt
+import numpy as np
 
 # 蜡烛强度指标
 class CandleStrengthIndex(bt.Indicator):
@@ -29,4 +32,25 @@ class CandleStrengthIndex(bt.Indicator):
             self.p.gamma * shadow
         )
         strength = max(min(strength, 1), -1)
-        self.lines.csi[0] = strength
\ No newline at end of file
+        self.lines.csi[0] = strength
+
+    def once(self, start, end):
+        # runonce模式整段计算，运算顺序与 next() 相同，结果逐位一致
+        open_, high_, low_, close_ = (
+            np.frombuffer(line.array, dtype=np.float64)[start:end]
+            for line in (self.data.open, self.data.high, self.data.low, self.data.close)
+        )
+        bar_range = high_ - low_
+        with np.errstate(divide='ignore', invalid='ignore'):
+            entity = (close_ - open_) / bar_range
+            close_pos = (2 * (close_ - low_) / bar_range) - 1
+            shadow = 1 - (np.abs(high_ - close_) + np.abs(open_ - low_)) / bar_range
+        strength = (
+            self.p.alpha * entity +
+            self.p.beta * close_pos +
+            self.p.gamma * shadow
+        )
+        strength = np.clip(strength, -1, 1)
+        # 最高价等于最低价时强度为0
+        strength[high_ == low_] = 0
+        self.lines.csi.array[start:end] = array.array('d', strength.tobytes())
@@ -1,10 +1,20 @@
+import array
+from collections import deque
+
 import backtrader as bt
+import numpy as np
+
+from maru_quant.indicator.vectorized import pivot_high_levels
 
 class PivotHigh(bt.Indicator):
     '''
     检测局部极大值(Pivot High), 延迟N bar输出。
     维护最近的pivot high队列
+
+    逐bar模式用单调队列判断中心bar是否为窗口内唯一最大值，pivot存入固定大小的环形缓冲，
+    每根bar均摊O(1)；runonce模式由 once() 整段计算，两种模式输出逐位相同
     '''
+    MAX_LINES = 10
     # 固定创建最大可能的lines数量
     lines = ('resist0', 'resist1', 'resist2', 'resist3', 'resist4', 'resist5', 'resist6', 'resist7', 'resist8', 'resist9')
     params = (('window', 16), ('max_resists', 5))
@@ -26,42 +36,46 @@ class PivotHigh(bt.Indicator):
         self.addminperiod(self.p.window * 2 + 1)
         self.plotinfo.plot = True
         self.plotinfo.subplot = False
-        self.pivot_queue = []  # 简单队列，存储(价格, bar_index)
+        self.depth = min(self.p.max_resists, self.MAX_LINES)  # 实际输出的阻力线数量
+        self._resist_lines = [getattr(self.lines, f'resist{i}') for i in range(self.depth)]
+
+        # 最近 2*window+1 根bar的单调队列 (bar序号, 收盘价)，价格非递增，相等的保留先出现的
+        self._window = deque()
+        # 最近 max_resists 个pivot的环形缓冲，_count 为累计确认的pivot数量
+        self._ring = [float('nan')] * max(self.p.max_resists, 1)
+        self._count = 0
+
+    def _push(self):
+        """当前bar的收盘价入队，并移出窗口之外的bar"""
+        bar = len(self) - 1
+        close = self.data.close[0]
+        window = self._window
+        while window and window[-1][1] < close:
+            window.pop()
+        window.append((bar, close))
+        while window[0][0] < bar - 2 * self.p.window:
+            window.popleft()
+        return bar
+
+    def prenext(self):
+        self._push()
 
     def next(self):
-        n = self.p.window
-        center_idx = -n
-        center_close = self.data.close[center_idx]
-        is_pivot = True
-        
-        # 检查左侧N根
-        for i in range(1, n+1):
-            if center_close <= self.data.close[center_idx - i]:
-                is_pivot = False
-                break
-        # 检查右侧N根
-        if is_pivot:
-            for i in range(1, n+1):
-                if center_close <= self.data.close[center_idx + i]:
-                    is_pivot = False
-                    break
-        
-        # 如果是新的pivot high，更新队列
-        if is_pivot:
-            current_bar = len(self)
-            # 将新pivot添加到队列末尾
-            self.pivot_queue.append((center_close, current_bar))
-            # 限制队列大小
-            if len(self.pivot_queue) > self.p.max_resists:
-                self.pivot_queue.pop(0)  # 移除最旧的pivot
-        
-        # 输出当前队列中的pivot高点，只使用max_resists数量的lines
-        for i in range(min(self.p.max_resists, 10)):  # 限制在最大10个
-            if i < len(self.pivot_queue):
-                getattr(self.lines, f'resist{i}')[0] = self.pivot_queue[-(i+1)][0]  # 倒序输出，最新的在resist0
-            else:
-                getattr(self.lines, f'resist{i}')[0] = float('nan')
-        
-        # 将未使用的lines设为NaN
-        for i in range(self.p.max_resists, 10):
-            getattr(self.lines, f'resist{i}')[0] = float('nan')
\ No newline at end of file
+        bar = self._push()
+        window = self._window
+
+        # 中心bar是窗口内最早出现的最大值，且右侧没有相等的价格，即严格大于左右各N根
+        center_bar, center_close = window[0]
+        if center_bar == bar - self.p.window and (len(window) == 1 or window[1][1] < center_close):
+            self._ring[self._count % len(self._ring)] = center_close
+            self._count += 1
+
+        # 倒序输出，最新的在resist0；没有pivot的线保持默认的NaN
+        for i in range(min(self._count, self.depth)):
+            self._resist_lines[i][0] = self._ring[(self._count - 1 - i) % len(self._ring)]
+
+    def once(self, start, end):
+        close = np.frombuffer(self.data.close.array, dtype=np.float64)[:end]
+        levels = pivot_high_levels(close, self.p.window, self.depth)
+        for i, line in enumerate(self._resist_lines):
+            line.array[start:end] = array.array('d', levels[i, start:end].tobytes())
@@ -0,0 +1,176 @@
+"""
+指标结果的进程内共享缓存
+
+优化器的各组参数在同一段数据上反复创建相同的指标（如相同周期的ATR、EMA）。
+这里按 (数据指纹, 指标类, 参数) 缓存NumPy整段计算的结果，按占用字节数做LRU淘汰；
+命中时用 PrecomputedLines 直接输出缓存的数组，不再逐bar计算。
+输出与原指标在 runonce 和逐bar模式下逐位相同，预热期同样为NaN。
+"""
+import array
+import contextlib
+from collections import OrderedDict
+
+import backtrader as bt
+import numpy as np
+
+from maru_quant.indicator.PivotHigh import PivotHigh
+from maru_quant.indicator.vectorized import feed_ohlc, atr, ema, pivot_high_levels
+from maru_quant.utils.config_manager import config_manager
+from maru_quant.utils.dataloader import feed_fingerprint
+
+class IndicatorCache:
+    """
+    按占用字节数做LRU淘汰的指标数组缓存
+
+    Args:
+        max_bytes: 缓存数组的总字节数上限，超过时淘汰最久未使用的条目
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get_or_compute(self, key, compute):
+        """
+        返回 key 对应的数组，未命中时调用 compute() 计算并写入缓存
+
+        返回的数组只读，多个指标实例共享同一份数据
+        """
+        values = self._entries.get(key)
+        if values is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return values
+        self.misses += 1
+        values = np.asarray(compute(), dtype=np.float64)
+        values.setflags(write=False)
+        self.put(key, values)
+        return values
+
+    def put(self, key, values):
+        """写入一个数组；单个数组超过上限时不缓存"""
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.nbytes -= old.nbytes
+        if values.nbytes > self.max_bytes:
+            return
+        self._entries[key] = values
+        self.nbytes += values.nbytes
+        while self.nbytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+
+_cache = None
+
+def get_indicator_cache():
+    """获取（必要时创建）进程内的默认指标缓存，容量为 cache_config.indicator_cache_max_mb"""
+    global _cache
+    if _cache is None:
+        _cache = IndicatorCache(int(config_manager.indicator_cache_max_mb * 1024 * 1024))
+    return _cache
+
+class PrecomputedLines(bt.Indicator):
+    '''
+    输出预先算好的数组：第i条line取 values[i]
+
+    addminperiod 与原指标一致，预热期内不调用 next()，line保持默认的NaN
+    '''
+    params = (('values', None), ('period', 1))
+
+    def __init__(self):
+        self.addminperiod(self.p.period)
+
+    def next(self):
+        bar = len(self) - 1
+        for line, values in zip(self.lines, self.p.values):
+            line[0] = values[bar]
+
+    def once(self, start, end):
+        for line, values in zip(self.lines, self.p.values):
+            line.array[start:end] = array.array('d', values[start:end].tobytes())
+
+def _atr_lines(ohlc, period, movav):
+    return atr(ohlc['high'], ohlc['low'], ohlc['close'], period)[np.newaxis]
+
+def _ema_lines(ohlc, period):
+    return ema(ohlc['close'], period)[np.newaxis]
+
+def _pivot_high_lines(ohlc, window, max_resists):
+    # 只有前 depth 条线有输出，其余保持NaN
+    depth = min(max_resists, PivotHigh.MAX_LINES)
+    lines = np.full((PivotHigh.MAX_LINES, len(ohlc['close'])), np.nan)
+    lines[:depth] = pivot_high_levels(ohlc['close'], window, depth)
+    return lines
+
+# 指标类 -> (整段计算函数, 最小周期, 能否整段计算)
+_ATR = (_atr_lines, lambda period, movav: period + 1,
+        lambda period, movav: movav is bt.indicators.SmoothedMovingAverage)
+_EMA = (_ema_lines, lambda period: period, lambda period: True)
+_REGISTRY = {
+    bt.indicators.AverageTrueRange: _ATR,
+    bt.indicators.ATR: _ATR,
+    bt.indicators.ExponentialMovingAverage: _EMA,
+    bt.indicators.EMA: _EMA,
+    PivotHigh: (_pivot_high_lines, lambda window, max_resists: 2 * window + 1, lambda window, max_resists: True),
+}
+
+_line_classes = {}
+
+def _precomputed_class(indicator_class):
+    """与原指标同名lines的 PrecomputedLines 子类，策略按原来的line名访问"""
+    cls = _line_classes.get(indicator_class)
+    if cls is None:
+        cls = type(f'Cached{indicator_class.__name__}', (PrecomputedLines,),
+                   {'lines': indicator_class.lines._getlines(), '__module__': __name__})
+        _line_classes[indicator_class] = cls
+    return cls
+
+_enabled = False
+
+@contextlib.contextmanager
+def use_indicator_cache(enabled=True):
+    """在该上下文中创建的策略通过 cached_indicator 共享指标结果"""
+    global _enabled
+    previous, _enabled = _enabled, enabled
+    try:
+        yield
+    finally:
+        _enabled = previous
+
+def cached_indicator(indicator_class, data, **params):
+    """
+    创建指标：缓存启用且该指标可整段计算时返回 PrecomputedLines，否则创建原指标
+
+    Args:
+        indicator_class: 原指标类，需在 _REGISTRY 中登记
+        data: 数据源（指标作用于数据源的默认line，即收盘价）
+        params: 指标参数，未给出的取原指标的默认值
+    """
+    spec = _REGISTRY.get(indicator_class)
+    p = getattr(data, 'p', None)
+    if (not _enabled or spec is None or getattr(data, 'arrays', None) is None
+            or p.fromdate is not None or p.todate is not None):
+        return indicator_class(data, **params)
+
+    compute, minperiod, supported = spec
+    full = dict(indicator_class.params._getitems())
+    full.update(params)
+    if not supported(**full):
+        return indicator_class(data, **params)
+
+    key = (feed_fingerprint(data), f'{indicator_class.__module__}.{indicator_class.__name__}', tuple(sorted(full.items())))
+    values = get_indicator_cache().get_or_compute(key, lambda: compute(feed_ohlc(data), **full))
+    return _precomputed_class(indicator_class)(data, values=values, period=minperiod(**full))
@@ -0,0 +1,131 @@
+"""
+指标的NumPy整段计算
+
+输入为完整的价格数组，输出与数据等长的数组，预热期为NaN。
+计算口径与backtrader runonce模式下对应指标的 once() 逐元素一致，
+供向量化回测引擎直接生成信号。
+"""
+import math
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+def feed_ohlc(data_feed):
+    """ArrayData 数据源的 open/high/low/close 数组，直接引用数据源的数组，不复制"""
+    return {name: data_feed.arrays[name] for name in ('open', 'high', 'low', 'close')}
+
+def memoize(cache, key, compute):
+    """
+    在 cache 中按 key 保存 compute() 的结果，供同一段数据上的多组参数复用
+
+    Args:
+        cache: dict，为None时不缓存
+        key: 可哈希的键，包含指标名和参数
+        compute: 无参函数，缓存未命中时调用
+    """
+    if cache is None:
+        return compute()
+    if key not in cache:
+        cache[key] = compute()
+    return cache[key]
+
+def shift(values, periods=1):
+    """
+    向后平移 periods 根bar（对应backtrader的 line[-periods]），空出的位置为NaN
+
+    values 为二维时按行平移，periods 可以是每行一个的数组
+    """
+    values = np.asarray(values, dtype=np.float64)
+    rows = values.reshape(-1, values.shape[-1])
+    n = rows.shape[1]
+    out = np.full(rows.shape, np.nan)
+    periods = np.broadcast_to(periods, len(rows))
+    for k in np.unique(periods):
+        if k < n:
+            selected = periods == k
+            out[selected, k:] = rows[selected, :n - k]
+    return out.reshape(values.shape)
+
+def exp_smoothing(src, period, alpha, start=0):
+    """
+    指数平滑，与 bt.indicators.ExponentialSmoothing 一致
+
+    以 src[start:start+period] 的算术平均为种子，之后按
+    prev * (1 - alpha) + x * alpha 递推
+
+    Args:
+        src: 输入数组
+        period: 种子平均的周期
+        alpha: 平滑系数
+        start: 输入中第一个有效值的位置（如TrueRange从1开始）
+    """
+    src = np.asarray(src, dtype=np.float64)
+    out = np.full(len(src), np.nan)
+    seed = start + period - 1
+    if seed >= len(src):
+        return out
+
+    # 递推依赖上一个值，用Python浮点逐个计算，保证与backtrader逐位相同
+    values = src.tolist()
+    prev = math.fsum(values[start:seed + 1]) / period
+    result = [prev]
+    alpha1 = 1.0 - alpha
+    for x in values[seed + 1:]:
+        prev = prev * alpha1 + x * alpha
+        result.append(prev)
+    out[seed:] = result
+    return out
+
+def ema(close, period):
+    """指数移动平均，与 bt.indicators.ExponentialMovingAverage 一致"""
+    return exp_smoothing(close, period, 2.0 / (1.0 + period))
+
+def true_range(high, low, close):
+    """真实波幅，第一根bar没有前收盘价，为NaN"""
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    tr = np.full(len(close), np.nan)
+    tr[1:] = np.maximum(high[1:], close[:-1]) - np.minimum(low[1:], close[:-1])
+    return tr
+
+def atr(high, low, close, period):
+    """平均真实波幅（SMMA平滑），与 bt.indicators.ATR 一致"""
+    return exp_smoothing(true_range(high, low, close), period, 1.0 / period, start=1)
+
+def pivot_highs(close, window):
+    """
+    局部极大值的位置：close[c] 严格大于左右各 window 根收盘价
+
+    Returns:
+        按时间排序的中心bar下标数组，该pivot在 c + window 根bar时才能确认
+    """
+    close = np.asarray(close, dtype=np.float64)
+    n = window
+    if n == 0:
+        return np.arange(len(close))
+    if len(close) < 2 * n + 1:
+        return np.empty(0, dtype=np.int64)
+    windows = sliding_window_view(close, 2 * n + 1)
+    center = close[n:len(close) - n]
+    is_pivot = (center > windows[:, :n].max(axis=1)) & (center > windows[:, n + 1:].max(axis=1))
+    return np.flatnonzero(is_pivot) + n
+
+def pivot_high_levels(close, window, depth):
+    """
+    每根bar上已确认的最近 depth 个pivot high，与 PivotHigh 的 resist0..resistN 一致
+
+    Returns:
+        形状为 (depth, len(close)) 的数组，第k行为第k新的阻力位，不足时为NaN
+    """
+    close = np.asarray(close, dtype=np.float64)
+    centers = pivot_highs(close, window)
+    pivot_values = close[centers]
+    # 每根bar上已确认的pivot数量
+    count = np.searchsorted(centers + window, np.arange(len(close)), side='right')
+
+    levels = np.full((depth, len(close)), np.nan)
+    for k in range(depth):
+        idx = count - 1 - k
+        valid = idx >= 0
+        levels[k, valid] = pivot_values[idx[valid]]
+    return levels
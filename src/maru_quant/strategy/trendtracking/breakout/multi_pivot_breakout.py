@@ -1,8 +1,10 @@
 import backtrader as bt
+import numpy as np
 import pandas as pd
 import logging
 
 from maru_quant.strategy.trendtracking.breakout import PivotBreakout
+from maru_quant.indicator.vectorized import shift
 
 # Create a Stratey
 class MultiPivotBreakout(PivotBreakout):
@@ -34,3 +36,13 @@ class MultiPivotBreakout(PivotBreakout):
                     self.logger.info(f'[↑↑SIG↑↑]：均线突破多个阻力位 {resist_value:.2f}, 均线价格 {self.ema[0]:.2f}，执行买入')
                     return True
         return False
+
+    @classmethod
+    def vector_break_signal(cls, p, resists, ema_line, atr_line):
+        """break_signal 的向量化版本：同一根bar上突破至少两个阻力位"""
+        prev_ema = shift(ema_line, p.breakout_window)
+        cnt = np.zeros(ema_line.shape, dtype=np.int64)
+        with np.errstate(invalid='ignore'):
+            for i in range(len(resists)):
+                cnt += (prev_ema < resists[i]) & (resists[i] < ema_line) & (i < p.max_resists)[:, None]
+        return cnt > 1
@@ -1,8 +1,12 @@
 import backtrader as bt
+import numpy as np
 import pandas as pd
 import logging
+from types import SimpleNamespace
 
 from maru_quant.indicator.PivotHigh import PivotHigh
+from maru_quant.indicator.cache import cached_indicator
+from maru_quant.indicator.vectorized import pivot_high_levels, ema, atr, shift, memoize
 from maru_quant.utils.logger import setup_strategy_logger
 from maru_quant.utils.config_manager import config_manager
 
@@ -19,12 +23,13 @@ class PivotBreakout(bt.Strategy):
     )
 
     def __init__(self):
-        self.resistance = PivotHigh(self.data, window=self.params.window, max_resists=self.params.max_resists)
+        # 指标通过 cached_indicator 创建，优化时相同参数的指标在各组合之间共享
+        self.resistance = cached_indicator(PivotHigh, self.data, window=self.params.window, max_resists=self.params.max_resists)
         # self.sma = bt.indicators.SimpleMovingAverage(self.data.close, period=self.params.sma_period)
-        self.ema = bt.indicators.ExponentialMovingAverage(self.data.close, period=self.params.sma_period)
+        self.ema = cached_indicator(bt.indicators.ExponentialMovingAverage, self.data, period=self.params.sma_period)
         
         # Add ATR indicator for dynamic stop loss and take profit
-        self.atr = bt.indicators.ATR(self.data, period=self.params.atr_period)
+        self.atr = cached_indicator(bt.indicators.ATR, self.data, period=self.params.atr_period)
         
         self.dataclose = self.datas[0].close
         self.entry_bar = None  # 记录开仓的bar索引
@@ -108,3 +113,99 @@ class PivotBreakout(bt.Strategy):
             if order and order.status in [order.Submitted, order.Accepted, order.Partial]:
                 self.cancel(order)
         self.bracket_orders = []  # 清空列表
+
+    # 只影响离场、不影响开仓信号的参数
+    VECTOR_EXIT_PARAMS = ('max_hold_bars', 'take_profit_atr', 'stop_loss_atr')
+
+    @classmethod
+    def vector_batch(cls, ohlc, params, cache=None):
+        """
+        多组参数的整段向量化信号，供 VectorBacktestRunner 使用，口径与 next() 一致
+
+        开仓信号只取决于非离场参数，相同的组合共用一行；同一 window 的各行在
+        (行数, bar数) 的矩阵上一次算出，EMA/ATR按周期去重后按行广播
+
+        Args:
+            ohlc: 包含 open/high/low/close 数组的字典
+            params: 合并了默认值的策略参数列表
+            cache: 同一段数据上的指标和开仓信号缓存（dict），批量回测时在各批之间共享
+
+        Returns:
+            entry: (信号行数, bar数) 的布尔矩阵，每根bar收盘时是否发出开仓信号
+            entry_index: 每组参数对应的信号行
+            atr: (ATR周期数, bar数) 的ATR矩阵，atr_index 为每组参数对应的行
+            stop_loss_atr / take_profit_atr / max_hold_bars: 每组参数的离场参数数组（止损/止盈价同 get_atr_levels）
+        """
+        close = ohlc['close']
+        cache = {} if cache is None else cache
+
+        def atr_line(period):
+            return memoize(cache, ('atr', period), lambda: atr(ohlc['high'], ohlc['low'], close, period))
+
+        def ema_line(period):
+            return memoize(cache, ('ema', period), lambda: ema(close, period))
+
+        def entry_key(p):
+            return ('entry', cls) + tuple((k, getattr(p, k)) for k in p._getkeys() if k not in cls.VECTOR_EXIT_PARAMS)
+
+        keys = [entry_key(p) for p in params]
+        rows = {key: i for i, key in enumerate(dict.fromkeys(keys))}
+        pending = {}
+        for key, p in zip(keys, params):
+            if key not in cache and key not in pending:
+                pending[key] = p
+
+        # 第k新的阻力位与深度无关，每个 window 按最大深度计算一次，不同 max_resists 共用
+        by_window = {}
+        for p in pending.values():
+            by_window.setdefault(p.window, []).append(p)
+        for window, group in by_window.items():
+            resists = memoize(cache, ('pivot_high_levels', window),
+                              lambda: pivot_high_levels(close, window, PivotHigh.MAX_LINES))
+            p = SimpleNamespace(**{k: np.array([getattr(q, k) for q in group]) for k in group[0]._getkeys()})
+            entry = cls.vector_break_signal(p, resists,
+                                            np.stack([ema_line(q.sma_period) for q in group]),
+                                            np.stack([atr_line(q.atr_period) for q in group]))
+            # 所有指标都有值之后才会调用 next()
+            minperiod = np.maximum.reduce([2 * p.window + 1, p.sma_period, p.atr_period + 1])
+            entry[np.arange(len(close)) < minperiod[:, None] - 1] = False
+            for q, row in zip(group, entry):
+                cache[entry_key(q)] = row
+
+        atr_periods = {period: i for i, period in enumerate(dict.fromkeys(p.atr_period for p in params))}
+        return {
+            'entry': np.stack([cache[key] for key in rows]),
+            'entry_index': np.array([rows[key] for key in keys], dtype=np.int64),
+            'atr': np.stack([atr_line(period) for period in atr_periods]),
+            'atr_index': np.array([atr_periods[p.atr_period] for p in params], dtype=np.int64),
+            'stop_loss_atr': np.array([p.stop_loss_atr for p in params]),
+            'take_profit_atr': np.array([p.take_profit_atr for p in params]),
+            'max_hold_bars': np.array([p.max_hold_bars for p in params], dtype=np.int64),
+        }
+
+    @classmethod
+    def vector_break_signal(cls, p, resists, ema_line, atr_line):
+        """
+        break_signal 的向量化版本，NaN阻力位比较结果为False
+
+        Args:
+            p: 各行参数组成的数组（p.max_resists 等为每行一个值）
+            resists: (深度, bar数) 的阻力位，同 pivot_high_levels
+            ema_line / atr_line: (行数, bar数) 的指标矩阵
+        """
+        prev_ema = shift(ema_line, 1)
+        signal = np.zeros(ema_line.shape, dtype=bool)
+        with np.errstate(invalid='ignore'):
+            for i in range(len(resists)):
+                signal |= (prev_ema < resists[i]) & (resists[i] < ema_line) & (i < p.max_resists)[:, None]
+        return signal
+
+    @classmethod
+    def supports_vector(cls):
+        """子类改写了逐bar逻辑却没有提供对应的向量化实现时，不能使用向量化引擎"""
+        def owner(name):
+            return next(k for k in cls.__mro__ if name in vars(k))
+
+        vector = owner('vector_batch')
+        return (issubclass(owner('vector_break_signal'), owner('break_signal'))
+                and all(issubclass(vector, owner(name)) for name in ('next', 'notify_order', 'get_atr_levels')))
@@ -1,8 +1,10 @@
 import backtrader as bt
+import numpy as np
 import pandas as pd
 import logging
 
 from maru_quant.strategy.trendtracking.breakout import PivotBreakout
+from maru_quant.indicator.vectorized import shift
 
 # Create a Strategy
 class SmoothedPivotBreakout(PivotBreakout):
@@ -30,4 +32,15 @@ class SmoothedPivotBreakout(PivotBreakout):
             if not pd.isna(resist_value) and self.ema[-1] < upper_bound < self.ema[0]:
                 self.logger.info(f'[↑↑SIG↑↑]：均线突破阻力位 {resist_value:.2f}, 均线价格 {self.ema[0]:.2f}，执行买入')
                 return True
-        return False
\ No newline at end of file
+        return False
+
+    @classmethod
+    def vector_break_signal(cls, p, resists, ema_line, atr_line):
+        """break_signal 的向量化版本：均线突破阻力带上沿"""
+        prev_ema = shift(ema_line, 1)
+        signal = np.zeros(ema_line.shape, dtype=bool)
+        with np.errstate(invalid='ignore'):
+            for i in range(len(resists)):
+                upper_bound = resists[i] + atr_line * p.resist_zone_width[:, None]
+                signal |= (prev_ema < upper_bound) & (upper_bound < ema_line) & (i < p.max_resists)[:, None]
+        return signal
@@ -0,0 +1,142 @@
+"""
+基于连续数组的backtrader数据源
+
+PandasData 在预加载时逐bar用 iloc 读取DataFrame，65k根bar需要数秒。
+ArrayData 的各列是连续的float64 NumPy数组（日期为backtrader数值日期），预加载时直接把数组挂到lines上，
+同一个数据源在多个Cerebro之间复用。由DataFrame创建时各列尽量取DataFrame内存的视图，
+由 arrays 创建时（如进程池中共享内存上的数组）直接引用传入的数组，窗口切片（slice_feed）也是视图，
+整个过程不复制数据；数据源创建后不再持有DataFrame。
+"""
+import hashlib
+import math
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+def datetime_to_num(index):
+    """
+    时间索引转换为backtrader数值日期，与逐个调用 bt.date2num 逐位相同
+
+    Args:
+        index: DatetimeIndex，带时区时先转换为UTC
+    """
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    ns = index.values.astype('datetime64[ns]').view(np.int64)
+    days, rest = np.divmod(ns, 86400 * 10**9)
+    us = rest // 1000
+    parts = (
+        (days + 719163).astype(np.float64),  # 1970-01-01 的序数为 719163
+        us // (3600 * 10**6) / 24.0,
+        us // (60 * 10**6) % 60 / 1440.0,
+        us // 10**6 % 60 / 86400.0,
+        us % 10**6 / 86400e6,
+    )
+    # date2num 用 math.fsum 求和，逐个求和才能保证结果相同
+    return np.array([math.fsum(t) for t in zip(*(p.tolist() for p in parts))], dtype=np.float64)
+
+def dataframe_arrays(dataframe):
+    """
+    按 PandasData 的规则（列名不区分大小写）把DataFrame转换为数组字典，float64列取视图而不是副本
+
+    Returns:
+        包含 datetime 和DataFrame中存在的 open/high/low/close/volume/openinterest 的字典
+    """
+    columns = {str(c).lower(): c for c in dataframe.columns}
+    arrays = {name: dataframe[columns[name]].to_numpy(dtype=np.float64)
+              for name in ('open', 'high', 'low', 'close', 'volume', 'openinterest') if name in columns}
+    arrays['datetime'] = datetime_to_num(dataframe.index)
+    return arrays
+
+def arrays_fingerprint(arrays):
+    """按数据内容（列名和各列数值）计算哈希，用于缓存key"""
+    h = hashlib.sha1()
+    for name in sorted(arrays):
+        h.update(name.encode('utf-8'))
+        h.update(np.ascontiguousarray(arrays[name], dtype=np.float64).data)
+    return h.hexdigest()
+
+def line_arrays(source):
+    """
+    ArrayData 各line的数组：连续的float64数组直接引用，其他转换一次，缺少的列补NaN
+
+    Args:
+        source: 数组字典，至少包含 datetime
+    """
+    size = len(source['datetime'])
+    arrays = {}
+    for name in ArrayData.lines.getlinealiases():
+        values = source.get(name)
+        values = np.full(size, np.nan) if values is None else np.ascontiguousarray(values, dtype=np.float64)
+        if len(values) != size:
+            raise ValueError(f"列 {name} 的长度 {len(values)} 与 datetime 的长度 {size} 不一致")
+        arrays[name] = values
+    return arrays
+
+class ArrayData(bt.feed.DataBase):
+    '''
+    由连续float64数组构成的数据源
+
+    Params:
+        dataname: DataFrame，未给出 arrays 时从中转换；转换后数据源不再持有DataFrame
+        arrays: 数组字典，datetime 为backtrader数值日期，其余为 open/high/low/close/volume/openinterest，
+                缺少的列输出NaN（同 PandasData）；连续的float64数组直接引用，不复制
+
+    self.arrays 为各line的数组（含补齐的NaN列），供数据指纹、向量化引擎和进程池共享内存使用。
+    预加载时lines直接引用这些数组，各次回测共享同一份数据；
+    设置了过滤器、tzinput或 exactbars 时退回逐bar加载，结果相同。
+    '''
+    params = (('arrays', None),)
+
+    def __init__(self):
+        source = self.p.arrays if self.p.arrays is not None else dataframe_arrays(self.p.dataname)
+        self.arrays = line_arrays(source)
+        # 只保留数组，不再引用DataFrame和传入的字典
+        self.p.dataname = None
+        self.p.arrays = None
+
+    def start(self):
+        super().start()
+        self._idx = -1
+        self._preloaded = False
+
+    def preload(self):
+        if (self._filters or self._ffilters or self._tzinput
+                or any(line.mode == line.QBuffer for line in self.lines)):
+            return super().preload()
+
+        dt = self.arrays['datetime']
+        lo = int(np.searchsorted(dt, self.fromdate, side='left'))
+        hi = int(np.searchsorted(dt, self.todate, side='right'))
+        whole = lo == 0 and hi == len(dt)
+        for name in self.getlinealiases():
+            line = getattr(self.lines, name)
+            values = self.arrays[name]
+            line.array = values if whole else values[lo:hi]
+        self._idx = hi
+        self._preloaded = True
+        self.home()
+
+    def load(self):
+        # 预加载后没有新的bar；直接返回，避免在共享的数组上追加再撤销
+        if self._preloaded:
+            return False
+        return super().load()
+
+    def _load(self):
+        self._idx += 1
+        if self._idx >= len(self.arrays['datetime']):
+            return False
+        for name in self.getlinealiases():
+            getattr(self.lines, name)[0] = self.arrays[name][self._idx]
+        return True
+
+def slice_feed(data_feed, lo, hi):
+    """数据源第 [lo, hi) 行的新数据源，各列是原数组的视图，周期与原数据源相同"""
+    return ArrayData(
+        arrays={name: values[lo:hi] for name, values in data_feed.arrays.items()},
+        timeframe=data_feed.p.timeframe,
+        compression=data_feed.p.compression
+    )
@@ -1,18 +1,71 @@
+import re
 import logging
+import inspect
+import functools
 import backtrader as bt
 import warnings
 import traceback  # 添加这个导入
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
-from maru_quant.analyzer import SharpeRatio_30min
-from maru_quant.analyzer.WinLossRatioAnalyzer import WinLossRatioAnalyzer
+from maru_quant.analyzer.EquityRecorder import EquityRecorder
+from maru_quant.analyzer.PerformanceAnalyzer import PerformanceAnalyzer
 from maru_quant.broker.commission_info import comm_ibkr_XAUUSD
+# 以模块方式导入：策略模块先于 maru_quant.utils 导入时，indicator.cache 还未初始化完成
+import maru_quant.indicator.cache as indicator_cache
 from maru_quant.utils.config_manager import config_manager
+from maru_quant.utils.dataloader import feed_fingerprint
+from maru_quant.utils.result_cache import get_result_cache, make_cache_key, source_hash
+
+# 策略代码中访问observer的写法；lean模式关闭了标准observer，这些访问会失败
+_OBSERVER_ACCESS = re.compile(r'\bself\.(stats|observers|getobservers)\b')
+
+@functools.lru_cache(maxsize=None)
+def uses_observers(strategy_class) -> bool:
+    """策略（含非backtrader的父类）的代码是否访问observer；取不到源码的类视为不访问"""
+    for cls in strategy_class.__mro__:
+        if cls.__module__.startswith('backtrader') or cls.__module__ == 'builtins':
+            continue
+        try:
+            source = inspect.getsource(cls)
+        except (OSError, TypeError):
+            continue
+        if _OBSERVER_ACCESS.search(source):
+            return True
+    return False
+
+def lean_execution(strategy_class) -> str:
+    """
+    策略在lean模式下的执行方式，由策略类属性 LEAN_EXECUTION 声明
+
+      - 'runonce'（默认）：指标整段计算（runonce + preload），与默认模式只差标准observer
+      - 'bounded'：指标逐bar计算，指标内部的子指标使用有界缓冲（exactbars=-1）
+      - None：不支持lean模式（如依赖子指标的完整历史）
+
+    没有实现 once() 的指标在runonce下由backtrader逐bar调用 next()，不影响兼容性；
+    访问observer（self.stats 等）的策略无论如何声明都不支持lean模式
+
+    Raises:
+        ValueError: 策略不支持lean模式
+    """
+    execution = getattr(strategy_class, 'LEAN_EXECUTION', 'runonce')
+    if execution not in ('runonce', 'bounded'):
+        raise ValueError(f"策略 {strategy_class.__name__} 不支持lean模式（LEAN_EXECUTION={execution!r}）")
+    if uses_observers(strategy_class):
+        raise ValueError(f"策略 {strategy_class.__name__} 访问了observer，lean模式下没有标准observer，请使用 mode='default'")
+    return execution
 
 class BacktestRunner:
     """
     回测运行器类，用于配置和执行回测
+
+    运行模式：
+      - 'default'：默认的 bt.Cerebro()，带标准observer
+      - 'lean'：不画图的批量回测使用，关闭observer，按策略声明的 LEAN_EXECUTION
+        选择 runonce 或有界缓冲（backtrader中 exactbars 会关闭 runonce，两者只能取其一）；
+        画图时仍使用默认模式
     """
+
+    MODES = ('default', 'lean')
     
     def __init__(
         self,
@@ -22,17 +75,27 @@ class BacktestRunner:
         sizer_type: Optional[str] = None,
         size_percent: Optional[int] = None,
         tick_type: Optional[str] = None,
+        use_cache: Optional[bool] = None,
+        mode: str = 'default',
     ):
         """
         初始化回测运行器
         如果参数为None，则使用配置文件中的默认值
+
+        Args:
+            use_cache: 是否使用回测结果缓存，为None时读取配置 cache_config.result_cache
+            mode: 运行模式，'default' 或 'lean'
         """
+        if mode not in self.MODES:
+            raise ValueError(f"不支持的运行模式: {mode}，可选 {self.MODES}")
         self.cash = cash or config_manager.cash
         self.commission = commission or config_manager.commission
         self.stake = stake or config_manager.fixed_size_stake
         self.sizer_type = sizer_type or config_manager.sizer_type
         self.size_percent = size_percent or config_manager.size_percent
         self.tick_type = tick_type or config_manager.tick_type
+        self.use_cache = config_manager.result_cache_enabled if use_cache is None else use_cache
+        self.mode = mode
 
         self.logger = logging.getLogger("main")
     
@@ -41,12 +104,40 @@ class BacktestRunner:
         """从配置文件创建BacktestRunner实例"""
         return cls(**config_manager.get_backtest_params())
     
+    def get_params(self) -> Dict[str, Any]:
+        """返回构造参数，用于在子进程中重建相同配置的运行器"""
+        return {
+            'cash': self.cash,
+            'commission': self.commission,
+            'stake': self.stake,
+            'sizer_type': self.sizer_type,
+            'size_percent': self.size_percent,
+            'tick_type': self.tick_type,
+            'use_cache': self.use_cache,
+            'mode': self.mode
+        }
+    
+    def _cache_key(self, strategy_class, data_feed, params: Dict[str, Any]) -> Optional[str]:
+        """回测结果缓存key，数据源无法计算指纹时返回None（不缓存）"""
+        data_fingerprint = feed_fingerprint(data_feed)
+        if data_fingerprint is None:
+            return None
+        # 运行模式不影响结果
+        broker_params = {k: v for k, v in self.get_params().items() if k not in ('use_cache', 'mode')}
+        if self.tick_type == "CFD":
+            broker_params['comminfo'] = dict(comm_ibkr_XAUUSD.p._getitems())
+        # 子类（如向量化引擎）的代码也计入指纹
+        data_params = {name: getattr(data_feed.p, name, None) for name in ('timeframe', 'compression', 'fromdate', 'todate')}
+        return make_cache_key(strategy_class, params, data_fingerprint, broker_params,
+                              source_hash(__name__, type(self).__module__), data_params)
+    
     def run(
         self,
         strategy_class,
         data_feed,
         params: Dict[str, Any],
-        plot = False
+        plot = False,
+        record = False
     ) -> Optional[Dict[str, Any]]:
         """
         运行单次回测
@@ -55,81 +146,155 @@ class BacktestRunner:
             strategy_class: 策略类
             data_feed: 数据源
             params: 策略参数
+            plot: 是否画图
+            record: 是否记录逐bar净值和交易明细，结果中增加 'recording' 字段
             
         Returns:
             包含回测结果的字典，失败时返回None
         """
+        if self.mode == 'lean' and not plot:
+            lean_execution(strategy_class)
+
+        # 画图或需要记录明细时必须真正运行一次，不走缓存
+        cache_key = None
+        if not plot and not record:
+            cache_key, cached = self._cached_result(strategy_class, data_feed, params)
+            if cached is not None:
+                return cached
+
         try:
-            cerebro = bt.Cerebro()
-            
-            # 添加数据
-            cerebro.adddata(data_feed)
-            
-            # 添加策略和参数
-            cerebro.addstrategy(strategy_class, **params)
-            
-            # 设置broker参数
-            cerebro.broker.setcash(self.cash)
-            
-            # 设置佣金
-            if self.tick_type == "CFD":
-                cerebro.broker.addcommissioninfo(comm_ibkr_XAUUSD)
-            else:
-                cerebro.broker.setcommission(self.commission)
-            
-            # 设置仓位管理
-            if self.sizer_type == "fixed":
-                cerebro.addsizer(bt.sizers.FixedSize, stake=self.stake)
-            elif self.sizer_type == "percents":
-                cerebro.addsizer(bt.sizers.PercentSizerInt, percents=self.size_percent)
-            
-            # 添加分析器
-            cerebro.addanalyzer(SharpeRatio_30min, _name='sharpe_ratio')
-            cerebro.addanalyzer(bt.analyzers.DrawDown, _name='drawdown')
-            cerebro.addanalyzer(WinLossRatioAnalyzer, _name='winloss')
-            
-            # 运行回测
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore")
-                result = cerebro.run()
-            
-            # 提取结果
-            strat = result[0]
-            final_value = cerebro.broker.getvalue()
-            
-            # 构建结果字典
-            backtest_result = {
-                'sharpe_ratio': strat.analyzers.sharpe_ratio.get_analysis().get('sharperatio', 0),
-                'max_drawdown': strat.analyzers.drawdown.get_analysis().get('max', {}).get('drawdown', 0),
-                'total_return': (final_value - self.cash) / self.cash,
-                'total_trade': strat.analyzers.winloss.get_analysis().get('total_trades', 0),
-                'win_rate': strat.analyzers.winloss.get_analysis().get('win_rate', 0),
-                'avg_win': strat.analyzers.winloss.get_analysis().get('avg_win', 0),
-                'avg_loss': strat.analyzers.winloss.get_analysis().get('avg_loss', 0),
-                'P/L_ratio': strat.analyzers.winloss.get_analysis().get('P/L_ratio', 0),
-                'final_value': final_value,
-            }
-            
-            if (plot):
-                cerebro.plot(
-                    style='candlestick',
-                    bgcolor='white',
-                    tight_layout=True,
-                )
- 
-            return backtest_result
-            
+            backtest_result = self._run_backtest(strategy_class, data_feed, params, plot, record)
         except Exception as e:
-            print(f"回测失败，参数: {params}")
-            print(f"错误类型: {type(e).__name__}")
-            print(f"错误信息: {str(e)}")
-            print("完整调用栈:")
-            print(traceback.format_exc())
-            
-            # 如果有logger，也记录到日志中
-            if hasattr(self, 'logger') and self.logger:
-                self.logger.error(f"回测失败，参数: {params}")
-                self.logger.error(f"错误: {str(e)}")
-                self.logger.error(f"调用栈: {traceback.format_exc()}")
-            
-            return None
\ No newline at end of file
+            self._report_failure(params, e)
+            return None
+
+        self._store_result(cache_key, strategy_class, params, backtest_result)
+        return backtest_result
+
+    def _cached_result(self, strategy_class, data_feed, params: Dict[str, Any]):
+        """
+        查询回测结果缓存
+
+        Returns:
+            (缓存key, 已缓存的结果或None)；不使用缓存或数据源无法计算指纹时key为None
+        """
+        if not self.use_cache:
+            return None, None
+        cache_key = self._cache_key(strategy_class, data_feed, params)
+        if cache_key is None:
+            return None, None
+        return cache_key, get_result_cache().get(cache_key)
+
+    def _store_result(self, cache_key: Optional[str], strategy_class, params: Dict[str, Any], result: Dict[str, Any]):
+        """写入回测结果缓存；写入失败（如结果无法序列化、数据库被锁）不影响本次回测结果"""
+        if cache_key is None:
+            return
+        try:
+            get_result_cache().put(cache_key, strategy_class.__name__, result)
+        except Exception as e:
+            self.logger.warning(f"回测结果写入缓存失败，参数: {params}，错误: {type(e).__name__}: {e}")
+
+    def _report_failure(self, params: Dict[str, Any], error: Exception):
+        """输出一次失败回测的参数、错误和调用栈"""
+        stack = ''.join(traceback.format_exception(type(error), error, error.__traceback__))
+        print(f"回测失败，参数: {params}")
+        print(f"错误类型: {type(error).__name__}")
+        print(f"错误信息: {str(error)}")
+        print("完整调用栈:")
+        print(stack)
+        
+        # 如果有logger，也记录到日志中
+        if hasattr(self, 'logger') and self.logger:
+            self.logger.error(f"回测失败，参数: {params}")
+            self.logger.error(f"错误: {str(error)}")
+            self.logger.error(f"调用栈: {stack}")
+
+    def run_batch(self, strategy_class, data_feed, param_list: List[Dict[str, Any]], progress=None) -> List[Optional[Dict[str, Any]]]:
+        """
+        在同一数据源上依次回测多组参数
+
+        Args:
+            progress: 可选回调 progress(done, total)
+
+        Returns:
+            与param_list顺序一致的回测结果列表，失败的回测为None
+        """
+        results = []
+        for params in param_list:
+            results.append(self.run(strategy_class, data_feed, params))
+            if progress:
+                progress(len(results), len(param_list))
+        return results
+
+    def _cerebro(self, strategy_class, plot):
+        """按运行模式创建Cerebro"""
+        if self.mode != 'lean' or plot:
+            return bt.Cerebro()
+        if lean_execution(strategy_class) == 'runonce':
+            return bt.Cerebro(stdstats=False, preload=True, runonce=True)
+        return bt.Cerebro(stdstats=False, preload=True, runonce=False, exactbars=-1)
+
+    def _run_backtest(self, strategy_class, data_feed, params: Dict[str, Any], plot, record) -> Dict[str, Any]:
+        """用Cerebro执行一次回测，返回结果字典（异常由 run 统一处理）"""
+        cerebro = self._cerebro(strategy_class, plot)
+        
+        # 添加数据
+        cerebro.adddata(data_feed)
+        
+        # 添加策略和参数
+        cerebro.addstrategy(strategy_class, **params)
+        
+        # 设置broker参数
+        cerebro.broker.setcash(self.cash)
+        
+        # 设置佣金
+        if self.tick_type == "CFD":
+            cerebro.broker.addcommissioninfo(comm_ibkr_XAUUSD)
+        else:
+            cerebro.broker.setcommission(self.commission)
+        
+        # 设置仓位管理
+        if self.sizer_type == "fixed":
+            cerebro.addsizer(bt.sizers.FixedSize, stake=self.stake)
+        elif self.sizer_type == "percents":
+            cerebro.addsizer(bt.sizers.PercentSizerInt, percents=self.size_percent)
+        
+        # 添加分析器（夏普、回撤、胜负统计在同一个分析器中单遍计算）
+        cerebro.addanalyzer(PerformanceAnalyzer, _name='performance')
+        if record:
+            cerebro.addanalyzer(EquityRecorder, _name='recorder')
+        
+        # 运行回测；画图时使用原指标，便于显示
+        with warnings.catch_warnings(), indicator_cache.use_indicator_cache(not plot and config_manager.indicator_cache_enabled):
+            warnings.simplefilter("ignore")
+            result = cerebro.run()
+        
+        # 提取结果
+        strat = result[0]
+        final_value = cerebro.broker.getvalue()
+        
+        # 构建结果字典
+        performance = strat.analyzers.performance.get_analysis()
+        backtest_result = {
+            'sharpe_ratio': performance['sharperatio'],
+            'robust_sharpe': performance['robust_sharpe'],
+            'max_drawdown': performance['max_drawdown'],
+            'total_return': (final_value - self.cash) / self.cash,
+            'total_trade': performance['total_trades'],
+            'win_rate': performance['win_rate'],
+            'avg_win': performance['avg_win'],
+            'avg_loss': performance['avg_loss'],
+            'P/L_ratio': performance['P/L_ratio'],
+            'final_value': final_value,
+        }
+        if record:
+            backtest_result['recording'] = strat.analyzers.recorder.get_analysis()
+        
+        if (plot):
+            cerebro.plot(
+                style='candlestick',
+                bgcolor='white',
+                tight_layout=True,
+            )
+ 
+        return backtest_result
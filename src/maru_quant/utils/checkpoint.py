@@ -0,0 +1,143 @@
+"""
+长时间优化/Walk-Forward运行的断点续跑
+
+ResultJournal 是只追加的JSON Lines日志：首行记录运行指纹（策略代码、回测配置、数据、参数网格），
+之后每完成一个回测追加一行 {"key", "result"} 并落盘。用相同指纹重新打开时读回已完成的结果，
+只需运行剩余的任务；指纹不同时日志作废，从头开始。写入中断留下的不完整末行在打开时截掉。
+"""
+import copy
+from contextlib import contextmanager
+import json
+import os
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from maru_quant.utils.logger import get_logger
+
+def params_key(params: Dict[str, Any]) -> str:
+    """参数组合在日志中的key，与参数顺序无关"""
+    return json.dumps(params, sort_keys=True, default=str)
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"无法写入断点日志的值: {value!r}")
+
+class ResultJournal:
+    """
+    回测结果断点日志
+
+    Args:
+        path: 日志文件路径
+        fingerprint: 运行指纹，与已有日志不一致时清空日志
+    """
+
+    def __init__(self, path: str, fingerprint: str):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.prefix = ''
+        self._entries = {}
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        valid = self._load() if os.path.exists(path) else None
+        if valid is None:
+            self._file = open(path, 'wb')
+            self._write([{'fingerprint': fingerprint}])
+        else:
+            self._file = open(path, 'r+b')
+            self._file.truncate(valid)  # 去掉不完整的末行
+            self._file.seek(valid)
+
+    def _load(self) -> Optional[int]:
+        """读取已有日志，返回完整行的字节数；指纹不符时返回None"""
+        logger = get_logger()
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        valid = 0
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b'\n'):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if valid == 0:
+                if record.get('fingerprint') != self.fingerprint:
+                    logger.warning(f"断点日志 {self.path} 与当前运行配置不一致，重新开始")
+                    return None
+            else:
+                self._entries[record['key']] = record['result']
+            valid += len(line)
+        if valid == 0:
+            return None
+        if self._entries:
+            logger.info(f"从断点日志 {self.path} 恢复 {len(self._entries)} 个已完成的回测")
+        return valid
+
+    def scope(self, prefix: str) -> 'ResultJournal':
+        """共享同一日志文件、key带前缀的视图（如Walk-Forward的各个窗口）"""
+        view = copy.copy(self)
+        view.prefix = f'{self.prefix}{prefix}/'
+        return view
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key: str):
+        return self.prefix + key in self._entries
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """已完成的回测结果（失败的回测也记录为None）"""
+        result = self._entries.get(self.prefix + key)
+        return copy.deepcopy(result)
+
+    def record(self, key: str, result: Optional[Dict[str, Any]]):
+        self.record_many([(key, result)])
+
+    def record_many(self, items: Iterable[Tuple[str, Optional[Dict[str, Any]]]]):
+        """追加一批结果，写完后fsync一次"""
+        records = [{'key': self.prefix + key, 'result': result} for key, result in items]
+        if not records:
+            return
+        self._write(records)
+        for record in records:
+            self._entries[record['key']] = record['result']
+
+    def _write(self, records):
+        self._file.write(''.join(json.dumps(r, default=_json_default) + '\n' for r in records).encode('utf-8'))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def run_fingerprint(backtest_runner, strategy_class, data_feed, config: Dict[str, Any]) -> str:
+    """运行指纹：策略代码、回测配置和数据指纹（同回测结果缓存key），加上参数网格、窗口等运行配置"""
+    fingerprint = backtest_runner._cache_key(strategy_class, data_feed, config)
+    if fingerprint is None:
+        raise ValueError("数据源无法计算内容指纹，不能断点续跑")
+    return fingerprint
+
+@contextmanager
+def open_journal(checkpoint, backtest_runner, strategy_class, data_feed, config: Dict[str, Any]):
+    """
+    按 checkpoint 参数打开断点日志
+
+    Args:
+        checkpoint: None（不记录）、日志文件路径，或已打开的 ResultJournal（调用方负责关闭）
+        其他参数: 用于计算运行指纹，见 run_fingerprint
+    """
+    if checkpoint is None or isinstance(checkpoint, ResultJournal):
+        yield checkpoint
+        return
+    fingerprint = run_fingerprint(backtest_runner, strategy_class, data_feed, config)
+    with ResultJournal(checkpoint, fingerprint) as journal:
+        yield journal
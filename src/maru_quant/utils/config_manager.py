@@ -28,6 +28,7 @@ class ConfigManager:
         self.broker_config = self._config.get("bbroker_config", {})
         self.logger_config = self._config.get("logger_config", {})
         self.mt5_config = self._config.get("mt5_config", {})
+        self.cache_config = self._config.get("cache_config", {})
         
         # backtest config
         self.basic_config = self.backtest_config.get("basic", {})
@@ -86,6 +87,39 @@ class ConfigManager:
     @property
     def log_to_file(self) -> bool:
         return self.logger_config.get("log_to_file", True)
+
+    @property
+    def log_dir(self) -> str:
+        # 为空时写到项目根目录下的 log/
+        return self.logger_config.get("log_dir", "")
+    
+    @property
+    def cache_dir(self) -> str:
+        return self.cache_config.get("cache_dir", "cache")
+    
+    @property
+    def data_cache_enabled(self) -> bool:
+        return self.cache_config.get("data_cache", True)
+    
+    @property
+    def result_cache_enabled(self) -> bool:
+        return self.cache_config.get("result_cache", True)
+    
+    @property
+    def result_cache_max_age_days(self) -> float:
+        return self.cache_config.get("result_cache_max_age_days", 30)
+    
+    @property
+    def result_cache_max_entries(self) -> int:
+        return self.cache_config.get("result_cache_max_entries", 200000)
+
+    @property
+    def indicator_cache_enabled(self) -> bool:
+        return self.cache_config.get("indicator_cache", True)
+
+    @property
+    def indicator_cache_max_mb(self) -> float:
+        return self.cache_config.get("indicator_cache_max_mb", 512)
     
     def get_backtest_params(self) -> Dict[str, Any]:
         """获取单次回测相关的所有参数"""
@@ -1,8 +1,16 @@
 import os
+import json
+import shutil
+import hashlib
 import backtrader as bt
+import numpy as np
 import pandas as pd
 
-def load_data(dataFile, start_date=None, end_date=None):
+from maru_quant.utils.array_feed import ArrayData, arrays_fingerprint, dataframe_arrays, line_arrays
+from maru_quant.utils.config_manager import config_manager
+
+def parse_interval(dataFile):
+    """从文件名解析时间周期，返回 (timeframe, compression)"""
     # 自动从文件名提取 interval
     # 文件名格式: data/OANDA_XAUUSD, 60_76817.csv
     base = os.path.basename(dataFile)
@@ -28,7 +36,10 @@ def load_data(dataFile, start_date=None, end_date=None):
         except Exception:
             tf = bt.TimeFrame.Days
             comp = 1
+    return tf, comp
 
+def read_csv_dataframe(dataFile):
+    """解析CSV，返回按时间排序、UTC索引的DataFrame"""
     # Load data - 自动使用第一列作为时间列
     dataframe = pd.read_csv(dataFile, parse_dates=[0], index_col=0)
     dataframe.sort_index(inplace=True)
@@ -42,22 +53,175 @@ def load_data(dataFile, start_date=None, end_date=None):
         dataframe.index = dataframe.index.tz_localize('UTC')
     else:
         dataframe.index = dataframe.index.tz_convert('UTC')
+    return dataframe
 
-    # Filter by start_date and end_date if provided
-    df = dataframe
+def _data_cache_root():
+    return os.path.join(config_manager.cache_dir, 'data')
+
+def _cache_prefix(dataFile):
+    # 同一个源文件的所有缓存版本共享前缀，便于失效时一并删除
+    abspath = os.path.abspath(dataFile)
+    name = os.path.splitext(os.path.basename(abspath))[0]
+    path_hash = hashlib.sha1(abspath.encode('utf-8')).hexdigest()[:8]
+    return f"{name}.{path_hash}"
+
+def _cache_path(dataFile):
+    """缓存目录，按 路径 + 文件大小 + 修改时间 生成key，源文件变化后自动失效"""
+    st = os.stat(dataFile)
+    key = hashlib.sha1(f"{st.st_size}|{st.st_mtime_ns}".encode('utf-8')).hexdigest()[:12]
+    return os.path.join(_data_cache_root(), f"{_cache_prefix(dataFile)}.{key}")
+
+def _read_cache(cache_path):
+    with open(os.path.join(cache_path, 'meta.json'), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    # 内存映射读取，不会把整个文件拷进内存；索引和各列按写入时的dtype还原，dtype一致时不复制
+    index = np.load(os.path.join(cache_path, 'index.npy'), mmap_mode='r')
+    columns = {
+        name: np.asarray(np.load(os.path.join(cache_path, f'{i}.npy'), mmap_mode='r'), dtype=dtype)
+        for i, (name, dtype) in enumerate(zip(meta['columns'], meta['dtypes']))
+    }
+    dt_index = pd.DatetimeIndex(np.asarray(index).view(meta['index_dtype']), name=meta['index_name']).tz_localize('UTC')
+    return pd.DataFrame(columns, index=dt_index, columns=meta['columns'], copy=False)
+
+def _write_cache(cache_path, dataframe):
+    # 只缓存NumPy数值列（不含可空整数等扩展类型），其他情况直接跳过
+    if not all(isinstance(t, np.dtype) and pd.api.types.is_numeric_dtype(t) for t in dataframe.dtypes):
+        return
+    # 删除同一源文件的旧版本缓存
+    _remove_cache_entries(os.path.basename(cache_path).rsplit('.', 1)[0] + '.')
+    tmp_path = cache_path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    index = dataframe.index.tz_convert('UTC').tz_localize(None).values
+    np.save(os.path.join(tmp_path, 'index.npy'), index.view(np.int64))
+    # 每列单独保存，保留原dtype（如整数的Volume）
+    for i, column in enumerate(dataframe.columns):
+        np.save(os.path.join(tmp_path, f'{i}.npy'), np.ascontiguousarray(dataframe[column].to_numpy()))
+    with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'columns': list(dataframe.columns),
+            'dtypes': [t.str for t in dataframe.dtypes],
+            'index_name': dataframe.index.name,
+            'index_dtype': index.dtype.str
+        }, f)
+    # 写完再改名，中途崩溃不会留下半个缓存
+    os.replace(tmp_path, cache_path)
+
+def _remove_cache_entries(prefix):
+    root = _data_cache_root()
+    if not os.path.isdir(root):
+        return
+    for entry in os.listdir(root):
+        if entry.startswith(prefix):
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+
+def clear_data_cache(dataFile=None):
+    """
+    使数据缓存失效
+
+    Args:
+        dataFile: 只删除该文件的缓存；为None时清空全部数据缓存
+    """
+    if dataFile is None:
+        shutil.rmtree(_data_cache_root(), ignore_errors=True)
+    else:
+        _remove_cache_entries(_cache_prefix(dataFile) + '.')
+
+def load_dataframe(dataFile, use_cache=None):
+    """
+    加载完整数据集为DataFrame，优先读取磁盘缓存
+
+    缓存命中时各列是缓存文件的只读内存映射（就地修改会抛出 ValueError），
+    需要修改数据时先 .copy()；列名和dtype与直接解析CSV的结果相同
+
+    Args:
+        dataFile: CSV文件路径
+        use_cache: 是否使用缓存，为None时读取配置 cache_config.data_cache
+    """
+    if use_cache is None:
+        use_cache = config_manager.data_cache_enabled
+    if not use_cache:
+        return read_csv_dataframe(dataFile)
+
+    cache_path = _cache_path(dataFile)
+    if os.path.isdir(cache_path):
+        try:
+            return _read_cache(cache_path)
+        except (OSError, ValueError, KeyError):
+            # 缓存损坏，重新解析
+            shutil.rmtree(cache_path, ignore_errors=True)
+
+    dataframe = read_csv_dataframe(dataFile)
+    try:
+        _write_cache(cache_path, dataframe)
+    except OSError:
+        pass
+    return dataframe
+
+def slice_bounds(dataframe, start_date=None, end_date=None):
+    """
+    日期区间对应的行号范围 [lo, hi)，在有序索引上二分查找
+
+    Args:
+        dataframe: load_dataframe 返回的UTC索引DataFrame
+        start_date: 开始日期（包含），为空时从头开始
+        end_date: 结束日期（包含），为空时到末尾
+    """
+    index = dataframe.index
+    lo, hi = 0, len(index)
     if start_date:
         # 保证start_date带有UTC时区
-        start_dt = pd.to_datetime(start_date).tz_localize('UTC')
-        df = df[df.index >= start_dt]
+        lo = int(index.searchsorted(pd.to_datetime(start_date).tz_localize('UTC'), side='left'))
     if end_date:
-        end_dt = pd.to_datetime(end_date).tz_localize('UTC')
-        df = df[df.index <= end_dt]
+        hi = int(index.searchsorted(pd.to_datetime(end_date).tz_localize('UTC'), side='right'))
+    return lo, hi
 
-    # 自动适配时间周期
-    data_feed = bt.feeds.PandasData(
-        dataname=df,
-        timeframe=tf,
-        compression=comp,
-        datetime=None  # 首列为索引，自动识别
+def slice_dataframe(dataframe, start_date=None, end_date=None):
+    """
+    按日期截取数据，在有序索引上二分查找，返回零拷贝视图
+
+    Args:
+        dataframe: load_dataframe 返回的UTC索引DataFrame
+        start_date: 开始日期（包含），为空时从头开始
+        end_date: 结束日期（包含），为空时到末尾
+    """
+    lo, hi = slice_bounds(dataframe, start_date, end_date)
+    return dataframe.iloc[lo:hi]
+
+def dataframe_fingerprint(dataframe):
+    """按数据内容计算哈希，与由该DataFrame创建的数据源的 feed_fingerprint 相同"""
+    return arrays_fingerprint(line_arrays(dataframe_arrays(dataframe)))
+
+def feed_fingerprint(data_feed):
+    """
+    数据源的内容指纹，计算一次后缓存在feed对象上
+
+    Returns:
+        指纹字符串；非 ArrayData 数据源（如实盘数据）返回None
+    """
+    fingerprint = getattr(data_feed, '_maru_fingerprint', None)
+    if fingerprint is None:
+        arrays = getattr(data_feed, 'arrays', None)
+        if arrays is None:
+            return None
+        fingerprint = arrays_fingerprint(arrays)
+        data_feed._maru_fingerprint = fingerprint
+    return fingerprint
+
+def make_feed(dataframe, timeframe, compression):
+    """把DataFrame包装成backtrader数据源，各列尽量引用DataFrame的内存，可在多次回测之间复用"""
+    return ArrayData(
+        arrays=dataframe_arrays(dataframe),
+        timeframe=timeframe,
+        compression=compression
     )
-    return data_feed
\ No newline at end of file
+
+def load_data(dataFile, start_date=None, end_date=None, use_cache=None):
+    tf, comp = parse_interval(dataFile)
+    dataframe = load_dataframe(dataFile, use_cache)
+
+    # Filter by start_date and end_date if provided
+    df = slice_dataframe(dataframe, start_date, end_date)
+
+    # 自动适配时间周期
+    return make_feed(df, tf, comp)
@@ -0,0 +1,417 @@
+"""
+多机回测：任务队列服务 + 任意数量的worker进程
+
+协调方（GridSearchOptimizer / WalkForwardAnalyzer）把数据按内容指纹发布到队列服务一次，
+之后每个回测任务只包含 (策略导入路径, 运行器配置, 数据指纹, 行区间, 参数)。
+worker从队列租用任务，回测完成后提交结果；运行期间定时发送心跳续租，
+worker退出或失联后租约到期，任务重新排队，由其他worker接手。
+
+队列服务基于 multiprocessing.managers，可以全部运行在本机（测试），也可以跨机器：
+
+    python -m maru_quant.utils.job_queue serve --host 0.0.0.0 --port 50000
+    python -m maru_quant.utils.job_queue worker --address 10.0.0.1:50000 --authkey <serve打印的key>
+
+注意：管理器会反序列化连接方发来的任何消息，worker会导入并运行任务中给出的策略/运行器类，
+能连上端口并通过authkey认证就等于能在队列服务和所有worker上执行代码。
+authkey 必须保密（serve 不指定时随机生成并打印），服务默认只监听本机，跨机器时只在可信网络中开放端口。
+"""
+import argparse
+import collections
+import itertools
+import logging
+import os
+import secrets
+import socket
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from multiprocessing.managers import BaseManager
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from maru_quant.utils.array_feed import ArrayData, arrays_fingerprint, line_arrays, slice_feed
+from maru_quant.utils.dataloader import feed_fingerprint
+from maru_quant.utils.parallel import class_path, import_class
+
+class JobQueue:
+    """
+    队列服务端的状态，所有方法由管理器在各连接的线程中调用，用锁串行化
+
+    Args:
+        lease_seconds: 租约时长，worker需要在到期前发送心跳
+        max_attempts: 同一任务最多租出的次数，超过后按失败（结果None）处理，避免反复拖垮worker
+        clock: 时钟函数，测试时可以替换
+    """
+
+    def __init__(self, lease_seconds=30.0, max_attempts=3, clock=time.monotonic):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._data = {}  # 数据指纹 -> (各列数组, timeframe, compression)
+        self._jobs = {}  # 未完成的任务
+        self._pending = collections.deque()
+        self._leases = {}  # 任务id -> [worker_id, 到期时间]
+        self._attempts = collections.Counter()
+        self._done = {}  # 任务id -> 结果，协调方取走后删除
+        self._workers = {}  # worker_id -> 最近一次联系的时间
+
+    def settings(self) -> Dict[str, Any]:
+        return {'lease_seconds': self.lease_seconds, 'max_attempts': self.max_attempts}
+
+    def has_data(self, key: str) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def put_data(self, key: str, arrays: Dict[str, np.ndarray], timeframe, compression):
+        with self._lock:
+            self._data[key] = (arrays, timeframe, compression)
+
+    def get_data(self, key: str):
+        with self._lock:
+            return self._data[key]
+
+    def submit(self, jobs: List[Dict[str, Any]]) -> List[int]:
+        """任务入队，返回任务id列表"""
+        with self._lock:
+            ids = []
+            for job in jobs:
+                job_id = next(self._ids)
+                self._jobs[job_id] = job
+                self._pending.append(job_id)
+                ids.append(job_id)
+            return ids
+
+    def lease(self, worker_id: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """租用一个任务，没有可用任务时返回None"""
+        with self._lock:
+            now = self._clock()
+            self._workers[worker_id] = now
+            self._requeue_expired(now)
+            if not self._pending:
+                return None
+            job_id = self._pending.popleft()
+            self._leases[job_id] = [worker_id, now + self.lease_seconds]
+            self._attempts[job_id] += 1
+            return job_id, self._jobs[job_id]
+
+    def heartbeat(self, worker_id: str) -> int:
+        """续租该worker持有的全部任务，返回续租的任务数"""
+        with self._lock:
+            now = self._clock()
+            self._workers[worker_id] = now
+            renewed = 0
+            for lease in self._leases.values():
+                if lease[0] == worker_id:
+                    lease[1] = now + self.lease_seconds
+                    renewed += 1
+            return renewed
+
+    def complete(self, job_id: int, worker_id: str, result) -> bool:
+        """提交结果；租约已转给其他worker或任务已完成时忽略，返回是否接受"""
+        with self._lock:
+            lease = self._leases.get(job_id)
+            if lease is None or lease[0] != worker_id:
+                return False
+            del self._leases[job_id]
+            self._finish(job_id, result)
+            return True
+
+    def collect(self, job_ids: List[int]) -> Dict[int, Any]:
+        """取走已完成任务的结果"""
+        with self._lock:
+            self._requeue_expired(self._clock())
+            return {job_id: self._done.pop(job_id) for job_id in job_ids if job_id in self._done}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            now = self._clock()
+            return {
+                'pending': len(self._pending),
+                'leased': len(self._leases),
+                'done': len(self._done),
+                'workers': sum(1 for seen in self._workers.values() if now - seen <= self.lease_seconds),
+            }
+
+    def _finish(self, job_id, result):
+        del self._jobs[job_id]
+        self._attempts.pop(job_id, None)
+        self._done[job_id] = result
+
+    def _requeue_expired(self, now):
+        for job_id, (worker_id, deadline) in list(self._leases.items()):
+            if deadline >= now:
+                continue
+            del self._leases[job_id]
+            if self._attempts[job_id] >= self.max_attempts:
+                logging.getLogger(__name__).error(f"任务 {job_id} 已租出 {self.max_attempts} 次仍未完成，按失败处理")
+                self._finish(job_id, None)
+            else:
+                self._pending.appendleft(job_id)
+
+class QueueManager(BaseManager):
+    pass
+
+_queue = None
+
+def _get_queue():
+    return _queue
+
+def _init_server(lease_seconds, max_attempts):
+    global _queue
+    _queue = JobQueue(lease_seconds, max_attempts)
+
+QueueManager.register('get_queue', callable=_get_queue)
+
+def start_queue_server(authkey: bytes, address=('127.0.0.1', 0), lease_seconds=30.0, max_attempts=3) -> QueueManager:
+    """在子进程中启动队列服务，返回的管理器有 .address，用完调用 .shutdown()"""
+    manager = QueueManager(address=address, authkey=authkey)
+    manager.start(_init_server, (lease_seconds, max_attempts))
+    return manager
+
+def serve_queue(address, authkey: bytes, lease_seconds=30.0, max_attempts=3):
+    """在当前进程中运行队列服务，直到进程被终止"""
+    _init_server(lease_seconds, max_attempts)
+    QueueManager(address=address, authkey=authkey).get_server().serve_forever()
+
+def connect_queue(address, authkey: bytes):
+    """连接队列服务，返回 JobQueue 的代理（各线程使用各自的连接）"""
+    manager = QueueManager(address=tuple(address), authkey=authkey)
+    manager.connect()
+    return manager.get_queue()
+
+class JobQueueClient:
+    """
+    协调方使用的队列客户端，提交任务后返回 concurrent.futures.Future
+
+    后台线程定时取回已完成任务的结果；失败的回测结果为None（与 BacktestRunner.run 一致）。
+    与队列服务的连接中断时，所有未完成的Future以该连接错误结束
+    """
+
+    def __init__(self, address, authkey: bytes, poll_interval=0.2):
+        self.queue = connect_queue(address, authkey)
+        self.poll_interval = poll_interval
+        self._futures: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._collector = None
+
+    def publish_data(self, arrays: Dict[str, np.ndarray], timeframe, compression, key: Optional[str] = None) -> str:
+        """把数据源的各列数组（ArrayData.arrays）发布到队列服务（已发布的跳过），返回数据指纹"""
+        arrays = line_arrays(arrays)
+        key = key or arrays_fingerprint(arrays)
+        if not self.queue.has_data(key):
+            self.queue.put_data(key, arrays, timeframe, compression)
+        return key
+
+    def submit(self, strategy_class, backtest_runner, data_key: str, params: Dict[str, Any],
+               rows: Optional[Tuple[int, int]] = None) -> Future:
+        """提交一个回测任务，rows 为数据的 [lo, hi) 行区间，None为全部数据"""
+        return self.submit_many(strategy_class, backtest_runner, data_key, [params], rows)[0]
+
+    def submit_many(self, strategy_class, backtest_runner, data_key: str, param_list: List[Dict[str, Any]],
+                    rows: Optional[Tuple[int, int]] = None) -> List[Future]:
+        base = {
+            'strategy': class_path(strategy_class),
+            'runner': class_path(type(backtest_runner)),
+            'runner_params': backtest_runner.get_params(),
+            'data': data_key,
+            'rows': rows,
+        }
+        job_ids = self.queue.submit([dict(base, params=params) for params in param_list])
+        futures = [Future() for _ in job_ids]
+        with self._lock:
+            self._futures.update(zip(job_ids, futures))
+            if self._collector is None:
+                self._collector = threading.Thread(target=self._collect_loop, daemon=True)
+                self._collector.start()
+        return futures
+
+    def map(self, strategy_class, data_feed, backtest_runner, param_list: List[Dict[str, Any]], progress=None,
+            timeout: Optional[float] = None) -> List[Optional[Dict[str, Any]]]:
+        """
+        在队列上回测一组参数，接口同 run_parallel
+
+        Args:
+            timeout: 等待全部结果的秒数，None为不限；超时抛出 TimeoutError，未完成的任务不再等待
+
+        Returns:
+            与param_list顺序一致的回测结果列表，失败的回测为None
+        """
+        p = data_feed.p
+        key = self.publish_data(data_feed.arrays, p.timeframe, p.compression, feed_fingerprint(data_feed))
+        futures = self.submit_many(strategy_class, backtest_runner, key, param_list)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        results = []
+        try:
+            for future in futures:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                results.append(future.result(remaining))
+                if progress:
+                    progress(len(results), len(param_list))
+        except TimeoutError:
+            self._forget(futures)
+            raise
+        return results
+
+    def _forget(self, futures):
+        """不再取回这些Future的结果"""
+        futures = set(futures)
+        with self._lock:
+            for job_id in [job_id for job_id, future in self._futures.items() if future in futures]:
+                self._futures.pop(job_id).cancel()
+
+    def _collect_loop(self):
+        while not self._stop.wait(self.poll_interval):
+            with self._lock:
+                job_ids = list(self._futures)
+            if not job_ids:
+                continue
+            try:
+                collected = self.queue.collect(job_ids)
+            except (OSError, EOFError) as e:
+                self._fail_pending(e)
+                return
+            for job_id, result in collected.items():
+                with self._lock:
+                    future = self._futures.pop(job_id, None)
+                if future is not None:
+                    future.set_result(result)
+
+    def _fail_pending(self, error):
+        """连接中断：未完成的Future全部以连接错误结束，之后提交的任务重新启动取回线程"""
+        with self._lock:
+            futures, self._futures = self._futures, {}
+            self._collector = None
+        if futures:
+            logging.getLogger(__name__).error(f"队列服务连接中断，{len(futures)} 个任务无法取回结果: {error!r}")
+        for future in futures.values():
+            future.set_exception(ConnectionError(f"队列服务连接中断: {error!r}"))
+
+    def close(self):
+        self._stop.set()
+        if self._collector is not None:
+            self._collector.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class QueueWorker:
+    """
+    从队列租用并执行回测任务的worker
+
+    数据按指纹只下载一次，运行器按配置复用；执行任务期间后台线程按
+    租约时长的1/3发送心跳
+    """
+
+    def __init__(self, address, authkey: bytes, worker_id=None, poll_interval=0.5):
+        self.queue = connect_queue(address, authkey)
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = self.queue.settings()['lease_seconds'] / 3
+        self.logger = logging.getLogger(__name__)
+        self._feeds = {}
+        self._runners = {}
+
+    def run(self, max_jobs=None, idle_timeout=None) -> int:
+        """
+        循环执行任务
+
+        Args:
+            max_jobs: 最多执行的任务数，None为不限
+            idle_timeout: 连续空闲超过该秒数后退出，None为一直等待
+
+        Returns:
+            执行的任务数
+        """
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat_loop, args=(stop,), daemon=True)
+        heartbeat.start()
+        done = 0
+        idle_since = time.monotonic()
+        try:
+            while max_jobs is None or done < max_jobs:
+                leased = self.queue.lease(self.worker_id)
+                if leased is None:
+                    if idle_timeout is not None and time.monotonic() - idle_since > idle_timeout:
+                        break
+                    time.sleep(self.poll_interval)
+                    continue
+                job_id, job = leased
+                self.queue.complete(job_id, self.worker_id, self._execute(job))
+                done += 1
+                idle_since = time.monotonic()
+        finally:
+            stop.set()
+            heartbeat.join()
+        return done
+
+    def _heartbeat_loop(self, stop):
+        while not stop.wait(self.heartbeat_interval):
+            try:
+                self.queue.heartbeat(self.worker_id)
+            except (OSError, EOFError):
+                self.logger.warning("队列服务连接中断，停止心跳")
+                return
+
+    def _execute(self, job):
+        try:
+            runner_key = (job['runner'], tuple(sorted(job['runner_params'].items())))
+            runner = self._runners.get(runner_key)
+            if runner is None:
+                runner = self._runners[runner_key] = import_class(job['runner'])(**job['runner_params'])
+            return runner.run(import_class(job['strategy']), self._feed(job['data'], job['rows']), job['params'])
+        except Exception as e:
+            self.logger.error(f"任务执行失败: {type(e).__name__}: {e}")
+            return None
+
+    def _feed(self, key, rows):
+        # 同一数据/窗口的数据源在worker内复用，数据指纹和指标缓存只需计算一次
+        # 窗口数据源是完整数据源的切片视图，不复制数据
+        feed = self._feeds.get((key, rows))
+        if feed is None:
+            if rows is None:
+                arrays, timeframe, compression = self.queue.get_data(key)
+                feed = ArrayData(arrays=arrays, timeframe=timeframe, compression=compression)
+                feed._maru_fingerprint = key
+            else:
+                feed = slice_feed(self._feed(key, None), *rows)
+            self._feeds[(key, rows)] = feed
+        return feed
+
+def _parse_address(text):
+    host, _, port = text.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="maru_quant 回测任务队列")
+    sub = parser.add_subparsers(dest='command', required=True)
+    serve = sub.add_parser('serve', help="运行队列服务")
+    serve.add_argument('--host', default='127.0.0.1', help="跨机器使用时指定对外地址，只在可信网络中开放")
+    serve.add_argument('--port', type=int, default=50000)
+    serve.add_argument('--lease-seconds', type=float, default=30.0)
+    serve.add_argument('--max-attempts', type=int, default=3)
+    worker = sub.add_parser('worker', help="运行worker")
+    worker.add_argument('--address', required=True, help="host:port")
+    worker.add_argument('--max-jobs', type=int, default=None)
+    worker.add_argument('--idle-timeout', type=float, default=None)
+    serve.add_argument('--authkey', default=None, help="不指定时随机生成并打印")
+    worker.add_argument('--authkey', required=True)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == 'serve':
+        if args.authkey is None:
+            args.authkey = secrets.token_hex(16)
+            print(f"authkey: {args.authkey}", flush=True)
+        serve_queue((args.host, args.port), args.authkey.encode(), args.lease_seconds, args.max_attempts)
+    else:
+        QueueWorker(_parse_address(args.address), args.authkey.encode()).run(args.max_jobs, args.idle_timeout)
+
+if __name__ == '__main__':
+    main()
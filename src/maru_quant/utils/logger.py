@@ -36,10 +36,12 @@ def setup_logger(name: str = "quant", level: str = "INFO", log_to_file: bool = T
     
     # 创建file handler
     if log_to_file:
-        # 固定项目根目录 (maru_quant目录)
-        current_file = os.path.abspath(__file__)
-        project_root = current_file.split('src')[0].rstrip(os.sep)
-        log_dir = os.path.join(project_root, 'log')
+        log_dir = config_manager.log_dir
+        if not log_dir:
+            # 固定项目根目录 (maru_quant目录)
+            current_file = os.path.abspath(__file__)
+            project_root = current_file.split('src')[0].rstrip(os.sep)
+            log_dir = os.path.join(project_root, 'log')
         os.makedirs(log_dir, exist_ok=True)
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         log_file = os.path.join(log_dir, f'{filename}_{timestamp}.log')
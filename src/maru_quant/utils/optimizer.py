@@ -1,91 +1,557 @@
 import backtrader as bt
 import itertools
+import math
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from contextlib import nullcontext
 import pandas as pd
 from typing import Dict, List, Any, Tuple
 from maru_quant.utils import config_manager
 from maru_quant.utils import BacktestRunner
+from maru_quant.utils.checkpoint import open_journal, params_key
+from maru_quant.utils.array_feed import slice_feed
 from maru_quant.utils.logger import get_logger, setup_logger
+from maru_quant.utils.param_grid import ParamGrid
+from maru_quant.utils.parallel import _run_batch, default_chunksize, map_batches, run_parallel, resolve_workers, worker_pool
+from maru_quant.utils.tpe import TPESampler
+from maru_quant.utils.vector_engine import VectorBacktestRunner
+
+METRIC_COLUMNS = ['sharpe_ratio', 'robust_sharpe', 'total_return', 'max_drawdown', 'win_rate', 'P/L_ratio', 'total_trade', 'avg_win', 'avg_loss', 'final_value', 'data_fraction']
+
+def results_to_frame(results: List[Dict[str, Any]]) -> pd.DataFrame:
+    """把回测结果列表转换为DataFrame，按夏普率降序排列"""
+    df_results = pd.DataFrame(results)
+    if not df_results.empty:
+        # 按夏普率降序排列
+        if 'sharpe_ratio' in df_results.columns:
+            df_results = df_results.sort_values('sharpe_ratio', ascending=False)
+    return df_results
+
+def select_best_params(results: List[Dict[str, Any]], metric='sharpe_ratio') -> Dict[str, Any]:
+    """从结果列表中取指标最大的参数组合（并列时取先出现的）"""
+    if not results:
+        return {}
+    
+    # 直接从results列表中找最佳结果，避免pandas类型转换
+    best_result = None
+    best_metric_value = float('-inf')
+    
+    for result in results:
+        if is_number(result.get(metric)) and result[metric] > best_metric_value:
+            best_metric_value = result[metric]
+            best_result = result
+    
+    if best_result is None:
+        return {}
+
+    # 提取参数（排除指标列）
+    return {k: v for k, v in best_result.items() if k not in METRIC_COLUMNS}
+
+def is_number(value) -> bool:
+    """指标值是否参与排名：None和NaN不参与（select_best_params、TopK 等共用此口径）"""
+    return value is not None and not (isinstance(value, float) and math.isnan(value))
+
+def grid_param_list(param_grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """参数网格的全部组合，顺序同 itertools.product；ParamGrid 只返回需要回测的组合"""
+    if isinstance(param_grid, ParamGrid):
+        return param_grid.param_list()
+    param_names = list(param_grid.keys())
+    return [dict(zip(param_names, combo)) for combo in itertools.product(*param_grid.values())]
 
 class GridSearchOptimizer:
-    def __init__(self, strategy_class, data_feed, cash=100000, commission=0.00015, stake=1, sizer_type="fixed", size_percent=100, tick_type="stock"):
+    # 断点续跑时每完成这么多组回测写一次日志
+    CHECKPOINT_BATCH = 64
+
+    def __init__(self, strategy_class, data_feed, cash=100000, commission=0.00015, stake=1, sizer_type="fixed", size_percent=100, tick_type="stock", use_cache=None, vectorized=False, mode="default", job_queue=None):
+        """
+        Args:
+            vectorized: 使用向量化回测引擎（VectorBacktestRunner），策略不支持时自动回退到Cerebro
+            mode: BacktestRunner 的运行模式，默认 'default'；不画图的批量优化可用 'lean'（见 lean_execution）
+            job_queue: JobQueueClient，给出时回测任务提交到队列，由各机器上的worker执行（忽略workers）
+        """
         self.strategy_class = strategy_class
         self.data_feed = data_feed
+        self.job_queue = job_queue
         self.results = []
         self.logger = setup_logger("grid search optimizer", config_manager.log_level, config_manager.log_to_file)
         
         # 创建BacktestRunner实例
-        self.backtest_runner = BacktestRunner(
+        runner_class = VectorBacktestRunner if vectorized else BacktestRunner
+        self.backtest_runner = runner_class(
             cash=cash,
             commission=commission,
             stake=stake,
             sizer_type=sizer_type,
             size_percent=size_percent,
-            tick_type=tick_type
+            tick_type=tick_type,
+            use_cache=use_cache,
+            mode=mode
         )
     
-    def optimize(self, param_grid: Dict[str, List[Any]], metrics=['sharpe_ratio', 'total_return', 'max_drawdown', 'win_rate', 'P/L_ratio']) -> pd.DataFrame:
+    def optimize(self, param_grid: Dict[str, List[Any]], metrics=['sharpe_ratio', 'total_return', 'max_drawdown', 'win_rate', 'P/L_ratio'],
+                 workers=None, chunksize=None, checkpoint=None) -> pd.DataFrame:
         """
         执行网格搜索优化
         
         Args:
             param_grid: 参数网格，格式如 {'param1': [value1, value2], 'param2': [value3, value4]}
             metrics: 要收集的指标列表
+            workers: 并行进程数，None或1为串行，-1为使用全部CPU核心
+            chunksize: 并行模式下每次派发给子进程的参数组数，默认自动计算
+            checkpoint: 断点日志路径（或 ResultJournal），完成的回测随时落盘，
+                        相同配置和数据重新运行时跳过已完成的参数组合
             
         Returns:
             包含所有参数组合和对应指标的DataFrame
         """
-        # 生成所有参数组合
-        param_names = list(param_grid.keys())
-        param_values = list(param_grid.values())
-        param_combinations = list(itertools.product(*param_values))
-        
-        self.logger.info(f"开始网格搜索，共 {len(param_combinations)} 组参数...")
-        
-        for i, param_combo in enumerate(param_combinations):
-            self.logger.info(f"网格搜索进度: {i+1}/{len(param_combinations)}")
-            
-            # 构建参数字典
-            params = dict(zip(param_names, param_combo))
-            
-            # 使用BacktestRunner运行单次回测
-            result = self.backtest_runner.run(
-                strategy_class=self.strategy_class,
-                data_feed=self.data_feed,
-                params=params
-            )
+        param_list = self._param_list(param_grid)
+        self.logger.info(f"开始网格搜索，共 {len(param_list)} 组参数...")
+        with open_journal(checkpoint, self.backtest_runner, self.strategy_class, self.data_feed,
+                          {'param_grid': param_grid}) as journal:
+            run_results = self._run_journaled(journal, self.data_feed, param_list, workers, chunksize, "网格搜索")
 
+        for params, result in zip(param_list, run_results):
             if result:
                 result.update(params)  # 添加参数到结果中
                 self.results.append(result)
         
-        # 转换为DataFrame并排序
-        df_results = pd.DataFrame(self.results)
-        if not df_results.empty:
-            # 按夏普率降序排列
-            if 'sharpe_ratio' in df_results.columns:
-                df_results = df_results.sort_values('sharpe_ratio', ascending=False)
+        return results_to_frame(self.results)
 
-        return df_results
+    def _param_list(self, param_grid):
+        """展开参数网格；ParamGrid 同时记录约束和去重节省的回测数"""
+        if isinstance(param_grid, ParamGrid):
+            self.logger.info(param_grid.describe())
+        return grid_param_list(param_grid)
+
+    def _run_journaled(self, journal, data_feed, param_list, workers, chunksize, label):
+        """
+        同 _run_params；给出断点日志时只运行日志中没有的参数组合，每 CHECKPOINT_BATCH 组写一次日志。
+        并行时整个运行共用一个进程池，每批完成后立即写入日志
+        """
+        if journal is None:
+            return self._run_params(data_feed, param_list, workers, chunksize, label)
+
+        keys = [params_key(params) for params in param_list]
+        pending = [j for j, key in enumerate(keys) if key not in journal]
+        if len(pending) < len(param_list):
+            self.logger.info(f"{label}: 断点日志中已有 {len(param_list) - len(pending)} 组结果，剩余 {len(pending)} 组")
+        workers = resolve_workers(workers)
+        if self.job_queue is None and workers > 1 and len(pending) > 1:
+            with self._pool(data_feed, workers) as executor:
+                self._run_pool_journaled(executor, journal, keys, param_list, pending, workers, chunksize, label)
+            return [journal.get(key) for key in keys]
+
+        for start in range(0, len(pending), self.CHECKPOINT_BATCH):
+            batch = pending[start:start + self.CHECKPOINT_BATCH]
+            results = self._run_params(data_feed, [param_list[j] for j in batch], workers, chunksize, label)
+            journal.record_many((keys[j], result) for j, result in zip(batch, results))
+        return [journal.get(key) for key in keys]
+
+    def _run_pool_journaled(self, executor, journal, keys, param_list, pending, workers, chunksize, label):
+        # 每批不超过 CHECKPOINT_BATCH 组，按完成顺序写入日志
+        size = min(chunksize or default_chunksize(len(pending), workers), self.CHECKPOINT_BATCH)
+        futures = {}
+        for start in range(0, len(pending), size):
+            batch = pending[start:start + size]
+            futures[executor.submit(_run_batch, [param_list[j] for j in batch])] = batch
+        done = 0
+        try:
+            while futures:
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    batch = futures.pop(future)
+                    journal.record_many((keys[j], result) for j, result in zip(batch, future.result()))
+                    done += len(batch)
+                    self.logger.info(f"{label}进度: {done}/{len(pending)}")
+        except BaseException:
+            # 出错或被中断时不再运行未开始的批次，已完成的结果都已写入日志
+            for future in futures:
+                future.cancel()
+            raise
+
+    def _pool(self, data_feed, workers):
+        """workers>1 且不使用任务队列时创建进程池（worker_pool），否则返回 nullcontext()"""
+        if self.job_queue is not None or workers <= 1:
+            return nullcontext()
+        self.logger.info(f"使用 {workers} 个进程并行回测")
+        return worker_pool(self.strategy_class, data_feed.arrays, data_feed.p.timeframe,
+                           data_feed.p.compression, self.backtest_runner, workers)
+
+    def _run_params(self, data_feed, param_list, workers, chunksize, label, executor=None):
+        """
+        在数据源上回测一组参数，返回与param_list顺序一致的结果（失败为None）。
+        executor 为 _pool 创建的进程池时在其上运行，不再新建进程池
+        """
+        workers = resolve_workers(workers)
+        progress = lambda done, total: self.logger.info(f"{label}进度: {done}/{total}")
+        if self.job_queue is not None:
+            return self.job_queue.map(self.strategy_class, data_feed, self.backtest_runner, param_list, progress)
+        if executor is not None:
+            return map_batches(executor, param_list, workers, chunksize, progress)
+        if workers > 1 and len(param_list) > 1:
+            self.logger.info(f"使用 {workers} 个进程并行回测")
+            return run_parallel(
+                strategy_class=self.strategy_class,
+                data_feed=data_feed,
+                backtest_runner=self.backtest_runner,
+                param_list=param_list,
+                workers=workers,
+                chunksize=chunksize,
+                progress=progress
+            )
+        # 向量化引擎在整批参数之间共享指标和开仓信号
+        return self.backtest_runner.run_batch(
+            strategy_class=self.strategy_class,
+            data_feed=data_feed,
+            param_list=param_list,
+            progress=progress
+        )
     
     def get_best_params(self, metric='sharpe_ratio') -> Dict[str, Any]:
         """获取最佳参数组合"""
-        if not self.results:
-            return {}
-        
-        # 直接从results列表中找最佳结果，避免pandas类型转换
-        best_result = None
-        best_metric_value = float('-inf')
-        
-        for result in self.results:
-            if metric in result and result[metric] > best_metric_value:
-                best_metric_value = result[metric]
-                best_result = result
-        
-        if best_result is None:
+        return select_best_params(self.results, metric)
+
+class SuccessiveHalvingOptimizer(GridSearchOptimizer):
+    """
+    逐轮淘汰的网格搜索（successive halving）
+
+    第一轮在数据开头 min_fraction 的前缀上回测全部组合，按 metric 保留排名前 1/eta 的组合；
+    下一轮把前缀长度乘以 eta，只回测上一轮保留下来的组合，直到使用全部数据。
+    明显较差的组合只在较短的数据上回测，总计算量约为全量网格搜索的 (轮数 / eta) 倍
+
+    结果DataFrame的列与 GridSearchOptimizer 相同，另有 data_fraction 列：
+    该组合最后一轮回测使用的数据比例，为1.0的组合才完整回测过
+    """
+
+    def optimize(self, param_grid: Dict[str, List[Any]], metrics=['sharpe_ratio', 'total_return', 'max_drawdown', 'win_rate', 'P/L_ratio'],
+                 workers=None, chunksize=None, metric='sharpe_ratio', eta=2, min_fraction=0.125) -> pd.DataFrame:
+        """
+        Args:
+            param_grid / metrics / workers / chunksize: 同 GridSearchOptimizer.optimize
+            metric: 淘汰依据的指标，越大越好，None视为最差
+            eta: 每轮保留 1/eta 的组合，数据长度乘以 eta
+            min_fraction: 第一轮使用的数据比例，需要足够长，保证指标预热后仍有交易
+
+        Returns:
+            每个组合最后一轮的结果，按 data_fraction、metric 降序排列
+        """
+        if eta <= 1:
+            raise ValueError(f"eta 必须大于1: {eta}")
+        if not 0 < min_fraction <= 1:
+            raise ValueError(f"min_fraction 必须在 (0, 1] 之间: {min_fraction}")
+        arrays = getattr(self.data_feed, 'arrays', None)
+        if arrays is None:
+            raise ValueError("逐轮淘汰需要按前缀截取数据，数据源必须是 make_feed 创建的 ArrayData")
+        length = len(arrays['datetime'])
+
+        fractions = []
+        fraction = min_fraction
+        while fraction < 1:
+            fractions.append(fraction)
+            fraction *= eta
+        fractions.append(1.0)
+
+        param_list = self._param_list(param_grid)
+        self.logger.info(f"开始逐轮淘汰搜索，共 {len(param_list)} 组参数，{len(fractions)} 轮，数据比例 {fractions}")
+
+        latest = {}  # 组合序号 -> 最后一轮成功的结果
+        survivors = list(range(len(param_list)))
+        for round_index, fraction in enumerate(fractions):
+            if fraction < 1:
+                data_feed = slice_feed(self.data_feed, 0, max(1, round(length * fraction)))
+            else:
+                data_feed = self.data_feed
+            run_results = self._run_params(data_feed, [param_list[i] for i in survivors], workers, chunksize,
+                                           f"第{round_index + 1}轮（数据比例 {fraction:g}）")
+
+            scored = []
+            for i, result in zip(survivors, run_results):
+                if result:
+                    result.update(param_list[i])
+                    result['data_fraction'] = fraction
+                    latest[i] = result
+                    scored.append((i, result.get(metric)))
+
+            # 按指标降序（None/NaN 排在最后，并列时保持网格顺序），保留前 1/eta
+            scored.sort(key=lambda item: -item[1] if is_number(item[1]) else math.inf)
+            survivors = [i for i, _ in scored[:max(1, math.ceil(len(scored) / eta))]]
+            self.logger.info(f"第{round_index + 1}轮完成，回测 {len(run_results)} 组，保留 {len(survivors)} 组")
+
+        self.results = [latest[i] for i in sorted(latest)]
+        df_results = pd.DataFrame(self.results)
+        if not df_results.empty and metric in df_results.columns:
+            df_results = df_results.sort_values(['data_fraction', metric], ascending=False)
+        return df_results
+
+    def get_best_params(self, metric='sharpe_ratio') -> Dict[str, Any]:
+        """只在完整回测过的组合中选取最佳参数"""
+        return select_best_params([r for r in self.results if r['data_fraction'] == 1.0], metric)
+
+class TPEOptimizer(GridSearchOptimizer):
+    """
+    基于TPE的序贯参数搜索（见 TPESampler），适合组合数远大于可承受回测次数的网格
+
+    每批按已有结果提议 batch_size 个未评估过的组合并回测，直到用完评估次数或时间预算，
+    或网格中的组合全部评估完。每批结束时记录当前最佳指标，
+    convergence_frame() 返回收敛过程，可与全量网格搜索的最佳结果比较
+    """
+
+    def optimize(self, param_grid: Dict[str, List[Any]], metrics=['sharpe_ratio', 'total_return', 'max_drawdown', 'win_rate', 'P/L_ratio'],
+                 workers=None, chunksize=None, metric='sharpe_ratio', max_evals=None, max_seconds=None,
+                 batch_size=None, seed=None, **sampler_params) -> pd.DataFrame:
+        """
+        Args:
+            param_grid / metrics / workers / chunksize: 同 GridSearchOptimizer.optimize；
+                ParamGrid 中不需要回测的组合被跳过，不计入评估次数
+            metric: 优化的指标，越大越好
+            max_evals: 最多回测的组合数，None为不限
+            max_seconds: 时间预算（秒），超过后不再提交新的一批，None为不限
+            batch_size: 每批提议的组合数，默认为进程数（串行时为1）
+            seed: 随机种子
+            sampler_params: 传给 TPESampler 的参数（gamma、n_startup 等）
+
+        Returns:
+            已评估组合的结果，按夏普率降序排列
+        """
+        workers = resolve_workers(workers)
+        batch_size = batch_size or workers
+        grid = param_grid if isinstance(param_grid, ParamGrid) else None
+        sampler = TPESampler(param_grid if grid is None else grid.values, seed=seed, **sampler_params)
+        self.history = []
+        self.logger.info(f"开始TPE搜索，网格共 {sampler.total} 组参数，预算: {max_evals} 次 / {max_seconds} 秒")
+
+        start = time.perf_counter()
+        evaluated = 0
+        best = None
+        # 整个搜索共用一个进程池，每批提议提交到同一个池中
+        with self._pool(self.data_feed, workers) as executor:
+            while not sampler.exhausted:
+                if max_evals is not None and evaluated >= max_evals:
+                    break
+                if max_seconds is not None and evaluated and time.perf_counter() - start >= max_seconds:
+                    break
+                count = batch_size if max_evals is None else min(batch_size, max_evals - evaluated)
+                batch = []
+                while len(batch) < count:
+                    indices = sampler.ask()
+                    if indices is None:
+                        break
+                    if grid is not None and not grid.allows(sampler.params(indices)):
+                        sampler.skip(indices)
+                        continue
+                    batch.append(indices)
+                if not batch:
+                    break
+                param_list = [sampler.params(indices) for indices in batch]
+                run_results = self._run_params(self.data_feed, param_list, workers, chunksize, "TPE搜索", executor)
+
+                for indices, params, result in zip(batch, param_list, run_results):
+                    score = result.get(metric) if result else None
+                    sampler.tell(indices, score)
+                    if result:
+                        result.update(params)
+                        self.results.append(result)
+                        if is_number(score) and (best is None or score > best):
+                            best = score
+                evaluated += len(batch)
+
+                elapsed = time.perf_counter() - start
+                self.history.append({'evaluations': evaluated, 'seconds': elapsed, f'best_{metric}': best})
+                self.logger.info(f"TPE搜索: 已评估 {evaluated}/{sampler.total} 组，用时 {elapsed:.1f} 秒，当前最佳 {metric}={best}")
+
+        return results_to_frame(self.results)
+
+    def convergence_frame(self) -> pd.DataFrame:
+        """每批结束时的评估次数、用时和当前最佳指标"""
+        return pd.DataFrame(self.history)
+
+class StreamingGridSearchOptimizer(GridSearchOptimizer):
+    """
+    内存占用与网格大小无关的网格搜索，适合10^5组以上的参数
+
+    参数组合按 batch_size 分批惰性生成，每批回测完成后结果追加写入 result_path 的列式文件
+    （见 ColumnarResultWriter），内存中只为 metrics 中的每个指标保留最大的 top_k 个结果。
+    self.results 不再保存全部结果，完整结果用 read_results() 从文件读取
+    """
+
+    def __init__(self, *args, result_path, top_k=100, batch_size=1000, **kwargs):
+        """
+        Args:
+            result_path: 结果目录，已存在时在其后追加
+            top_k: 每个指标保留的结果数
+            batch_size: 每批生成和回测的参数组数
+            其他参数: 同 GridSearchOptimizer
+        """
+        super().__init__(*args, **kwargs)
+        self.result_path = result_path
+        self.top_k = top_k
+        self.batch_size = batch_size
+        self.top = {}  # 指标 -> TopK
+
+    def optimize(self, param_grid: Dict[str, List[Any]], metrics=['sharpe_ratio', 'total_return', 'max_drawdown', 'win_rate', 'P/L_ratio'],
+                 workers=None, chunksize=None) -> pd.DataFrame:
+        """
+        Returns:
+            sharpe_ratio 最大的 top_k 个结果（sharpe_ratio 不在 metrics 中时取 metrics[0]），按该指标降序
+        """
+        # result_stream 依赖本模块的 is_number，在使用时导入以免循环导入
+        from maru_quant.utils.result_stream import ColumnarResultWriter, TopK
+
+        self.top = {metric: TopK(self.top_k, metric) for metric in metrics}
+        if isinstance(param_grid, ParamGrid):
+            self.logger.info(param_grid.describe())
+            total = len(param_grid)
+            combos = iter(param_grid)
+        else:
+            param_names = list(param_grid.keys())
+            total = math.prod(len(values) for values in param_grid.values())
+            combos = (dict(zip(param_names, combo)) for combo in itertools.product(*param_grid.values()))
+        self.logger.info(f"开始流式网格搜索，共 {total} 组参数，结果写入 {self.result_path}")
+
+        done = 0
+        with ColumnarResultWriter(self.result_path) as writer:
+            while True:
+                param_list = list(itertools.islice(combos, self.batch_size))
+                if not param_list:
+                    break
+                run_results = self._run_params(self.data_feed, param_list, workers, chunksize, "流式网格搜索")
+                for params, result in zip(param_list, run_results):
+                    if result:
+                        result.update(params)
+                        writer.append(result)
+                        for top in self.top.values():
+                            top.push(result)
+                writer.flush()
+                done += len(param_list)
+                self.logger.info(f"流式网格搜索: 已完成 {done}/{total} 组")
+
+        metric = 'sharpe_ratio' if 'sharpe_ratio' in self.top else metrics[0]
+        return pd.DataFrame(self.top[metric].results())
+
+    def get_best_params(self, metric='sharpe_ratio') -> Dict[str, Any]:
+        """最佳参数，取自该指标的TopK（需在 optimize 的 metrics 中）"""
+        best = self.top[metric].best()
+        if best is None:
             return {}
+        return {k: v for k, v in best.items() if k not in METRIC_COLUMNS}
 
-        # 提取参数（排除指标列）
-        metric_cols = ['sharpe_ratio', 'total_return', 'max_drawdown', 'win_rate', 'P/L_ratio', 'total_trade', 'avg_win', 'avg_loss', 'final_value']
-        param_dict = {k: v for k, v in best_result.items() if k not in metric_cols}
-        
-        return param_dict
\ No newline at end of file
+    def read_results(self) -> pd.DataFrame:
+        """从结果文件读取全部结果，按夏普率降序排列"""
+        from maru_quant.utils.result_stream import read_columnar
+
+        return results_to_frame(read_columnar(self.result_path))
+
+class CoarseToFineOptimizer(GridSearchOptimizer):
+    """
+    由粗到细的网格搜索
+
+    先回测粗网格，之后每一轮把数值参数的步长减半，只在当前 metric 最好的 top_n 个组合附近加密：
+    每个数值参数取 当前值 ± 步长，其他参数保持不变，已回测过的组合不再回测。
+    整数参数的步长最小为1，加密的取值不超出原网格的范围。
+    结果的 refine_round 列为该组合被回测的轮次（0为粗网格）；
+    dense_combos 为与最后一轮分辨率相同的稠密网格的组合数
+    """
+
+    def optimize(self, param_grid: Dict[str, List[Any]], metrics=['sharpe_ratio', 'total_return', 'max_drawdown', 'win_rate', 'P/L_ratio'],
+                 workers=None, chunksize=None, metric='sharpe_ratio', rounds=3, top_n=3) -> pd.DataFrame:
+        """
+        Args:
+            param_grid / metrics / workers / chunksize: 同 GridSearchOptimizer.optimize；
+                ParamGrid 的约束同样用于加密出的组合
+            metric: 选取加密区域的指标，越大越好
+            rounds: 加密的轮数
+            top_n: 每轮在多少个最好的组合附近加密
+
+        Returns:
+            所有轮次的结果，按夏普率降序排列
+        """
+        if rounds < 0:
+            raise ValueError(f"rounds 不能为负数: {rounds}")
+        if top_n < 1:
+            raise ValueError(f"top_n 必须为正整数: {top_n}")
+        grid = param_grid if isinstance(param_grid, ParamGrid) else None
+        values = param_grid if grid is None else grid.values
+
+        # 可加密的参数：至少两个不同取值的数值参数，初始步长为相邻取值的最小间距
+        steps, bounds, integer = {}, {}, {}
+        for name, param_values in values.items():
+            if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in param_values):
+                continue
+            unique = sorted(set(param_values))
+            if len(unique) < 2:
+                continue
+            steps[name] = min(b - a for a, b in zip(unique, unique[1:]))
+            bounds[name] = (unique[0], unique[-1])
+            integer[name] = all(isinstance(v, int) for v in param_values)
+
+        def key(params):
+            # 浮点参数的 5 与 5.0 是同一个组合
+            return params_key({k: float(v) if k in steps and not integer[k] else v for k, v in params.items()})
+
+        self.results = []
+        evaluated = set()
+        param_list = self._param_list(param_grid)
+        self.logger.info(f"开始由粗到细搜索，粗网格 {len(param_list)} 组参数，加密 {rounds} 轮，每轮 top {top_n}")
+        for round_index in range(rounds + 1):
+            if round_index > 0:
+                finer = {k: max(1, step // 2) if integer[k] else step / 2 for k, step in steps.items()}
+                param_list = self._refine(metric, top_n, list(values), finer, bounds, integer, grid, evaluated, key)
+                if not param_list:
+                    self.logger.info(f"第{round_index}轮加密没有新的组合，提前结束")
+                    break
+                steps = finer  # 只记录实际运行过的轮次的步长
+            label = "粗网格" if round_index == 0 else f"第{round_index}轮加密"
+            run_results = self._run_params(self.data_feed, param_list, workers, chunksize, label)
+            for params, result in zip(param_list, run_results):
+                evaluated.add(key(params))
+                if result:
+                    result.update(params)
+                    result['refine_round'] = round_index
+                    self.results.append(result)
+            best = self.get_best_params(metric)
+            self.logger.info(f"{label}完成，回测 {len(param_list)} 组，累计 {len(evaluated)} 组，当前最佳参数: {best}")
+
+        # 按最后一轮实际使用的步长计算稠密网格的组合数
+        self.dense_combos = 1
+        for name, param_values in values.items():
+            if name in steps:
+                lo, hi = bounds[name]
+                self.dense_combos *= int(round((hi - lo) / steps[name])) + 1
+            else:
+                self.dense_combos *= len(param_values)
+        self.logger.info(f"由粗到细搜索共回测 {len(evaluated)} 组，同等分辨率的稠密网格需要 {self.dense_combos} 组")
+        return results_to_frame(self.results)
+
+    def get_best_params(self, metric='sharpe_ratio') -> Dict[str, Any]:
+        best = select_best_params(self.results, metric)
+        best.pop('refine_round', None)
+        return best
+
+    def _refine(self, metric, top_n, names, steps, bounds, integer, grid, evaluated, key) -> List[Dict[str, Any]]:
+        """在 metric 最好的 top_n 个组合附近生成未回测过的组合"""
+        ranked = sorted((r for r in self.results if is_number(r.get(metric))), key=lambda r: r[metric], reverse=True)
+        candidates = {}
+        for result in ranked[:top_n]:
+            axes = []
+            for name in names:
+                value = result[name]
+                if name not in steps:
+                    axes.append([value])
+                    continue
+                lo, hi = bounds[name]
+                axis = []
+                for x in (value - steps[name], value, value + steps[name]):
+                    x = min(max(x, lo), hi)
+                    x = int(x) if integer[name] else round(x, 10)
+                    if x not in axis:
+                        axis.append(x)
+                axes.append(axis)
+            for combo in itertools.product(*axes):
+                params = dict(zip(names, combo))
+                k = key(params)
+                if k in evaluated or k in candidates:
+                    continue
+                if grid is not None and not grid.allows(params):
+                    continue
+                candidates[k] = params
+        return list(candidates.values())
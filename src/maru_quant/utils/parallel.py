@@ -0,0 +1,175 @@
+import os
+import importlib
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+
+from maru_quant.utils.array_feed import ArrayData, slice_feed
+
+# 子进程内的运行状态，由 _init_worker 初始化一次，之后所有任务复用
+_worker_state = {}
+
+def class_path(cls) -> str:
+    """类的导入路径，格式 module:QualName"""
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+def import_class(path: str):
+    """根据 module:QualName 导入类（子进程中需要重新导入策略模块）"""
+    module_name, _, qualname = path.partition(':')
+    obj = importlib.import_module(module_name)
+    for attr in qualname.split('.'):
+        obj = getattr(obj, attr)
+    return obj
+
+def resolve_workers(workers: Optional[int]) -> int:
+    """workers为None或1时串行；-1表示使用全部CPU核心"""
+    if workers is None:
+        return 1
+    if workers < 0:
+        return os.cpu_count() or 1
+    return max(workers, 1)
+
+def default_chunksize(num_tasks: int, workers: int) -> int:
+    # 每个进程大约分到4批，兼顾负载均衡和进程间通信开销
+    return max(1, num_tasks // (workers * 4))
+
+class SharedArrays:
+    """
+    把数据源的各列数组（ArrayData.arrays）发布到一块共享内存
+
+    父进程发布一次，各列在共享内存中连续存放；子进程通过 descriptor 挂载同一块内存，
+    各列的只读视图直接作为 ArrayData 的数组，不需要把数据pickle或复制到每个进程/任务
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        names = list(arrays)
+        length = len(arrays[names[0]]) if names else 0
+        self._shm = shared_memory.SharedMemory(create=True, size=max(len(names) * length * 8, 1))
+        matrix = np.ndarray((len(names), length), dtype=np.float64, buffer=self._shm.buf)
+        for i, name in enumerate(names):
+            matrix[i] = arrays[name]
+        del matrix  # 释放对共享内存的引用，close 时才能解除映射
+        self.descriptor = {'name': self._shm.name, 'columns': names, 'length': length}
+
+    def close(self):
+        """释放共享内存（只能由发布方调用）"""
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def attach_shared_arrays(descriptor: Dict[str, Any]):
+    """
+    在子进程中挂载共享内存中的数组
+
+    Returns:
+        ({列名: 只读数组视图}, handle)，handle需要在使用期间保持引用，否则内存会被回收
+    """
+    shm = shared_memory.SharedMemory(name=descriptor['name'])
+    matrix = np.ndarray((len(descriptor['columns']), descriptor['length']), dtype=np.float64, buffer=shm.buf)
+    matrix.flags.writeable = False
+    return dict(zip(descriptor['columns'], matrix)), shm
+
+def _init_worker(strategy_path, runner_path, runner_params, descriptor, timeframe, compression):
+    arrays, handle = attach_shared_arrays(descriptor)
+    _worker_state['shm_handle'] = handle
+    _worker_state['strategy_class'] = import_class(strategy_path)
+    _worker_state['runner'] = import_class(runner_path)(**runner_params)
+    # 数据源直接引用共享内存，窗口数据源是它的切片视图
+    _worker_state['data_feed'] = ArrayData(arrays=arrays, timeframe=timeframe, compression=compression)
+    _worker_state['slice_feeds'] = {}
+
+def _run_batch(param_list: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+    # 一批参数交给 run_batch，向量化引擎可以在批内共享指标
+    return _worker_state['runner'].run_batch(
+        strategy_class=_worker_state['strategy_class'],
+        data_feed=_worker_state['data_feed'],
+        param_list=param_list
+    )
+
+def _slice_feed(lo: int, hi: int):
+    # 同一窗口的数据源在子进程内复用，数据指纹只需计算一次
+    feeds = _worker_state['slice_feeds']
+    feed = feeds.get((lo, hi))
+    if feed is None:
+        feed = feeds[(lo, hi)] = slice_feed(_worker_state['data_feed'], lo, hi)
+    return feed
+
+def run_slice(lo: int, hi: int, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """在子进程中对共享数据的 [lo, hi) 行运行一次回测，供 worker_pool 提交任务使用"""
+    return _worker_state['runner'].run(
+        strategy_class=_worker_state['strategy_class'],
+        data_feed=_slice_feed(lo, hi),
+        params=params
+    )
+
+@contextmanager
+def worker_pool(strategy_class, arrays: Dict[str, np.ndarray], timeframe, compression, backtest_runner, workers: int):
+    """
+    创建回测进程池：数据发布到共享内存，每个子进程初始化一次策略和BacktestRunner
+
+    Args:
+        strategy_class: 策略类（必须可以按模块路径导入）
+        arrays: 完整数据的各列数组（ArrayData.arrays），子进程通过共享内存只读访问
+        timeframe: 数据源时间周期
+        compression: 数据源周期压缩
+        backtest_runner: BacktestRunner（或其子类）实例，子进程中按相同类型和配置重建
+        workers: 进程数
+
+    Yields:
+        ProcessPoolExecutor，可提交 _run_batch 或 run_slice 任务
+    """
+    with SharedArrays(arrays) as shared:
+        initargs = (
+            class_path(strategy_class),
+            class_path(type(backtest_runner)),
+            backtest_runner.get_params(),
+            shared.descriptor,
+            timeframe,
+            compression,
+        )
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as executor:
+            yield executor
+
+def run_parallel(strategy_class, data_feed, backtest_runner, param_list: List[Dict[str, Any]],
+                 workers: int, chunksize: Optional[int] = None, progress=None) -> List[Optional[Dict[str, Any]]]:
+    """
+    用进程池并行运行一组回测
+
+    Args:
+        strategy_class: 策略类（必须可以按模块路径导入）
+        data_feed: make_feed 创建的数据源，各列发布到共享内存后在子进程中重建
+        backtest_runner: BacktestRunner实例，子进程中按相同配置重建
+        param_list: 参数字典列表
+        workers: 进程数
+        chunksize: 每次派发给子进程的参数组数，默认自动计算
+        progress: 可选回调 progress(done, total)
+
+    Returns:
+        与param_list顺序一致的回测结果列表，失败的回测为None
+    """
+    with worker_pool(strategy_class, data_feed.arrays, data_feed.p.timeframe,
+                     data_feed.p.compression, backtest_runner, workers) as executor:
+        return map_batches(executor, param_list, workers, chunksize, progress)
+
+def map_batches(executor, param_list: List[Dict[str, Any]], workers: int, chunksize: Optional[int] = None,
+                progress=None) -> List[Optional[Dict[str, Any]]]:
+    """在已创建的 worker_pool 上回测一组参数，参数和返回值同 run_parallel；多次调用可复用同一个进程池"""
+    if chunksize is None:
+        chunksize = default_chunksize(len(param_list), workers)
+
+    chunks = [param_list[i:i + chunksize] for i in range(0, len(param_list), chunksize)]
+    results = []
+    # map 按提交顺序返回结果，保证与串行模式顺序一致
+    for chunk_results in executor.map(_run_batch, chunks):
+        results.extend(chunk_results)
+        if progress:
+            progress(len(results), len(param_list))
+    return results
@@ -0,0 +1,151 @@
+"""
+带约束和去重的参数网格
+
+ParamGrid 在回测之前就去掉不需要回测的组合：
+  - 参数名必须是策略声明的参数，拼错或多余的参数直接报错，不会静默地按默认值回测
+  - constraints 中的表达式不成立的组合不回测，如 'take_profit_atr >= 0.5 * stop_loss_atr'
+  - ignore_when 中的条件成立时该参数不影响结果，只回测该参数取网格中第一个值的组合
+  - 同一参数重复的取值只保留一个
+表达式只支持参数名、数值/字符串常量、算术、比较、and/or/not 以及 abs/min/max。
+"""
+import ast
+import itertools
+import math
+from typing import Any, Dict, List, Optional
+
+_FUNCTIONS = {'abs': abs, 'min': min, 'max': max}
+_ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd,
+    ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.In, ast.NotIn,
+    ast.Name, ast.Load, ast.Constant, ast.Tuple, ast.List, ast.Call,
+)
+
+def _compile(expression: str, names) -> Any:
+    """编译约束表达式，只允许白名单中的语法和已知的参数名"""
+    tree = ast.parse(expression, mode='eval')
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"约束表达式不支持 {type(node).__name__}: {expression}")
+        if isinstance(node, ast.Call) and not (isinstance(node.func, ast.Name) and node.func.id in _FUNCTIONS and not node.keywords):
+            raise ValueError(f"约束表达式只能调用 {sorted(_FUNCTIONS)}: {expression}")
+        if isinstance(node, ast.Name) and node.id not in names and node.id not in _FUNCTIONS:
+            raise ValueError(f"约束表达式引用了未知参数 {node.id}: {expression}")
+    return compile(tree, f'<constraint {expression}>', 'eval')
+
+def _unique(values) -> List[Any]:
+    unique = []
+    for value in values:
+        if value not in unique:
+            unique.append(value)
+    return unique
+
+class ParamGrid:
+    """
+    参数网格，可直接传给 GridSearchOptimizer / SuccessiveHalvingOptimizer / StreamingGridSearchOptimizer
+    和 WalkForwardAnalyzer 代替参数字典。组合按 itertools.product 的顺序惰性生成
+
+    Args:
+        param_grid: 参数网格，格式如 {'param1': [value1, value2], 'param2': [value3, value4]}
+        strategy_class: 给出时校验参数名；表达式中可以引用不在网格中的策略参数（取默认值）
+        constraints: 约束表达式列表，全部成立的组合才回测
+        ignore_when: {参数: 条件表达式}，条件成立时该参数不影响回测结果，
+                     例如 {'max_hold_bars': 'not use_time_exit'}
+    """
+
+    def __init__(self, param_grid: Dict[str, List[Any]], strategy_class=None,
+                 constraints: Optional[List[str]] = None, ignore_when: Optional[Dict[str, str]] = None):
+        self.grid = {name: list(values) for name, values in param_grid.items()}
+        self.strategy_class = strategy_class
+        self.constraints = list(constraints or [])
+        self.ignore_when = dict(ignore_when or {})
+
+        if any(len(values) == 0 for values in self.grid.values()):
+            raise ValueError("参数网格中每个参数至少需要一个取值")
+        self.defaults = {}
+        if strategy_class is not None:
+            declared = list(strategy_class.params._getkeys())
+            unknown = [name for name in self.grid if name not in declared]
+            if unknown:
+                raise ValueError(f"{strategy_class.__name__} 未声明的参数: {unknown}，可用参数: {declared}")
+            self.defaults = {name: getattr(strategy_class.params, name) for name in declared}
+        unknown = [name for name in self.ignore_when if name not in self.grid]
+        if unknown:
+            raise ValueError(f"ignore_when 中的参数不在网格中: {unknown}")
+
+        names = set(self.grid) | set(self.defaults)
+        self._constraints = [_compile(expression, names) for expression in self.constraints]
+        self._ignore_when = [(name, _compile(expression, names)) for name, expression in self.ignore_when.items()]
+        self._values = {name: _unique(values) for name, values in self.grid.items()}
+        self._stats = None
+
+    @property
+    def values(self) -> Dict[str, List[Any]]:
+        """去掉重复取值后的网格"""
+        return self._values
+
+    def _status(self, params: Dict[str, Any]) -> str:
+        """'ok'、'duplicate'（被忽略的参数不取第一个值）或 'pruned'（不满足约束）"""
+        scope = dict(self.defaults, **params)
+        if any(params[name] != self._values[name][0] and eval(code, {'__builtins__': _FUNCTIONS}, scope)
+               for name, code in self._ignore_when):
+            return 'duplicate'
+        if all(eval(code, {'__builtins__': _FUNCTIONS}, scope) for code in self._constraints):
+            return 'ok'
+        return 'pruned'
+
+    def allows(self, params: Dict[str, Any]) -> bool:
+        """该组合是否需要回测"""
+        return self._status(params) == 'ok'
+
+    def _scan(self):
+        names = list(self._values)
+        for combo in itertools.product(*self._values.values()):
+            params = dict(zip(names, combo))
+            yield params, self._status(params)
+
+    def __iter__(self):
+        return (params for params, status in self._scan() if status == 'ok')
+
+    def param_list(self) -> List[Dict[str, Any]]:
+        return list(self)
+
+    def __len__(self):
+        return self.stats['combos']
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """
+        total: 原始网格的组合数；pruned: 约束去掉的组合数；
+        duplicate: 重复取值和被忽略参数合并掉的组合数；combos: 实际回测的组合数
+        """
+        if self._stats is None:
+            total = math.prod(len(values) for values in self.grid.values())
+            counts = {'ok': 0, 'duplicate': 0, 'pruned': 0}
+            for _, status in self._scan():
+                counts[status] += 1
+            unique_total = math.prod(len(values) for values in self._values.values())
+            self._stats = {
+                'total': total,
+                'pruned': counts['pruned'],
+                'duplicate': counts['duplicate'] + total - unique_total,
+                'combos': counts['ok'],
+            }
+        return self._stats
+
+    @property
+    def saved(self) -> int:
+        """与原始网格相比少跑的回测数"""
+        return self.stats['total'] - self.stats['combos']
+
+    def describe(self) -> str:
+        stats = self.stats
+        ratio = self.saved / stats['total'] if stats['total'] else 0
+        return (f"参数网格共 {stats['total']} 组，约束剪掉 {stats['pruned']} 组，合并重复 {stats['duplicate']} 组，"
+                f"实际回测 {stats['combos']} 组（节省 {self.saved} 次回测，{ratio:.1%}）")
+
+    def __repr__(self):
+        # 断点日志用 repr 计算运行指纹，必须只依赖网格内容
+        strategy = None if self.strategy_class is None else f"{self.strategy_class.__module__}.{self.strategy_class.__qualname__}"
+        return (f"ParamGrid({self.grid!r}, strategy_class={strategy}, constraints={self.constraints!r}, "
+                f"ignore_when={self.ignore_when!r})")
@@ -0,0 +1,189 @@
+import os
+import sys
+import json
+import types
+import hashlib
+import functools
+import inspect
+import datetime
+from typing import Dict, Any, Optional
+
+import numpy as np
+from peewee import SqliteDatabase, Model, CharField, TextField, DateTimeField, fn
+
+from maru_quant.utils.config_manager import config_manager
+
+class CachedResult(Model):
+    """一条回测结果缓存"""
+    key = CharField(primary_key=True)
+    strategy = CharField()
+    result = TextField()  # 结果字典的JSON
+    created_at = DateTimeField(default=datetime.datetime.now)
+
+    class Meta:
+        table_name = 'backtest_results'
+
+def _module_sources(module_name: str, seen: set) -> list:
+    """模块源码，以及该模块直接或间接引用的全部 maru_quant 模块源码（如策略用到的指标及其依赖）"""
+    if module_name in seen or module_name not in sys.modules:
+        return []
+    seen.add(module_name)
+    module = sys.modules[module_name]
+    sources = []
+    try:
+        sources.append(inspect.getsource(module))
+    except (OSError, TypeError):
+        pass  # 空的 __init__ 等没有源码，仍然继续查找它引用的模块
+    for value in list(vars(module).values()):
+        if isinstance(value, types.ModuleType):
+            name = value.__name__
+        else:
+            name = getattr(value, '__module__', None)
+        if isinstance(name, str) and name.startswith('maru_quant'):
+            sources.extend(_module_sources(name, seen))
+    return sources
+
+@functools.lru_cache(maxsize=None)
+def source_hash(*module_names: str) -> str:
+    """
+    代码指纹：给定模块以及这些模块（传递地）引用的 maru_quant 模块的源码哈希
+
+    已导入模块的代码在进程内不会变化，每组模块只计算一次
+    """
+    h = hashlib.sha1()
+    seen = set()
+    for module_name in module_names:
+        for source in _module_sources(module_name, seen):
+            h.update(source.encode('utf-8'))
+    return h.hexdigest()
+
+def strategy_source_hash(strategy_class) -> str:
+    """策略代码指纹：策略类及其父类所在模块（含策略用到的指标模块）"""
+    return source_hash(*[
+        cls.__module__ for cls in strategy_class.__mro__
+        if not cls.__module__.startswith('backtrader') and cls.__module__ != 'builtins'
+    ])
+
+def make_cache_key(strategy_class, params: Dict[str, Any], data_fingerprint: str,
+                   broker_params: Dict[str, Any], runner_hash: str = '',
+                   data_params: Optional[Dict[str, Any]] = None) -> str:
+    """
+    生成缓存key
+
+    Args:
+        strategy_class: 策略类
+        params: 策略参数
+        data_fingerprint: 数据内容指纹
+        broker_params: 资金、佣金、仓位管理等配置
+        runner_hash: 回测运行器（分析器）代码指纹，结果字段变化时自动失效
+        data_params: 数据源的周期和日期范围（timeframe/compression/fromdate/todate），
+                     相同数据按不同周期或范围回测时结果不同
+    """
+    payload = json.dumps({
+        'strategy': f"{strategy_class.__module__}.{strategy_class.__qualname__}",
+        'source': strategy_source_hash(strategy_class),
+        'runner': runner_hash,
+        'params': params,
+        'data': data_fingerprint,
+        'data_params': data_params or {},
+        'broker': broker_params,
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _json_default(value):
+    """结果字典中的NumPy数值/数组和日期转换为JSON类型，其他类型照常报错"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"无法序列化为JSON的类型: {type(value).__name__}")
+
+class ResultCache:
+    """
+    基于SQLite的回测结果缓存
+
+    相同 (策略代码, 参数, 数据, 资金/佣金配置) 的回测直接返回已存储的结果
+    """
+
+    def __init__(self, path: str, max_age_days: Optional[float] = None, max_entries: Optional[int] = None):
+        """
+        Args:
+            path: SQLite文件路径
+            max_age_days: 超过该天数的结果在打开时淘汰，None为不限
+            max_entries: 最多保留的结果条数，超出时淘汰最旧的，None为不限
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.db = SqliteDatabase(path, pragmas={'journal_mode': 'wal', 'busy_timeout': 30000})
+        with self.db.bind_ctx([CachedResult]):
+            self.db.create_tables([CachedResult], safe=True)
+        self.evict(max_age_days, max_entries)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """命中时返回结果字典（新对象，可随意修改），否则返回None"""
+        with self.db.bind_ctx([CachedResult]):
+            row = CachedResult.get_or_none(CachedResult.key == key)
+        if row is None:
+            return None
+        return json.loads(row.result)
+
+    def put(self, key: str, strategy_name: str, result: Dict[str, Any]):
+        with self.db.bind_ctx([CachedResult]):
+            CachedResult.replace(
+                key=key,
+                strategy=strategy_name,
+                result=json.dumps(result, default=_json_default),
+                created_at=datetime.datetime.now()
+            ).execute()
+
+    def evict(self, max_age_days: Optional[float] = None, max_entries: Optional[int] = None) -> int:
+        """
+        淘汰缓存
+
+        Args:
+            max_age_days: 删除早于该天数的结果
+            max_entries: 只保留最新的 max_entries 条
+
+        Returns:
+            删除的条数
+        """
+        removed = 0
+        with self.db.bind_ctx([CachedResult]):
+            if max_age_days is not None:
+                cutoff = datetime.datetime.now() - datetime.timedelta(days=max_age_days)
+                removed += CachedResult.delete().where(CachedResult.created_at < cutoff).execute()
+            if max_entries is not None:
+                total = CachedResult.select(fn.COUNT(CachedResult.key)).scalar()
+                if total > max_entries:
+                    oldest = (CachedResult.select(CachedResult.key)
+                              .order_by(CachedResult.created_at)
+                              .limit(total - max_entries))
+                    removed += CachedResult.delete().where(CachedResult.key.in_(oldest)).execute()
+        return removed
+
+    def clear(self):
+        """清空全部缓存"""
+        with self.db.bind_ctx([CachedResult]):
+            CachedResult.delete().execute()
+
+    def __len__(self):
+        with self.db.bind_ctx([CachedResult]):
+            return CachedResult.select().count()
+
+# 每个进程按路径复用一个实例；fork出的子进程不能共用父进程的SQLite连接
+_caches = {}
+
+def get_result_cache(path: Optional[str] = None) -> ResultCache:
+    """获取（必要时创建）默认的回测结果缓存，路径为 cache_dir/backtest_results.db"""
+    path = path or os.path.join(config_manager.cache_dir, 'backtest_results.db')
+    entry = _caches.get(path)
+    if entry is None or entry[0] != os.getpid():
+        cache = ResultCache(
+            path,
+            max_age_days=config_manager.result_cache_max_age_days,
+            max_entries=config_manager.result_cache_max_entries
+        )
+        entry = _caches[path] = (os.getpid(), cache)
+    return entry[1]
@@ -0,0 +1,221 @@
+"""
+大规模参数搜索的结果流式落盘
+
+ColumnarResultWriter 把回测结果按列追加写入目录中的二进制文件（每列一个文件），
+内存中只缓冲 flush_rows 行；read_columnar 读回为DataFrame。
+TopK 在内存中只保留某个指标最大的K个结果，最佳结果随时可取。
+"""
+import heapq
+import json
+import numbers
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from maru_quant.utils.optimizer import is_number
+
+SCHEMA_FILE = 'schema.json'
+
+class TopK:
+    """
+    指标最大的K个结果（最小堆），与 select_best_params 口径一致：
+    None/NaN不参与排名，并列时先出现的优先
+
+    Args:
+        k: 保留的结果数
+        metric: 排名依据的指标
+    """
+
+    def __init__(self, k: int, metric: str):
+        if k < 1:
+            raise ValueError(f"k 必须为正整数: {k}")
+        self.k = k
+        self.metric = metric
+        self._heap = []  # (指标值, -序号, 结果)，堆顶为当前第K名
+        self._best = None
+        self._seq = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, result: Dict[str, Any]):
+        """加入一个结果，O(log K)"""
+        seq = self._seq
+        self._seq += 1
+        value = result.get(self.metric)
+        if not is_number(value):
+            return
+        entry = (value, -seq, result)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+        if self._best is None or value > self._best[0]:
+            self._best = entry
+
+    def best(self) -> Optional[Dict[str, Any]]:
+        """指标最大的结果，O(1)"""
+        return None if self._best is None else self._best[2]
+
+    def results(self) -> List[Dict[str, Any]]:
+        """保留的结果，按指标降序（并列时按出现顺序）"""
+        return [entry[2] for entry in sorted(self._heap, key=lambda e: e[:2], reverse=True)]
+
+class ColumnarResultWriter:
+    """
+    只追加的列式结果文件：path 目录下每列一个二进制文件，schema.json 记录列类型和已提交的行数
+
+    数值列（含None，存为NaN）为float64，全部为整数时读回int64；其他值（字符串、布尔等）
+    按类别编码为int32。列可以在中途新增，之前的行补缺失值。
+    打开已有目录时继续追加，超出 schema 行数的残留数据（写入中断）会被截掉。
+
+    Args:
+        path: 结果目录
+        flush_rows: 缓冲的行数，达到后写入磁盘
+    """
+
+    def __init__(self, path: str, flush_rows: int = 1024):
+        self.path = path
+        self.flush_rows = flush_rows
+        os.makedirs(path, exist_ok=True)
+        self._rows = 0
+        self._columns = {}  # 列名 -> {'kind', 'integer', 'categories'}
+        self._buffer = []
+        schema_path = os.path.join(path, SCHEMA_FILE)
+        if os.path.exists(schema_path):
+            with open(schema_path, 'r', encoding='utf-8') as f:
+                schema = json.load(f)
+            self._rows = schema['rows']
+            for column in schema['columns']:
+                self._columns[column.pop('name')] = column
+            for name, column in self._columns.items():
+                with open(self._column_file(name), 'r+b') as f:
+                    f.truncate(self._rows * self._itemsize(column))
+
+    def __len__(self):
+        return self._rows + len(self._buffer)
+
+    @property
+    def committed_rows(self) -> int:
+        """已写入磁盘的行数"""
+        return self._rows
+
+    def append(self, row: Dict[str, Any]):
+        self._buffer.append(row)
+        if len(self._buffer) >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        """把缓冲的行写入各列文件，再更新 schema"""
+        if not self._buffer:
+            return
+        rows, self._buffer = self._buffer, []
+        names = list(self._columns)
+        for row in rows:
+            for name, value in row.items():
+                if name not in self._columns:
+                    self._add_column(name, value)
+                    names.append(name)
+
+        for name in names:
+            column = self._columns[name]
+            values = [row.get(name) for row in rows]
+            if column['kind'] == 'number':
+                data = self._encode_numbers(name, column, values)
+            else:
+                data = self._encode_categories(column, values)
+            with open(self._column_file(name), 'ab') as f:
+                f.write(data.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+        self._rows += len(rows)
+        self._write_schema()
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _column_file(self, name):
+        index = list(self._columns).index(name)
+        return os.path.join(self.path, f'col{index}.bin')
+
+    @staticmethod
+    def _itemsize(column):
+        return 8 if column['kind'] == 'number' else 4
+
+    @staticmethod
+    def _is_numeric(value):
+        return value is None or (isinstance(value, numbers.Real) and not isinstance(value, (bool, np.bool_)))
+
+    def _add_column(self, name, value):
+        if self._is_numeric(value):
+            # 之前的行补NaN，读回时不能再是整数列
+            column = {'kind': 'number', 'integer': self._rows == 0}
+            fill = np.full(self._rows, np.nan)
+        else:
+            column = {'kind': 'category', 'categories': []}
+            fill = np.full(self._rows, -1, dtype=np.int32)
+        self._columns[name] = column
+        with open(self._column_file(name), 'wb') as f:
+            f.write(fill.tobytes())
+
+    def _encode_numbers(self, name, column, values):
+        out = np.empty(len(values), dtype=np.float64)
+        for i, value in enumerate(values):
+            if not self._is_numeric(value):
+                raise ValueError(f"列 {name} 为数值列，不能写入 {value!r}")
+            if value is None or not isinstance(value, numbers.Integral):
+                column['integer'] = False
+            out[i] = np.nan if value is None else value
+        return out
+
+    @staticmethod
+    def _encode_categories(column, values):
+        categories = column['categories']
+        codes = {value: i for i, value in enumerate(categories)}
+        out = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            if value is None:
+                out[i] = -1
+                continue
+            if isinstance(value, np.generic):
+                value = value.item()
+            if value not in codes:
+                codes[value] = len(categories)
+                categories.append(value)
+            out[i] = codes[value]
+        return out
+
+    def _write_schema(self):
+        schema = {'rows': self._rows, 'columns': [dict(column, name=name) for name, column in self._columns.items()]}
+        tmp = os.path.join(self.path, SCHEMA_FILE + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(schema, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.path, SCHEMA_FILE))
+
+def read_columnar(path: str) -> pd.DataFrame:
+    """读取 ColumnarResultWriter 写入的结果（只读取 schema 中已提交的行）"""
+    with open(os.path.join(path, SCHEMA_FILE), 'r', encoding='utf-8') as f:
+        schema = json.load(f)
+    rows = schema['rows']
+    data = {}
+    for index, column in enumerate(schema['columns']):
+        file = os.path.join(path, f'col{index}.bin')
+        if column['kind'] == 'number':
+            values = np.fromfile(file, dtype=np.float64, count=rows)
+            data[column['name']] = values.astype(np.int64) if column['integer'] and rows else values
+        else:
+            codes = np.fromfile(file, dtype=np.int32, count=rows)
+            categories = np.array(column['categories'] + [None], dtype=object)
+            data[column['name']] = categories[codes]  # -1 对应末尾的None
+    return pd.DataFrame(data)
@@ -0,0 +1,120 @@
+"""
+离散参数网格上的TPE（Tree-structured Parzen Estimator）采样
+
+把已评估的组合按目标值分为较好的前 gamma 部分和其余部分，对每个参数分别估计
+两组的分布 l(x) 和 g(x)，从 l(x) 抽取候选组合，选择 l(x)/g(x) 最大且未评估过的组合。
+数值参数按在网格中的位置用高斯核平滑，相邻取值共享信息；其他参数按类别计数。
+"""
+import math
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+class TPESampler:
+    """
+    在参数网格的下标空间中提议组合，目标值越大越好
+
+    Args:
+        param_grid: 参数网格，格式同 GridSearchOptimizer.optimize
+        gamma: 较好一组占已评估组合的比例
+        n_startup: 前 n_startup 个组合随机选取
+        n_candidates: 每次从 l(x) 抽取的候选组合数
+        prior_weight: 均匀先验的权重，保证每个取值都有被抽到的概率
+        seed: 随机种子
+    """
+
+    def __init__(self, param_grid: Dict[str, List[Any]], gamma=0.25, n_startup=10, n_candidates=24,
+                 prior_weight=1.0, seed=None):
+        self.names = list(param_grid.keys())
+        self.values = [list(v) for v in param_grid.values()]
+        if any(len(v) == 0 for v in self.values):
+            raise ValueError("参数网格中每个参数至少需要一个取值")
+        self.sizes = [len(v) for v in self.values]
+        self.total = math.prod(self.sizes)
+        self.numeric = [all(isinstance(x, (int, float)) and not isinstance(x, bool) for x in v) for v in self.values]
+        self.gamma = gamma
+        self.n_startup = n_startup
+        self.n_candidates = n_candidates
+        self.prior_weight = prior_weight
+        self._rng = random.Random(seed)
+        self._observations: List[Tuple[Tuple[int, ...], float]] = []
+        self._seen = set()  # 已评估或已提议的组合
+
+    def __len__(self):
+        return len(self._observations)
+
+    @property
+    def exhausted(self) -> bool:
+        """网格中的组合都已提议过"""
+        return len(self._seen) >= self.total
+
+    def params(self, indices: Tuple[int, ...]) -> Dict[str, Any]:
+        """下标组合对应的参数字典"""
+        return {name: values[i] for name, values, i in zip(self.names, self.values, indices)}
+
+    def ask(self) -> Optional[Tuple[int, ...]]:
+        """提议一个未评估过的组合（下标元组），网格已穷尽时返回None"""
+        if self.exhausted:
+            return None
+        indices = None
+        if len(self._observations) >= self.n_startup:
+            indices = self._propose()
+        if indices is None:
+            indices = self._random_unseen()
+        self._seen.add(indices)
+        return indices
+
+    def tell(self, indices: Tuple[int, ...], score: Optional[float]):
+        """记录一个组合的目标值，None/NaN视为最差"""
+        if score is None or (isinstance(score, float) and math.isnan(score)):
+            score = -math.inf
+        self._seen.add(indices)
+        self._observations.append((indices, score))
+
+    def skip(self, indices: Tuple[int, ...]):
+        """不评估该组合（如不满足约束），以后也不再提议"""
+        self._seen.add(indices)
+
+    def _random_unseen(self):
+        # 剩余组合较多时随机抽取，接近穷尽时枚举剩余组合
+        if len(self._seen) < self.total / 2:
+            while True:
+                indices = tuple(self._rng.randrange(k) for k in self.sizes)
+                if indices not in self._seen:
+                    return indices
+        remaining = [idx for idx in np.ndindex(*self.sizes) if idx not in self._seen]
+        return tuple(int(i) for i in self._rng.choice(remaining))
+
+    def _densities(self, group):
+        """每个参数在该组上的分布（均匀先验 + 每个观测一个核）"""
+        densities = []
+        for j, (k, numeric) in enumerate(zip(self.sizes, self.numeric)):
+            weights = np.full(k, self.prior_weight / k)
+            positions = np.arange(k)
+            if numeric and k > 1:
+                bandwidth = max(1.0, k / (1.0 + len(group)) ** 0.5 / 2)
+            for indices in group:
+                if numeric and k > 1:
+                    kernel = np.exp(-0.5 * ((positions - indices[j]) / bandwidth) ** 2)
+                    weights += kernel / kernel.sum()
+                else:
+                    weights[indices[j]] += 1.0
+            densities.append(weights / weights.sum())
+        return densities
+
+    def _propose(self):
+        ranked = sorted(self._observations, key=lambda obs: obs[1], reverse=True)
+        n_good = max(1, math.ceil(self.gamma * len(ranked)))
+        good = self._densities([obs[0] for obs in ranked[:n_good]])
+        bad = self._densities([obs[0] for obs in ranked[n_good:]])
+
+        best, best_score = None, -math.inf
+        for _ in range(self.n_candidates):
+            indices = tuple(int(self._rng.choices(range(k), weights=l)[0]) for k, l in zip(self.sizes, good))
+            if indices in self._seen:
+                continue
+            score = sum(math.log(l[i]) - math.log(g[i]) for i, l, g in zip(indices, good, bad))
+            if score > best_score:
+                best, best_score = indices, score
+        return best
@@ -0,0 +1,600 @@
+"""
+ATR括号单策略的向量化回测引擎
+
+PivotBreakout 一类策略的交易逻辑很固定：收盘时出信号，下一根bar开盘市价进场，
+同时挂ATR止损/止盈单，超过 max_hold_bars 后强制平仓。这里用策略提供的整段
+信号矩阵直接模拟成交，不经过Cerebro的逐bar事件循环，一批参数组合的信号、成交
+和指标都在数组上一次算完，用于大范围参数扫描。
+
+只覆盖提供了 vector_batch 的括号单离场策略；均线交叉离场等其他策略
+（如 SMA / SMA_V2）由 supports() 判定为不支持，回退到Cerebro执行。
+
+成交与资金口径按 backtrader BackBroker 的默认行为复现：
+  - 市价单在信号bar的下一根bar以开盘价成交，提交和成交时各做一次资金检查
+  - 止损/止盈单在进场bar的下一根bar生效；跳空越过时按开盘价成交，
+    同一根bar两者都触发时止损优先
+  - 强制平仓在持仓满 max_hold_bars 的bar发出，下一根bar开盘成交
+  - 点差、佣金、杠杆和逐bar净值直接调用与Cerebro相同的佣金对象计算
+  - 夏普率按与 PerformanceAnalyzer 相同的30分钟周期划分收益，非30分钟数据也与Cerebro一致
+"""
+import numpy as np
+import backtrader as bt
+from typing import Dict, Any, List, Optional
+
+from maru_quant.analyzer.PerformanceAnalyzer import PerformanceAnalyzer
+from maru_quant.analyzer.equity_metrics import period_ends, moment_ratio, robust_ratio, trade_summary
+from maru_quant.broker.commission_info import comm_ibkr_XAUUSD
+from maru_quant.indicator.vectorized import feed_ohlc, memoize
+from maru_quant.utils.backtest_runner import BacktestRunner, lean_execution
+from maru_quant.utils.dataloader import feed_fingerprint
+
+def strategy_params(strategy_class, params: Dict[str, Any]):
+    """按backtrader的规则合并策略默认参数，未知参数与Cerebro一样报错"""
+    unknown = set(params) - set(strategy_class.params._getkeys())
+    if unknown:
+        raise TypeError(f"{strategy_class.__name__} 不支持的参数: {sorted(unknown)}")
+    p = strategy_class.params()
+    for name, value in params.items():
+        setattr(p, name, value)
+    return p
+
+def range_extrema(ohlc: Dict[str, np.ndarray]):
+    """
+    low/high 的稀疏表：第k行第i个为 [i, i + 2**k) 内的最低价/最高价（超出数据末尾的部分不计）
+
+    Returns:
+        (最低价表, 最高价表)，形状都是 (层数, bar数)
+    """
+    low, high = ohlc['low'], ohlc['high']
+    n = len(low)
+    levels = max(n - 1, 1).bit_length()
+    lows = np.empty((levels, n))
+    highs = np.empty((levels, n))
+    lows[0], highs[0] = low, high
+    for k in range(1, levels):
+        half = 1 << (k - 1)
+        lows[k] = lows[k - 1]
+        highs[k] = highs[k - 1]
+        np.minimum(lows[k, :n - half], lows[k - 1, half:], out=lows[k, :n - half])
+        np.maximum(highs[k, :n - half], highs[k - 1, half:], out=highs[k, :n - half])
+    return lows, highs
+
+def bracket_exits(ohlc: Dict[str, np.ndarray], signals, stop, target, max_hold_bars, extrema=None):
+    """
+    对每个候选信号独立计算开仓后的离场bar和离场价（不考虑持仓冲突和资金）
+
+    在 range_extrema 的稀疏表上对所有候选信号同时做倍增搜索：从最大的跨度开始，
+    整段都没有触发止损/止盈就跳过，每个信号只需 log2(bar数) 步即可找到第一根触发的bar
+
+    Args:
+        signals: 信号bar下标（signal + 1 < len(close)）
+        stop / target: 每个信号对应的止损/止盈价
+        max_hold_bars: 每个信号的最大持仓bar数（或共用的一个数），<= 0 时不限
+        extrema: range_extrema(ohlc) 的结果，为None时现算
+
+    Returns:
+        (离场bar数组, 离场价数组)，持有到数据结束的交易离场bar为 len(close)
+    """
+    open_, high, low = ohlc['open'], ohlc['high'], ohlc['low']
+    n = len(open_)
+    lows, highs = range_extrema(ohlc) if extrema is None else extrema
+    hold = np.broadcast_to(np.asarray(max_hold_bars, dtype=np.int64), np.shape(signals))
+    bounded = hold > 0
+    entry_bar = signals + 1
+    # 止损/止盈单从进场后的下一根bar开始生效，直到强制平仓单发出的那根bar
+    last = np.where(bounded, np.minimum(entry_bar + hold, n - 1), n - 1)
+
+    pos = entry_bar + 1
+    span = int((last - pos).max()) + 1 if len(pos) else 0
+    for k in reversed(range(min(span.bit_length(), len(lows)))):
+        step = 1 << k
+        at = np.minimum(pos, n - 1)
+        # NaN止损/止盈价与逐bar比较一样视为不触发
+        skip = (pos + step - 1 <= last) & ~(lows[k][at] <= stop) & ~(highs[k][at] >= target)
+        pos += step * skip
+
+    exit_bar = np.full(len(signals), n, dtype=np.int64)
+    exit_price = np.full(len(signals), np.nan)
+    hit = np.flatnonzero(pos <= last)
+    x = pos[hit]
+    exit_bar[hit] = x
+    # 跳空越过时按开盘价成交，同一根bar两者都触发时止损优先
+    exit_price[hit] = np.where(low[x] <= stop[hit], np.minimum(open_[x], stop[hit]), np.maximum(open_[x], target[hit]))
+
+    # 未触发止损/止盈的，在持仓满 max_hold_bars 的下一根bar开盘强制平仓
+    timeout = bounded & (exit_bar == n) & (entry_bar + hold + 1 < n)
+    exit_bar[timeout] = entry_bar[timeout] + hold[timeout] + 1
+    exit_price[timeout] = open_[exit_bar[timeout]]
+    return exit_bar, exit_price
+
+def _open_cost(comminfo, size, price):
+    # 与 BackBroker._execute 的开仓扣款顺序一致
+    cost = comminfo.getvaluesize(size, price)
+    return np.where(cost > 0, cost / comminfo.get_leverage(), cost)
+
+def _cost_table(comminfo, size, signal_close, entry_open, held_exit):
+    """按候选信号向量化计算的资金检查、开平仓成本和盈亏"""
+    return np.broadcast_arrays(
+        _open_cost(comminfo, size, signal_close), comminfo.getcommission(size, signal_close),
+        _open_cost(comminfo, size, entry_open), comminfo.getcommission(size, entry_open),
+        comminfo.profitandloss(size, entry_open, held_exit),
+        comminfo.getcommission(size, held_exit),
+    )
+
+def _chain_fixed(costs, combo, closed, combos, cash, stocklike):
+    """
+    固定数量时各组合的现金序列：每个组合一行按逐笔模拟的运算顺序排列现金变动，
+    按行累加一次，结果与逐笔计算逐位相同
+
+    Args:
+        costs: 已串好的交易（按组合和时间排序）的 _cost_table
+        combo / closed: 每笔交易所属的组合、是否已平仓
+
+    Returns:
+        (开仓前现金, 开仓后现金, 平仓后现金, 有交易未通过资金检查的组合掩码)
+    """
+    submit_cost, submit_comm, fill_cost, fill_comm, pnl, exit_comm = costs
+    counts = np.bincount(combo, minlength=combos)
+    j = np.arange(len(combo)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    steps = np.zeros((combos, 4 * counts.max() + 1))
+    steps[:, 0] = cash
+    steps[combo, 4 * j + 1] = -fill_cost
+    steps[combo, 4 * j + 2] = -fill_comm
+    steps[combo, 4 * j + 3] = np.where(closed, fill_cost + pnl * stocklike, 0.0)
+    steps[combo, 4 * j + 4] = np.where(closed, -exit_comm, 0.0)
+    path = np.cumsum(steps, axis=1)
+
+    before = path[combo, 4 * j]
+    entry_cash = path[combo, 4 * j + 2]
+    after = np.where(closed, path[combo, 4 * j + 4], entry_cash)
+    rejected = np.zeros(combos, dtype=bool)
+    rejected[combo[(before - submit_cost - submit_comm < 0.0) | (before - fill_cost - fill_comm < 0.0)]] = True
+    return before, entry_cash, after, rejected
+
+def _chain_sequential(sizer, cost_table, signals, signal_close, exit_bar, next_signal, n, cash, stocklike):
+    """逐笔推进现金的交易链，处理按现金计算数量和资金不足拒单"""
+    close_list = signal_close.tolist()
+    exit_list = exit_bar.tolist()
+    tables = {}
+    taken, sizes, flat_cash, entry_cash = [], [], [], []
+    k = 0
+    while k < len(signals):
+        size = sizer(cash, close_list[k]) if callable(sizer) else sizer
+        if not size:
+            # 与Cerebro一致：数量为0时 buy_bracket 拿不到父订单，回测失败
+            raise ValueError(f"开仓数量为0（现金 {cash:.2f}，价格 {close_list[k]:.2f}）")
+        if size not in tables:
+            tables[size] = [a.tolist() for a in cost_table(size)]
+        submit_cost, submit_comm, fill_cost, fill_comm, pnl, exit_comm = tables[size]
+
+        # 提交时按信号bar收盘价、成交时按开盘价检查资金，不足则拒单，下一根bar可重新发信号
+        if cash - submit_cost[k] - submit_comm[k] < 0.0 or cash - fill_cost[k] - fill_comm[k] < 0.0:
+            k += 1
+            continue
+
+        flat_cash.append(cash)
+        cash -= fill_cost[k]
+        cash -= fill_comm[k]
+        taken.append(k)
+        sizes.append(size)
+        entry_cash.append(cash)
+        if exit_list[k] == n:
+            break
+
+        cash += fill_cost[k] + pnl[k] * stocklike
+        cash -= exit_comm[k]
+        k = next_signal[k]
+    flat_cash.append(cash)
+    return np.asarray(taken, dtype=np.int64), np.asarray(sizes, dtype=np.float64), np.asarray(flat_cash), np.asarray(entry_cash)
+
+def simulate_batch(ohlc: Dict[str, np.ndarray], signals: Dict[str, np.ndarray], comminfo, cash, sizer, cache=None):
+    """
+    一批参数组合的“信号 -> 下一根开盘进场 -> 止损/止盈/超时离场”单仓位多头交易
+
+    各组合的候选信号首尾相接排成一个数组，离场位置与之前的交易无关，用 bracket_exits 一次算出；
+    再沿“平仓后下一个信号”的指针同时推进所有组合的交易链。
+    固定数量且没有拒单的组合现金序列按行一次累加得到，其余组合逐笔推进现金
+
+    Args:
+        ohlc: open/high/low/close 数组
+        signals: 策略 vector_batch 的结果
+        comminfo: backtrader佣金对象（必须是stocklike）
+        cash: 初始资金
+        sizer: 固定开仓数量，或 sizer(cash, price) -> 开仓数量
+        cache: 同一段数据上的缓存（dict），保存 range_extrema 的结果
+
+    Returns:
+        (交易表, {组合下标: 异常})；交易表是按组合和进场bar排序的数组字典，
+        字段为 combo / size / entry / exit / open / exit_price / entry_cash / after，
+        持有到数据结束的交易 exit 为 len(close)
+    """
+    open_, close = ohlc['open'], ohlc['close']
+    n = len(close)
+    entry_index = signals['entry_index']
+    combos = len(entry_index)
+
+    rows = [np.flatnonzero(row[:n - 1]) for row in signals['entry']]
+    counts = np.array([len(rows[g]) for g in entry_index], dtype=np.int64)
+    start = np.concatenate(([0], np.cumsum(counts)))
+    bar = np.concatenate([rows[g] for g in entry_index])
+    combo = np.repeat(np.arange(combos), counts)
+
+    level = signals['atr'][signals['atr_index'][combo], bar]
+    stop = close[bar] - level * signals['stop_loss_atr'][combo]
+    target = close[bar] + level * signals['take_profit_atr'][combo]
+    extrema = memoize(cache, ('range_extrema',), lambda: range_extrema(ohlc))
+    exit_bar, exit_price = bracket_exits(ohlc, bar, stop, target, signals['max_hold_bars'][combo], extrema)
+
+    # 平仓后同一组合下一个可以发出的信号（平仓bar收盘时即可再次发信号）
+    stride = n + 1
+    following = np.searchsorted(combo * stride + bar, combo * stride + exit_bar)
+    chained = (exit_bar < n) & (following < len(bar))
+    chained[chained] = combo[following[chained]] == combo[chained]
+    next_signal = np.where(chained, following, -1)
+
+    signal_close = close[bar]
+    entry_open = open_[bar + 1]
+    held_exit = np.where(np.isnan(exit_price), entry_open, exit_price)
+
+    # 先假定没有拒单，从每个组合的第一个信号出发同时推进所有交易链
+    links = []
+    current = start[:-1][counts > 0]
+    while len(current):
+        links.append(current)
+        current = next_signal[current]
+        current = current[current >= 0]
+    taken = np.sort(np.concatenate(links)) if links else np.empty(0, dtype=np.int64)
+
+    parts = []
+    errors = {}
+    sequential = np.ones(combos, dtype=bool)
+    if not callable(sizer) and sizer and len(taken):
+        costs = _cost_table(comminfo, sizer, signal_close[taken], entry_open[taken], held_exit[taken])
+        before, entry_cash, after, rejected = _chain_fixed(
+            costs, combo[taken], exit_bar[taken] < n, combos, cash, comminfo.stocklike)
+        keep = ~rejected[combo[taken]]
+        parts.append((taken[keep], np.full(keep.sum(), sizer, dtype=np.float64), entry_cash[keep], after[keep]))
+        sequential = rejected
+
+    for c in np.flatnonzero(sequential & (counts > 0)).tolist():
+        lo, hi = start[c], start[c + 1]
+        local = slice(lo, hi)
+        cost_table = lambda size: _cost_table(comminfo, size, signal_close[local], entry_open[local], held_exit[local])
+        try:
+            chain, sizes, flat_cash, entry_cash = _chain_sequential(
+                sizer, cost_table, bar[local], signal_close[local], exit_bar[local],
+                (following[local] - lo).tolist(), n, cash, comminfo.stocklike)
+        except Exception as e:
+            errors[c] = e
+            continue
+        parts.append((chain + lo, sizes, entry_cash, flat_cash[1:]))
+
+    picked, sizes, entry_cash, after = (np.concatenate(a) for a in zip(*parts)) if parts else (np.empty(0, dtype=np.int64),) + (np.empty(0),) * 3
+    order = np.argsort(picked)
+    picked = picked[order]
+    return {
+        'combo': combo[picked],
+        'size': sizes[order],
+        'entry': bar[picked] + 1,
+        'exit': exit_bar[picked],
+        'open': entry_open[picked],
+        'exit_price': exit_price[picked],
+        'entry_cash': entry_cash[order],
+        'after': after[order],
+    }, errors
+
+def _padded_kth(x, fill, extra, ks):
+    """
+    每行 x 之外再补 extra 个 fill 后的第k小值（k从0开始，各行相同）
+
+    对 x 按行做一次 partition，结合每行小于 fill 的元素个数定位，不需要补齐或排序
+
+    Args:
+        x: (行数, 宽度) 的数组
+        fill: 每行补充的值
+        ks: 要取的各个k
+    """
+    width = x.shape[1]
+    if width == 0:
+        return [fill for _ in ks]
+    below = (x < fill[:, None]).sum(axis=1)
+    positions = sorted({i for k in ks for i in (k, k - extra) if 0 <= i < width})
+    part = np.partition(x, positions, axis=1) if positions else x
+    out = []
+    for k in ks:
+        head = part[:, min(k, width - 1)]
+        tail = part[:, min(max(k - extra, 0), width - 1)]
+        out.append(np.where(k < below, head, np.where(k < below + extra, fill, tail)))
+    return out
+
+def grouped_median(values, counts, fill, total, block=2 ** 22):
+    """
+    分组中位数：第i组为 values 中连续的 counts[i] 个值，再补上 fill[i] 直到共 total 个，与 np.median 相同
+
+    补上的值落在中间位置的组直接取 fill，其余组按行补齐后一次 partition
+
+    Args:
+        values: 各组首尾相接的数组
+        counts: 每组的元素个数（至少为1）
+        fill: 每组补充的值
+        total: 每组补齐后的元素个数
+        block: 按行分块时每块的元素数上限
+    """
+    ks = ((total - 1) // 2, total // 2)
+    start = np.cumsum(counts) - counts
+    below = np.add.reduceat(values < (np.repeat(fill, counts) if fill.any() else 0.0), start, dtype=np.int64)
+    extra = total - counts
+    mid = np.full(len(counts), True)
+    for k in ks:
+        mid &= (below <= k) & (k < below + extra)
+    out = fill.astype(np.float64)
+
+    rows = np.flatnonzero(~mid)
+    step = max(1, block // max(int(counts[rows].max()), 1)) if len(rows) else 1
+    for lo in range(0, len(rows), step):
+        r = rows[lo:lo + step]
+        width = int(counts[r].max())
+        pos = np.arange(width)
+        x = np.where(pos < counts[r, None], values[np.minimum(start[r, None] + pos, len(values) - 1)], fill[r, None])
+        lower, upper = _padded_kth(x, fill[r], total - width, ks)
+        out[r] = lower if total % 2 else (lower + upper) / 2
+    return out
+
+def batch_metrics(close, dt, trades: Dict[str, np.ndarray], combos, comminfo, cash, compression=30, block=2 ** 22) -> List[Dict[str, Any]]:
+    """
+    由交易表计算每个组合的结果指标，字段与 BacktestRunner.run 相同
+
+    净值只在持仓bar和平仓bar上变化，每个组合只在第0根bar和这些bar上计算净值（两次变化之间净值不变），
+    回撤、周期收益率和最终净值与逐bar计算相同；其余周期的收益率都是0，
+    夏普率的均值/方差和稳健夏普率的中位数/MAD把这些0计入后精确计算，各组合之间不再逐个排序
+
+    Args:
+        dt: backtrader数值日期数组
+        trades: simulate_batch 的交易表
+        combos: 组合数
+        compression: 周期收益率的周期（分钟），同 PerformanceAnalyzer
+        block: 按行分块时每块的元素数上限
+    """
+    n = len(close)
+    t_combo, entry, exit_ = trades['combo'], trades['entry'], trades['exit']
+    closed = exit_ < n
+
+    # 持仓价值只取决于进场bar、数量和当前收盘价，不同组合中进场bar和数量相同的交易共用一段，
+    # 每段按其中最长的持仓按 BackBroker._get_value 盯市计算一次
+    held_len = exit_ - entry
+    sizes, size_rank = np.unique(trades['size'], return_inverse=True)
+    keys, first_trade, segment = np.unique(entry * len(sizes) + size_rank, return_index=True, return_inverse=True)
+    span = np.zeros(len(keys), dtype=np.int64)
+    np.maximum.at(span, segment, held_len)
+    segment_start = np.cumsum(span) - span
+    size = np.repeat(sizes[keys % len(sizes)], span)
+    price = close[np.arange(span.sum()) + np.repeat(entry[first_trade] - segment_start, span)]
+    dvalue = comminfo.getvaluesize(size, price)
+    unrealized = comminfo.profitandloss(size, np.repeat(trades['open'][first_trade], span), price)
+    position_value = np.where(dvalue > 0, (dvalue - unrealized) / comminfo.get_leverage() + unrealized, dvalue)
+
+    # 事件：每个组合的第0根bar，以及每笔交易的持仓bar和平仓bar，按组合和bar首尾相接
+    trade_count = np.bincount(t_combo, minlength=combos)
+    trade_item = np.arange(len(entry)) + t_combo + 1
+    item_len = np.ones(combos + len(entry), dtype=np.int64)
+    item_len[trade_item] = held_len + closed
+    item_start = np.cumsum(item_len) - item_len
+    event_start = item_start[np.cumsum(trade_count) - trade_count + np.arange(combos)]
+    events = int(item_len.sum())
+    event_count = np.diff(np.append(event_start, events))
+
+    # 持仓bar的净值 = 开仓后现金 + 持仓价值，第0根bar为初始资金，平仓bar为平仓后现金
+    item_cash = np.full(len(item_len), float(cash))
+    item_cash[trade_item] = trades['entry_cash']
+    values = np.repeat(item_cash, item_len)
+    if len(entry):
+        offset = np.zeros(len(item_len), dtype=np.int64)
+        offset[trade_item] = segment_start[segment] - item_start[trade_item]
+        values += position_value.take(np.arange(events) + np.repeat(offset, item_len), mode='clip')
+    values[event_start] = cash
+    values[(item_start[trade_item] + held_len)[closed]] = trades['after'][closed]
+    final_value = values[event_start + event_count - 1]
+
+    # 最大回撤：每个组合的事件净值是连续的一段，逐段累计峰值
+    peak = np.empty_like(values)
+    for lo, hi in zip(event_start.tolist(), (event_start + event_count).tolist()):
+        np.maximum.accumulate(values[lo:hi], out=peak[lo:hi])
+    drawdown = peak - values
+    drawdown *= 100.0
+    drawdown /= peak
+    mdd = np.maximum.reduceat(drawdown, event_start)
+
+    # 周期收益率：只有包含事件的周期不为0，周期末净值即周期内最后一个事件的净值
+    ends = period_ends(dt, compression)
+    periods = len(ends)
+    if periods == n:
+        # 每根bar各自是一个周期，每个事件的净值就是所在周期的期末净值
+        closing = values
+        combo_run = event_start
+    else:
+        bar_period = np.zeros(n, dtype=np.int64)
+        bar_period[ends[:-1] + 1] = 1
+        bar_period = np.cumsum(bar_period)
+        item_bar = np.zeros(len(item_len), dtype=np.int64)
+        item_bar[trade_item] = entry
+        event_period = bar_period[np.arange(events) + np.repeat(item_bar - item_start, item_len)]
+        first = np.empty(events, dtype=bool)
+        first[0] = True
+        first[1:] = event_period[1:] != event_period[:-1]
+        first[event_start] = True
+        run_first = np.flatnonzero(first)
+        closing = values[np.append(run_first[1:], events) - 1]
+        combo_run = np.cumsum(first)[event_start] - 1
+    touched = np.diff(np.append(combo_run, len(closing)))
+    # 相对上一周期的期末净值，每个组合的第一个周期相对初始资金
+    returns = np.empty_like(closing)
+    np.divide(closing[1:], closing[:-1], out=returns[1:])
+    returns[combo_run] = closing[combo_run] / cash
+    returns -= 1.0
+
+    mean = np.add.reduceat(returns, combo_run) / periods
+    # 未触及的周期收益率为0，平方和只需对触及的周期求和
+    std = np.sqrt(np.maximum(np.add.reduceat(returns * returns, combo_run) / periods - mean * mean, 0.0))
+
+    median = grouped_median(returns, touched, np.zeros(combos), periods, block)
+    deviation = np.abs(returns - np.repeat(median, touched)) if median.any() else np.abs(returns)
+    mad = grouped_median(deviation, touched, np.abs(median), periods, block)
+
+    # 交易统计：与 Trade.pnlcomm 一致，毛盈亏减去开仓和平仓佣金之和
+    size, open_, exit_price = trades['size'][closed], trades['open'][closed], trades['exit_price'][closed]
+    pnl = comminfo.profitandloss(size, open_, exit_price) - (
+        comminfo.getcommission(size, open_) + comminfo.getcommission(size, exit_price))
+    pnl = np.broadcast_to(pnl, size.shape)
+    c = t_combo[closed]
+    win = pnl > 0
+    total = np.bincount(c, minlength=combos)
+    wins = np.bincount(c[win], minlength=combos)
+    win_sum = np.bincount(c, np.where(win, pnl, 0.0), minlength=combos)
+    loss_sum = np.bincount(c, np.where(win, 0.0, pnl), minlength=combos)
+
+    results = []
+    for i in range(combos):
+        stats = trade_summary(total[i], wins[i], win_sum[i], loss_sum[i])
+        results.append({
+            'sharpe_ratio': moment_ratio(mean[i], std[i]) if periods else None,
+            'robust_sharpe': robust_ratio(median[i], mad[i]) if periods else None,
+            'max_drawdown': float(mdd[i]),
+            'total_return': (float(final_value[i]) - cash) / cash,
+            'total_trade': stats['total_trades'],
+            'win_rate': stats['win_rate'],
+            'avg_win': stats['avg_win'],
+            'avg_loss': stats['avg_loss'],
+            'P/L_ratio': stats['P/L_ratio'],
+            'final_value': float(final_value[i]),
+        })
+    return results
+
+class VectorBacktestRunner(BacktestRunner):
+    """
+    向量化回测运行器，配置和返回的结果字典与 BacktestRunner 相同
+
+    策略需要提供 vector_batch / supports_vector（见 PivotBreakout）；
+    不支持的策略、非 ArrayData 数据源、非stocklike佣金，以及画图和记录明细的回测
+    自动回退到Cerebro执行
+
+    run_batch 把参数组合按批交给 simulate_batch / batch_metrics，一批组合的信号、成交和指标
+    在数组上一次算完，同一数据源上的指标和开仓信号在各批和多次调用之间共享；单次 run 是只有一组参数的批
+    """
+
+    # 每批 参数组合数 × bar数 的上限，限制一批内中间数组的内存
+    BATCH_CELLS = 2 ** 22
+
+    # (数据指纹, 缓存)：同一数据源上的指标、开仓信号和 range_extrema 在多次 run / run_batch 之间复用
+    _feed_cache = (None, None)
+
+    def _commission_info(self):
+        if self.tick_type == "CFD":
+            return comm_ibkr_XAUUSD
+        # 与 broker.setcommission 的默认参数一致
+        return bt.CommInfoBase(commission=self.commission, margin=None, mult=1.0, commtype=None,
+                               percabs=True, stocklike=False, interest=0.0, interest_long=False,
+                               leverage=1.0, automargin=False)
+
+    def _sizer(self):
+        if self.sizer_type == "percents":
+            # PercentSizerInt：按当前现金的百分比，取整
+            return lambda cash, price: int(cash / price * (self.size_percent / 100))
+        return self.stake if self.sizer_type == "fixed" else 1  # Cerebro默认sizer为1手
+
+    def supports(self, strategy_class, data_feed) -> bool:
+        """该策略和数据源能否使用向量化引擎"""
+        supports_vector = getattr(strategy_class, 'supports_vector', None)
+        if supports_vector is None or not supports_vector():
+            return False
+        if getattr(data_feed, 'arrays', None) is None or data_feed.p.fromdate is not None or data_feed.p.todate is not None:
+            return False
+        comminfo = self._commission_info()
+        return comminfo.stocklike and not comminfo.p.interest
+
+    def _cache_for(self, data_feed):
+        """data_feed 对应的向量化缓存，换了数据源时丢弃旧的"""
+        fingerprint = feed_fingerprint(data_feed)
+        if self._feed_cache[0] != fingerprint:
+            self._feed_cache = (fingerprint, {})
+        return self._feed_cache[1]
+
+    def _evaluate(self, strategy_class, data_feed, ohlc, param_list: List[Dict[str, Any]]) -> List[Any]:
+        """
+        一批参数组合的向量化回测
+
+        Returns:
+            与param_list顺序一致的结果字典，失败的组合为对应的异常
+        """
+        outcomes = [None] * len(param_list)
+        merged = []
+        for i, params in enumerate(param_list):
+            try:
+                merged.append((i, strategy_params(strategy_class, params)))
+            except Exception as e:
+                outcomes[i] = e
+        if not merged:
+            return outcomes
+
+        comminfo = self._commission_info()
+        cache = self._cache_for(data_feed)
+        try:
+            signals = strategy_class.vector_batch(ohlc, [p for _, p in merged], cache)
+            trades, errors = simulate_batch(ohlc, signals, comminfo, self.cash, self._sizer(), cache)
+            results = batch_metrics(ohlc['close'], data_feed.arrays['datetime'], trades, len(merged), comminfo,
+                                    self.cash, PerformanceAnalyzer.params.compression)
+        except Exception as e:
+            if len(merged) == 1:
+                outcomes[merged[0][0]] = e
+                return outcomes
+            # 整批失败时逐组重算，只让出错的组合失败
+            for i, _ in merged:
+                outcomes[i] = self._evaluate(strategy_class, data_feed, ohlc, [param_list[i]])[0]
+            return outcomes
+
+        for j, ((i, _), result) in enumerate(zip(merged, results)):
+            outcomes[i] = errors.get(j, result)
+        return outcomes
+
+    def run_batch(self, strategy_class, data_feed, param_list: List[Dict[str, Any]], progress=None) -> List[Optional[Dict[str, Any]]]:
+        if not self.supports(strategy_class, data_feed):
+            return super().run_batch(strategy_class, data_feed, param_list, progress)
+        if self.mode == 'lean':
+            lean_execution(strategy_class)
+
+        results = [None] * len(param_list)
+        pending = []
+        for i, params in enumerate(param_list):
+            cache_key, cached = self._cached_result(strategy_class, data_feed, params)
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.append((i, cache_key))
+        done = len(param_list) - len(pending)
+        if progress and done:
+            progress(done, len(param_list))
+
+        ohlc = feed_ohlc(data_feed)
+        size = max(1, self.BATCH_CELLS // max(len(ohlc['close']), 1))
+        for lo in range(0, len(pending), size):
+            chunk = pending[lo:lo + size]
+            outcomes = self._evaluate(strategy_class, data_feed, ohlc, [param_list[i] for i, _ in chunk])
+            for (i, cache_key), outcome in zip(chunk, outcomes):
+                if isinstance(outcome, Exception):
+                    self._report_failure(param_list[i], outcome)
+                else:
+                    results[i] = outcome
+                    self._store_result(cache_key, strategy_class, param_list[i], outcome)
+            done += len(chunk)
+            if progress:
+                progress(done, len(param_list))
+        return results
+
+    def _run_backtest(self, strategy_class, data_feed, params: Dict[str, Any], plot, record) -> Dict[str, Any]:
+        if plot or record or not self.supports(strategy_class, data_feed):
+            return super()._run_backtest(strategy_class, data_feed, params, plot, record)
+
+        outcome = self._evaluate(strategy_class, data_feed, feed_ohlc(data_feed), [params])[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
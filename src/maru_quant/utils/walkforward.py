@@ -1,3 +1,4 @@
+from concurrent.futures import wait, FIRST_COMPLETED
 import pandas as pd
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Any
@@ -5,15 +6,20 @@ import warnings
 import numpy as np
 
 from maru_quant.utils import config_manager
-from maru_quant.utils.optimizer import GridSearchOptimizer
-from maru_quant.utils.dataloader import load_data
+from maru_quant.utils.optimizer import GridSearchOptimizer, grid_param_list, results_to_frame, select_best_params
+from maru_quant.utils.checkpoint import open_journal, params_key
+from maru_quant.utils.param_grid import ParamGrid
+from maru_quant.analyzer.equity_metrics import window_metrics
+from maru_quant.utils.array_feed import slice_feed
+from maru_quant.utils.dataloader import load_dataframe, parse_interval, slice_bounds, make_feed
+from maru_quant.utils.parallel import worker_pool, run_slice, resolve_workers
 from maru_quant.utils import BacktestRunner
 from maru_quant.utils.logger import get_logger, setup_logger
 
 class WalkForwardAnalyzer:
     def __init__(self, strategy_class, data_file, start_date, end_date, 
                  cash=100000, commission=0.00015, stake=1, sizer_type="percents", 
-                 size_percent=100, tick_type="stock"):
+                 size_percent=100, tick_type="stock", use_cache=None, mode="default", job_queue=None):
         """
         Walk-Forward Analysis分析器
         
@@ -22,6 +28,9 @@ class WalkForwardAnalyzer:
             data_file: 数据文件路径
             start_date: 开始日期 (空字符串或None时使用数据集全部数据)
             end_date: 结束日期 (空字符串或None时使用数据集全部数据)
+            use_cache: 是否使用回测结果缓存，为None时读取配置
+            mode: BacktestRunner 的运行模式，默认 'default'，可用 'lean'（见 lean_execution）
+            job_queue: JobQueueClient，给出时rerun模式的训练和测试任务提交到队列，由worker执行
             其他参数: 回测配置参数
         """
         self.strategy_class = strategy_class
@@ -39,29 +48,29 @@ class WalkForwardAnalyzer:
             stake=stake,
             sizer_type=sizer_type,
             size_percent=size_percent,
-            tick_type=tick_type
+            tick_type=tick_type,
+            use_cache=use_cache,
+            mode=mode
         )
         
-        # 处理空的start_date和end_date - 只加载一次数据
-        need_load_data = (not start_date or start_date == "") or (not end_date or end_date == "")
-        if need_load_data:
-            self.logger.info("检测到空的日期参数，正在加载数据获取日期范围...")
-            full_data = load_data(data_file, None, None)
-            data_index = full_data._dataname.index
-            
-            if not start_date or start_date == "":
-                self.start_date = pd.to_datetime(data_index[0])
-                self.logger.info(f"使用数据集开始日期: {self.start_date.strftime('%Y-%m-%d')}")
-            else:
-                self.start_date = pd.to_datetime(start_date)
-                
-            if not end_date or end_date == "":
-                self.end_date = pd.to_datetime(data_index[-1])
-                self.logger.info(f"使用数据集结束日期: {self.end_date.strftime('%Y-%m-%d')}")
-            else:
-                self.end_date = pd.to_datetime(end_date)
+        # 整个分析只解析一次数据，各窗口在此基础上切片
+        self.timeframe, self.compression = parse_interval(data_file)
+        self.dataframe = load_dataframe(data_file)
+        # 完整数据源，各窗口的数据源是它的切片视图
+        self.data_feed = make_feed(self.dataframe, self.timeframe, self.compression)
+        data_index = self.dataframe.index
+
+        # 处理空的start_date和end_date
+        if not start_date or start_date == "":
+            self.start_date = pd.to_datetime(data_index[0])
+            self.logger.info(f"使用数据集开始日期: {self.start_date.strftime('%Y-%m-%d')}")
         else:
             self.start_date = pd.to_datetime(start_date)
+
+        if not end_date or end_date == "":
+            self.end_date = pd.to_datetime(data_index[-1])
+            self.logger.info(f"使用数据集结束日期: {self.end_date.strftime('%Y-%m-%d')}")
+        else:
             self.end_date = pd.to_datetime(end_date)
             
         self.cash = cash
@@ -70,6 +79,9 @@ class WalkForwardAnalyzer:
         self.sizer_type = sizer_type
         self.size_percent = size_percent
         self.tick_type = tick_type
+        self.use_cache = use_cache
+        self.mode = mode
+        self.job_queue = job_queue
         
         # 存储结果
         self.train_results = []  # 训练期优化结果
@@ -114,7 +126,7 @@ class WalkForwardAnalyzer:
         return windows
     
     def run_walk_forward_analysis(self, param_grid: Dict[str, List[Any]], 
-                                 train_quarters=4, test_quarters=2):
+                                 train_quarters=4, test_quarters=2, mode='rerun', workers=None, checkpoint=None):
         """
         执行Walk-Forward Analysis
         
@@ -122,22 +134,59 @@ class WalkForwardAnalyzer:
             param_grid: 参数网格
             train_quarters: 训练期季度数
             test_quarters: 测试期季度数
+            mode: 'rerun' 每个窗口分别回测训练期和测试期；
+                  'single_pass' 每组参数只在整段数据上回测一次，各窗口的指标从
+                  净值曲线和交易记录切片得到，边界口径见 equity_metrics.window_metrics
+            workers: rerun模式下的并行进程数，None或1为串行，-1为全部CPU核心；
+                     所有窗口的 (窗口, 参数组合) 训练任务放入同一个进程池调度
+            checkpoint: rerun模式的断点日志路径，完成的 (窗口, 参数组合) 训练结果和测试结果随时落盘；
+                        相同配置和数据重新运行时跳过已完成的回测，从中断处继续
         """
+        if mode not in ('rerun', 'single_pass'):
+            raise ValueError(f"未知的walk forward模式: {mode}")
+        if mode == 'single_pass' and checkpoint is not None:
+            raise ValueError("single_pass 模式不支持断点续跑")
+
         self.logger.info(f"开始Walk-Forward Analysis...")
         self.logger.info(f"训练期: {train_quarters}个季度, 测试期: {test_quarters}个季度")
         
         # 生成时间窗口
         windows = self.generate_quarterly_windows(train_quarters, test_quarters)
         self.logger.info(f"总共生成 {len(windows)} 个窗口")
+        if isinstance(param_grid, ParamGrid):
+            self.logger.info(f"{param_grid.describe()}，{len(windows)} 个窗口共节省 {param_grid.saved * len(windows)} 次训练回测")
+
+        if mode == 'single_pass':
+            self._run_single_pass(param_grid, windows)
+            return
+
+        # 断点日志的数据指纹按整个数据集计算
+        config = {'walk_forward': windows, 'param_grid': param_grid}
+        with open_journal(checkpoint, self.backtest_runner, self.strategy_class, self.data_feed, config) as journal:
+            self._run_rerun(param_grid, windows, workers, journal)
+
+    def _run_rerun(self, param_grid: Dict[str, List[Any]], windows: List[Tuple[str, str, str, str]], workers, journal):
+        """rerun模式：按 job_queue / workers 选择任务队列、进程池或串行执行"""
+        if self.job_queue is not None:
+            key = self.job_queue.publish_data(self.data_feed.arrays, self.timeframe, self.compression)
+            self._run_scheduled(param_grid, windows, lambda lo, hi, params: self.job_queue.submit(
+                self.strategy_class, self.backtest_runner, key, params, rows=(lo, hi)), journal)
+            return
+
+        workers = resolve_workers(workers)
+        if workers > 1:
+            with worker_pool(self.strategy_class, self.data_feed.arrays, self.timeframe, self.compression,
+                             self.backtest_runner, workers) as executor:
+                self._run_scheduled(param_grid, windows, lambda lo, hi, params: executor.submit(run_slice, lo, hi, params), journal)
+            return
         
         for i, (train_start, train_end, test_start, test_end) in enumerate(windows):
-            self.logger.info(f"=== 窗口 {i+1}/{len(windows)} ===")
-            self.logger.info(f"训练期: {train_start} 至 {train_end}")
-            self.logger.info(f"测试期: {test_start} 至 {test_end}")
+            window_journal = journal.scope(f'window{i}') if journal is not None else None
+            self._log_window(i, windows)
             
             # 1. 训练期优化
             self.logger.info("正在训练期优化参数...")
-            train_data = load_data(self.data_file, train_start, train_end)
+            train_data = self._window_feed(train_start, train_end)
             
             optimizer = GridSearchOptimizer(
                 strategy_class=self.strategy_class,
@@ -147,11 +196,13 @@ class WalkForwardAnalyzer:
                 stake=self.stake,
                 sizer_type=self.sizer_type,
                 size_percent=self.size_percent,
-                tick_type=self.tick_type
+                tick_type=self.tick_type,
+                use_cache=self.use_cache,
+                mode=self.mode
             )
             
             # 执行参数优化
-            train_results_df = optimizer.optimize(param_grid)
+            train_results_df = optimizer.optimize(param_grid, checkpoint=window_journal)
             
             if train_results_df.empty:
                 self.logger.warning("训练期优化失败，跳过此窗口")
@@ -161,65 +212,223 @@ class WalkForwardAnalyzer:
             best_params = optimizer.get_best_params('sharpe_ratio')
             self.logger.info(f"最佳参数: {best_params}")
             
-            # 记录训练结果
-            train_result = {
-                'window_idx': i+1,
-                'train_start': train_start,
-                'train_end': train_end,
-                'best_params': best_params,
-                'train_performance': train_results_df.iloc[0].to_dict()
-            }
-            self.train_results.append(train_result)
-            
-            # 2. 测试期验证
-            self.logger.info("正在测试期验证...")
-            test_result = self._run_test_period(best_params, test_start, test_end)
-            
-            if test_result:
-                test_result.update({
-                    'window_idx': i+1,
-                    'test_start': test_start,
-                    'test_end': test_end,
-                    'best_params': best_params
-                })
-                self.test_results.append(test_result)
-                
-                # 汇总结果
-                train_sharpe = train_result['train_performance']['sharpe_ratio']
-                summary = {
-                    'window_idx': i+1,
-                    'train_start': train_start,
-                    'train_end': train_end,
-                    'test_start': test_start,
-                    'test_end': test_end,
-                    'efficiency': test_result['sharpe_ratio'] / train_sharpe if train_sharpe != 0 else 0,
-                    'train_sharpe': train_sharpe,
-                    'test_sharpe': test_result['sharpe_ratio'],
-                    'train_return': train_result['train_performance']['total_return'],
-                    'test_return': test_result['total_return'],
-                    'train_max_dd': train_result['train_performance']['max_drawdown'],
-                    'test_max_dd': test_result['max_drawdown'],
-                    'train_win_rate': train_result['train_performance']['win_rate'],
-                    'test_win_rate': test_result['win_rate'],
-                    'train_PL_ratio': train_result['train_performance']['P/L_ratio'],
-                    'test_PL_ratio': test_result['P/L_ratio']
-                }
-                self.walk_forward_results.append(summary)
-                self.logger.info(f"=== 测试期验证结果 === ")
-                self.logger.info(f"夏普比率: {test_result['sharpe_ratio']:.2f}")
-                self.logger.info(f"最大回撤: {test_result['max_drawdown']:.2f}%")
-                self.logger.info(f"收益率: {test_result['total_return']:.2%}")
-                self.logger.info(f"胜率: {test_result['win_rate']:.2f}%")
-                self.logger.info(f"盈亏比: {test_result['P/L_ratio']:.2f}")
-                self.logger.info(f"Walk forward 效率: {summary['efficiency']:.2f}")
+            # 2. 测试期验证；没有可用的最佳参数时不回测（与进程池调度一致，不按默认参数回测）
+            if not best_params:
+                test_result = None
+            elif window_journal is not None and 'test' in window_journal:
+                test_result = window_journal.get('test')
             else:
-                self.logger.warning("测试期验证失败")
+                self.logger.info("正在测试期验证...")
+                test_result = self._run_test_period(best_params, test_start, test_end)
+                if window_journal is not None:
+                    window_journal.record('test', test_result)
+            self._record_window(i, windows[i], train_results_df, best_params, test_result)
+
+    def _run_scheduled(self, param_grid: Dict[str, List[Any]], windows: List[Tuple[str, str, str, str]], submit, journal=None):
+        """
+        所有窗口共用一个进程池或任务队列：submit(lo, hi, params) 提交一次回测并返回Future。
+        (窗口, 参数组合) 训练任务一次性全部提交，
+        某个窗口的训练任务全部完成后立即提交该窗口的测试任务。
+        结果先按 (窗口, 参数组合) 位置收集，全部完成后按窗口顺序写入，与串行模式一致。
+        给出断点日志时已完成的任务不再提交，新完成的任务（未抛出异常的）逐个写入日志
+        """
+        if not windows:
+            return
+
+        param_list = grid_param_list(param_grid)
+        keys = [params_key(params) for params in param_list]
+        scopes = [journal.scope(f'window{i}') if journal is not None else None for i in range(len(windows))]
+        total = len(windows) * len(param_list)
+
+        train_outputs = [[None] * len(param_list) for _ in windows]
+        remaining = [len(param_list) for _ in windows]
+        best_params_list = [None] * len(windows)
+        test_outputs = [None] * len(windows)
+        done = 0
+        pending = {}
+
+        def window_trained(i):
+            # 该窗口训练完成，按参数组合顺序选出最佳参数后提交测试任务
+            best_params = select_best_params(self._window_train_results(train_outputs[i], param_list), 'sharpe_ratio')
+            best_params_list[i] = best_params
+            if not best_params:
+                return
+            if scopes[i] is not None and 'test' in scopes[i]:
+                test_outputs[i] = scopes[i].get('test')
+                return
+            lo, hi = slice_bounds(self.dataframe, windows[i][2], windows[i][3])
+            pending[submit(lo, hi, best_params)] = ('test', i, None)
+
+        for i, (train_start, train_end, _, _) in enumerate(windows):
+            lo, hi = slice_bounds(self.dataframe, train_start, train_end)
+            for j, params in enumerate(param_list):
+                if scopes[i] is not None and keys[j] in scopes[i]:
+                    train_outputs[i][j] = scopes[i].get(keys[j])
+                    remaining[i] -= 1
+                    done += 1
+                else:
+                    pending[submit(lo, hi, params)] = ('train', i, j)
+        if done:
+            self.logger.info(f"断点日志中已有 {done}/{total} 个训练任务的结果")
+        for i in range(len(windows)):
+            if remaining[i] == 0:
+                window_trained(i)
+
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                kind, i, j = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    self.logger.error(f"窗口 {i+1} 回测失败: {str(e)}")
+                    result = None
+                else:
+                    if scopes[i] is not None:
+                        scopes[i].record('test' if kind == 'test' else keys[j], result)
+
+                if kind == 'test':
+                    test_outputs[i] = result
+                    continue
+
+                train_outputs[i][j] = result
+                remaining[i] -= 1
+                done += 1
+                self.logger.info(f"训练任务进度: {done}/{total}")
+                if remaining[i] == 0:
+                    window_trained(i)
+
+        for i in range(len(windows)):
+            self._log_window(i, windows)
+            train_results = self._window_train_results(train_outputs[i], param_list)
+            if not train_results:
+                self.logger.warning("训练期优化失败，跳过此窗口")
+                continue
+            self.logger.info(f"最佳参数: {best_params_list[i]}")
+            self._record_window(i, windows[i], results_to_frame(train_results), best_params_list[i], test_outputs[i])
+
+    @staticmethod
+    def _window_train_results(outputs: List[Dict[str, Any]], param_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """合并一个窗口的回测结果与参数，跳过失败的回测（与GridSearchOptimizer一致）"""
+        results = []
+        for result, params in zip(outputs, param_list):
+            if result:
+                result = dict(result)
+                result.update(params)
+                results.append(result)
+        return results
+
+    def _run_single_pass(self, param_grid: Dict[str, List[Any]], windows: List[Tuple[str, str, str, str]]):
+        """每组参数在覆盖全部窗口的数据上只回测一次，再按窗口切片计算训练/测试指标"""
+        if not windows:
+            return
+
+        param_list = grid_param_list(param_grid)
+        full_data = self._window_feed(windows[0][0], windows[-1][3])
+
+        recordings = []
+        for j, params in enumerate(param_list):
+            self.logger.info(f"整段回测进度: {j+1}/{len(param_list)}")
+            result = self.backtest_runner.run(
+                strategy_class=self.strategy_class,
+                data_feed=full_data,
+                params=params,
+                record=True
+            )
+            if result:
+                recordings.append((params, result['recording']))
+
+        for i, (train_start, train_end, test_start, test_end) in enumerate(windows):
+            self._log_window(i, windows)
+
+            train_results = []
+            for params, recording in recordings:
+                result = window_metrics(recording, train_start, train_end)
+                result.update(params)
+                train_results.append(result)
+
+            best_params = select_best_params(train_results, 'sharpe_ratio')
+            if not best_params:
+                self.logger.warning("训练期优化失败，跳过此窗口")
+                continue
+            self.logger.info(f"最佳参数: {best_params}")
+
+            best_recording = next(recording for params, recording in recordings if params == best_params)
+            test_result = window_metrics(best_recording, test_start, test_end)
+            self._record_window(i, windows[i], results_to_frame(train_results), best_params, test_result)
+
+    def _log_window(self, i: int, windows: List[Tuple[str, str, str, str]]):
+        train_start, train_end, test_start, test_end = windows[i]
+        self.logger.info(f"=== 窗口 {i+1}/{len(windows)} ===")
+        self.logger.info(f"训练期: {train_start} 至 {train_end}")
+        self.logger.info(f"测试期: {test_start} 至 {test_end}")
+
+    def _record_window(self, i: int, window: Tuple[str, str, str, str], train_results_df: pd.DataFrame,
+                       best_params: Dict[str, Any], test_result: Dict[str, Any]):
+        """记录一个窗口的训练结果、测试结果和汇总"""
+        train_start, train_end, test_start, test_end = window
+
+        # 记录训练结果
+        train_result = {
+            'window_idx': i+1,
+            'train_start': train_start,
+            'train_end': train_end,
+            'best_params': best_params,
+            'train_performance': train_results_df.iloc[0].to_dict()
+        }
+        self.train_results.append(train_result)
+
+        if not test_result:
+            self.logger.warning("测试期验证失败")
+            return
+
+        test_result.update({
+            'window_idx': i+1,
+            'test_start': test_start,
+            'test_end': test_end,
+            'best_params': best_params
+        })
+        self.test_results.append(test_result)
+        
+        # 汇总结果
+        train_sharpe = train_result['train_performance']['sharpe_ratio']
+        summary = {
+            'window_idx': i+1,
+            'train_start': train_start,
+            'train_end': train_end,
+            'test_start': test_start,
+            'test_end': test_end,
+            'efficiency': test_result['sharpe_ratio'] / train_sharpe if train_sharpe != 0 else 0,
+            'train_sharpe': train_sharpe,
+            'test_sharpe': test_result['sharpe_ratio'],
+            'train_return': train_result['train_performance']['total_return'],
+            'test_return': test_result['total_return'],
+            'train_max_dd': train_result['train_performance']['max_drawdown'],
+            'test_max_dd': test_result['max_drawdown'],
+            'train_win_rate': train_result['train_performance']['win_rate'],
+            'test_win_rate': test_result['win_rate'],
+            'train_PL_ratio': train_result['train_performance']['P/L_ratio'],
+            'test_PL_ratio': test_result['P/L_ratio']
+        }
+        self.walk_forward_results.append(summary)
+        self.logger.info(f"=== 测试期验证结果 === ")
+        self.logger.info(f"夏普比率: {test_result['sharpe_ratio']:.2f}")
+        self.logger.info(f"最大回撤: {test_result['max_drawdown']:.2f}%")
+        self.logger.info(f"收益率: {test_result['total_return']:.2%}")
+        self.logger.info(f"胜率: {test_result['win_rate']:.2f}%")
+        self.logger.info(f"盈亏比: {test_result['P/L_ratio']:.2f}")
+        self.logger.info(f"Walk forward 效率: {summary['efficiency']:.2f}")
+
+    def _window_feed(self, start: str, end: str):
+        """取窗口数据：二分查找定位后切片，不复制数据"""
+        lo, hi = slice_bounds(self.dataframe, start, end)
+        return slice_feed(self.data_feed, lo, hi)
 
     def _run_test_period(self, params: Dict[str, Any], test_start: str, test_end: str):
         """运行测试期回测"""
         try:
             # 加载测试期数据
-            test_data = load_data(self.data_file, test_start, test_end)
+            test_data = self._window_feed(test_start, test_end)
             
             # 使用BacktestRunner
             result = self.backtest_runner.run(
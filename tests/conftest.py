@@ -0,0 +1,44 @@
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from maru_quant.utils.config_manager import config_manager
+
+@pytest.fixture(autouse=True)
+def quiet_logs(monkeypatch):
+    # 策略日志默认DEBUG级别逐bar输出，测试中关闭
+    monkeypatch.setitem(config_manager.logger_config, 'log_level', 'WARNING')
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    # 数据缓存和回测结果缓存写到临时目录，不污染仓库下的 cache/
+    monkeypatch.setitem(config_manager.cache_config, 'cache_dir', str(tmp_path / 'cache'))
+
+@pytest.fixture(autouse=True)
+def isolated_logs(tmp_path, monkeypatch):
+    # 日志文件写到临时目录，不在仓库下的 log/ 生成文件
+    log_dir = str(tmp_path / 'log')
+    monkeypatch.setitem(config_manager.logger_config, 'log_dir', log_dir)
+    yield
+    # setup_logger 按名字复用logger，关闭本测试创建的日志文件，下个测试重新创建
+    for logger in list(logging.Logger.manager.loggerDict.values()):
+        if not isinstance(logger, logging.Logger):
+            continue
+        if any(isinstance(h, logging.FileHandler) and h.baseFilename.startswith(log_dir) for h in logger.handlers):
+            for handler in list(logger.handlers):
+                logger.removeHandler(handler)
+                handler.close()
+
+@pytest.fixture
+def synthetic_df():
+    """带趋势和波动的30分钟合成行情，足够触发突破信号"""
+    n = 800
+    rng = np.random.default_rng(7)
+    close = 2000 + np.cumsum(rng.normal(0.05, 1.5, n)) + 8 * np.sin(np.arange(n) / 25)
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    high = np.maximum(open_, close) + rng.uniform(0.1, 1.5, n)
+    low = np.minimum(open_, close) - rng.uniform(0.1, 1.5, n)
+    index = pd.date_range('2024-01-01', periods=n, freq='30min', tz='UTC', name='datetime')
+    return pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close, 'Volume': 0.0}, index=index)
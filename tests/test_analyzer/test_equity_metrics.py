@@ -0,0 +1,102 @@
+import backtrader as bt
+import numpy as np
+import pytest
+
+from maru_quant.analyzer.equity_metrics import (
+    FACTOR_30MIN, annualization_factor, drawdown_duration, equity_report, period_returns, rolling_sharpe, sharpe_ratio,
+    sortino_ratio, window_metrics
+)
+from maru_quant.analyzer.PerformanceAnalyzer import PeriodReturns
+from maru_quant.broker.commission_info import comm_ibkr_XAUUSD
+from maru_quant.strategy.trendtracking.breakout import PivotBreakout
+from maru_quant.utils.backtest_runner import BacktestRunner
+from maru_quant.utils.dataloader import make_feed
+
+RUNNER_PARAMS = dict(cash=500, commission=0, stake=1, sizer_type='fixed', size_percent=30, tick_type='CFD')
+
+def test_full_span_window_matches_runner(synthetic_df):
+    feed = make_feed(synthetic_df, bt.TimeFrame.Minutes, 30)
+    result = BacktestRunner(**RUNNER_PARAMS).run(PivotBreakout, feed, {'window': 8}, record=True)
+    recording = result.pop('recording')
+    assert len(recording['value']) == len(synthetic_df)
+
+    sliced = window_metrics(recording, synthetic_df.index[0], synthetic_df.index[-1])
+    assert result['total_trade'] > 0
+    assert sliced == pytest.approx(result, rel=1e-9)
+
+def test_window_slices_trades_by_close_time(synthetic_df):
+    feed = make_feed(synthetic_df, bt.TimeFrame.Minutes, 30)
+    result = BacktestRunner(**RUNNER_PARAMS).run(PivotBreakout, feed, {'window': 8}, record=True)
+    recording = result['recording']
+
+    middle = synthetic_df.index[len(synthetic_df) // 2]
+    first = window_metrics(recording, synthetic_df.index[0], middle)
+    second = window_metrics(recording, middle + (synthetic_df.index[1] - synthetic_df.index[0]), synthetic_df.index[-1])
+    assert first['total_trade'] + second['total_trade'] == result['total_trade']
+    assert first['final_value'] == pytest.approx(recording['value'][len(synthetic_df) // 2])
+    # 两段收益率复合后等于整段收益率
+    compound = (1 + first['total_return']) * (1 + second['total_return']) - 1
+    assert compound == pytest.approx(result['total_return'])
+
+def test_drawdown_duration_and_sortino():
+    values = np.array([1.0, 2.0, 1.5, 1.8, 2.1, 2.0, 1.9])
+    assert drawdown_duration(values) == {'max_duration': 2, 'current_duration': 2}
+    assert drawdown_duration(np.arange(1.0, 5.0)) == {'max_duration': 0, 'current_duration': 0}
+
+    returns = np.array([0.01, -0.02, 0.005, -0.01])
+    downside = np.sqrt(np.mean(np.array([0, -0.02, 0, -0.01]) ** 2))
+    assert sortino_ratio(returns, annualize=False) == pytest.approx(returns.mean() / downside)
+    assert sortino_ratio(np.array([0.01, 0.02])) is None
+
+def test_rolling_sharpe_matches_windowed_sharpe():
+    returns = np.random.default_rng(1).normal(0.0005, 0.01, 300)
+    returns[100:140] = 0.0
+    rolling = rolling_sharpe(returns, 30)
+    assert np.isnan(rolling[:29]).all()
+    for end in (29, 99, 200, 299):
+        assert rolling[end] == pytest.approx(sharpe_ratio(returns[end - 29:end + 1]), rel=1e-6)
+    # 零波动窗口与 sharpe_ratio 一样没有结果
+    assert np.isnan(rolling[139])
+
+def test_equity_report_matches_runner(synthetic_df):
+    feed = make_feed(synthetic_df, bt.TimeFrame.Minutes, 30)
+    result = BacktestRunner(**RUNNER_PARAMS).run(PivotBreakout, feed, {'window': 8}, record=True)
+    report = equity_report(result['recording'], rolling_window=48)
+
+    assert annualization_factor(30) == FACTOR_30MIN
+    assert report['factor'] == FACTOR_30MIN
+    assert report['sharpe_ratio'] == pytest.approx(result['sharpe_ratio'], rel=1e-9)
+    assert report['max_drawdown'] == pytest.approx(result['max_drawdown'], rel=1e-9)
+    assert report['total_trades'] == result['total_trade']
+    assert report['max_consecutive_wins'] + report['max_consecutive_losses'] <= result['total_trade']
+    assert len(report['rolling_sharpe']) == len(synthetic_df)
+
+def test_trade_stats_are_net_of_commission(synthetic_df, monkeypatch):
+    monkeypatch.setattr(comm_ibkr_XAUUSD.p, 'commission', 0.3)
+    feed = make_feed(synthetic_df, bt.TimeFrame.Minutes, 30)
+    result = BacktestRunner(**RUNNER_PARAMS, use_cache=False).run(PivotBreakout, feed, {'window': 8}, record=True)
+    recording = result.pop('recording')
+    trades = recording['trades']
+    assert (trades['pnlcomm'] < trades['pnl']).all()
+
+    # 胜负统计与 ledger_stats 一样按净盈亏计算，与回测结果一致
+    net = trades['pnlcomm']
+    report = equity_report(recording)
+    assert report['wins'] == (net > 0).sum()
+    assert report['avg_win'] == pytest.approx(net[net > 0].mean())
+    assert report['expectancy'] == pytest.approx(net.mean())
+    assert report['win_rate'] == pytest.approx(result['win_rate'])
+    assert report['avg_loss'] == pytest.approx(result['avg_loss'])
+    sliced = window_metrics(recording, synthetic_df.index[0], synthetic_df.index[-1])
+    assert sliced == pytest.approx(result, rel=1e-9)
+
+@pytest.mark.parametrize('minutes', [5, 10, 30, 45])
+def test_period_returns_matches_streaming(minutes):
+    rng = np.random.default_rng(3)
+    dt = 738000.0 + np.arange(500) * minutes / 1440
+    values = 1000 + np.cumsum(rng.normal(size=500))
+
+    streaming = PeriodReturns(1000.0)
+    expected = [r for r in (streaming.update(d, v) for d, v in zip(dt, values)) if r is not None]
+    expected.append(streaming.flush())
+    np.testing.assert_array_equal(period_returns(dt, values, 1000.0), expected)
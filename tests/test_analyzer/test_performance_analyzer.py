@@ -0,0 +1,37 @@
+import backtrader as bt
+import pandas as pd
+import pytest
+
+from maru_quant.analyzer import SharpeRatio_30min, WinLossRatioAnalyzer, PerformanceAnalyzer
+from maru_quant.analyzer.robustsharpe_30min import RobustSharpe_30min
+from maru_quant.broker.commission_info import comm_ibkr_XAUUSD
+from maru_quant.strategy.trendtracking.breakout import PivotBreakout
+from maru_quant.utils.dataloader import make_feed
+
+def _run_analyzers(df, compression):
+    cerebro = bt.Cerebro()
+    cerebro.adddata(make_feed(df, bt.TimeFrame.Minutes, compression))
+    cerebro.addstrategy(PivotBreakout, window=8)
+    cerebro.broker.setcash(500)
+    cerebro.broker.addcommissioninfo(comm_ibkr_XAUUSD)
+    cerebro.addanalyzer(SharpeRatio_30min, _name='sharpe_ratio')
+    cerebro.addanalyzer(bt.analyzers.DrawDown, _name='drawdown')
+    cerebro.addanalyzer(WinLossRatioAnalyzer, _name='winloss')
+    cerebro.addanalyzer(RobustSharpe_30min, _name='robust')
+    cerebro.addanalyzer(PerformanceAnalyzer, _name='performance')
+    return cerebro.run()[0].analyzers
+
+@pytest.mark.parametrize('freq, compression', [('30min', 30), ('10min', 10)])
+def test_matches_separate_analyzers(synthetic_df, freq, compression):
+    df = synthetic_df.set_axis(pd.date_range('2024-01-01 00:10', periods=len(synthetic_df), freq=freq, tz='UTC', name='datetime'))
+    analyzers = _run_analyzers(df, compression)
+    performance = analyzers.performance.get_analysis()
+    winloss = analyzers.winloss.get_analysis()
+
+    assert winloss['total_trades'] > 0
+    # 10分钟数据每3根bar合成一个30分钟收益周期
+    assert performance['sharperatio'] == pytest.approx(analyzers.sharpe_ratio.get_analysis()['sharperatio'], rel=1e-9)
+    assert performance['robust_sharpe'] == analyzers.robust.get_analysis()['sharperatio']
+    assert performance['max_drawdown'] == pytest.approx(analyzers.drawdown.get_analysis().max.drawdown, rel=1e-12)
+    assert {k: performance[k] for k in winloss} == winloss
+    assert len(performance['value']) == len(df)
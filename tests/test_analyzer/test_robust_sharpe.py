@@ -0,0 +1,77 @@
+import backtrader as bt
+import numpy as np
+import pytest
+
+from maru_quant.analyzer.quantile_sketch import MedianMAD, TDigest
+from maru_quant.analyzer.robustsharpe_30min import RobustSharpe_30min
+from maru_quant.broker.commission_info import comm_ibkr_XAUUSD
+from maru_quant.utils.dataloader import make_feed
+
+class BuyAndHold(bt.Strategy):
+    # 全程持仓，收益中位数和MAD都不为0
+    def next(self):
+        if not self.position:
+            self.buy()
+
+def _run(df, **params):
+    cerebro = bt.Cerebro()
+    cerebro.adddata(make_feed(df, bt.TimeFrame.Minutes, 30))
+    cerebro.addstrategy(BuyAndHold)
+    cerebro.broker.setcash(500)
+    cerebro.broker.addcommissioninfo(comm_ibkr_XAUUSD)
+    cerebro.addanalyzer(RobustSharpe_30min, _name='robust', **params)
+    cerebro.addanalyzer(bt.analyzers.TimeReturn, _name='returns', timeframe=bt.TimeFrame.Minutes, compression=30)
+    return cerebro.run()[0].analyzers
+
+def test_exact_mode_matches_timereturn_median(synthetic_df):
+    analyzers = _run(synthetic_df, mode='exact')
+    returns = np.array(list(analyzers.returns.get_analysis().values()))
+    median = np.median(returns)
+    expected = np.sqrt(252 * 23 * 2) * (median / np.median(np.abs(returns - median)))
+
+    assert expected != 0
+    assert analyzers.robust.get_analysis()['sharperatio'] == expected
+
+def test_streaming_mode_close_to_exact(synthetic_df):
+    exact = _run(synthetic_df, mode='exact').robust.get_analysis()['sharperatio']
+    streaming = _run(synthetic_df, mode='streaming', compression=200).robust.get_analysis()['sharperatio']
+    assert streaming == pytest.approx(exact, rel=0.05)
+
+def test_digest_rank_error_bounded():
+    rng = np.random.default_rng(3)
+    values = rng.standard_t(3, size=200000)
+    digest = TDigest(compression=500)
+    for chunk in np.array_split(values, 7):
+        for x in chunk[:1000]:
+            digest.add(x)
+        digest.extend(chunk[1000:])
+
+    assert len(digest) == len(values)
+    assert len(digest._centroids()[0]) <= 500 // 2 + 1
+    ordered = np.sort(values)
+    for q in (0.1, 0.5, 0.9):
+        rank = np.searchsorted(ordered, digest.quantile(q)) / len(values)
+        assert rank == pytest.approx(q, abs=2 / 500)
+
+    median = digest.quantile(0.5)
+    mad_rank = np.mean(np.abs(values - median) <= digest.median_abs_deviation(median))
+    assert mad_rank == pytest.approx(0.5, abs=4 / 500)
+
+def test_auto_mode_switches_to_digest():
+    values = np.random.default_rng(5).normal(size=5000)
+    estimator = MedianMAD('auto', exact_limit=1000, compression=500)
+    for x in values[:1000]:
+        estimator.add(x)
+    assert estimator.is_exact
+    median = np.median(values[:1000])
+    assert estimator.median_mad() == (median, np.median(np.abs(values[:1000] - median)))
+
+    for x in values[1000:]:
+        estimator.add(x)
+    assert not estimator.is_exact
+    median, mad = estimator.median_mad()
+    assert median == pytest.approx(np.median(values), abs=0.01)
+    assert mad == pytest.approx(np.median(np.abs(values - np.median(values))), rel=0.02)
+
+    with pytest.raises(ValueError):
+        MedianMAD('sketch')
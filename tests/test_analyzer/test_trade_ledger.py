@@ -0,0 +1,54 @@
+import backtrader as bt
+import numpy as np
+import pytest
+
+from maru_quant.analyzer import WinLossRatioAnalyzer, TradeLedger, TRADE_DTYPE
+from maru_quant.broker.commission_info import comm_ibkr_XAUUSD
+from maru_quant.strategy.trendtracking.breakout import PivotBreakout
+from maru_quant.utils.dataloader import make_feed
+
+class RecordFills(PivotBreakout):
+    def start(self):
+        super().start()
+        self.fills = []
+
+    def notify_order(self, order):
+        super().notify_order(order)
+        if order.status == order.Completed:
+            self.fills.append((len(self.data) - 1, order.executed.price, order.executed.size))
+
+def test_ledger_matches_order_fills(synthetic_df):
+    cerebro = bt.Cerebro()
+    cerebro.adddata(make_feed(synthetic_df, bt.TimeFrame.Minutes, 30))
+    cerebro.addstrategy(RecordFills, window=8)
+    cerebro.broker.setcash(500)
+    cerebro.broker.addcommissioninfo(comm_ibkr_XAUUSD)
+    cerebro.addanalyzer(WinLossRatioAnalyzer, _name='winloss')
+    strat = cerebro.run()[0]
+    analyzer = strat.analyzers.winloss
+    trades = analyzer.ledger.to_records()
+    summary = analyzer.get_analysis()
+
+    assert summary['total_trades'] == len(trades) > 0
+    # 单仓位策略：成交依次为 开仓、平仓
+    fills = np.array(strat.fills[:2 * len(trades)]).reshape(len(trades), 2, 3)
+    assert (trades['entry_bar'] == fills[:, 0, 0]).all()
+    assert (trades['exit_bar'] == fills[:, 1, 0]).all()
+    assert (trades['bars_held'] == trades['exit_bar'] - trades['entry_bar']).all()
+    assert trades['entry_price'] == pytest.approx(fills[:, 0, 1])
+    assert trades['exit_price'] == pytest.approx(fills[:, 1, 1])
+    assert (trades['size'] == fills[:, 0, 2]).all()
+    assert trades['pnlcomm'][trades['pnlcomm'] > 0].mean() == pytest.approx(summary['avg_win'])
+
+    df = analyzer.ledger.to_dataframe()
+    assert list(df.columns) == list(TRADE_DTYPE.names)
+    assert len(df) == len(trades)
+
+def test_ledger_grows_and_exports_views():
+    ledger = TradeLedger(capacity=1)
+    for i in range(5):
+        ledger.append(i, i, i + 3, 0.0, 1.0, 100.0, 101.0, 1.0, 1.0, 0.9)
+    records = ledger.to_records()
+    assert len(ledger) == 5
+    assert (records['bars_held'] == 3).all()
+    assert np.shares_memory(records, ledger.to_records())
@@ -1,27 +1,13 @@
-import sys
-import os
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
-
-from indicator.CandleStrengthIndex import CandleStrengthIndex
+from maru_quant.indicator.CandleStrengthIndex import CandleStrengthIndex
 import backtrader as bt
+import pandas as pd
 
-def test_bt_indicator():
-    print("\nBacktrader Indicator tests:")
-
+def _run_csi(df, runonce):
     class TestData(bt.feeds.PandasData):
         lines = ('open', 'high', 'low', 'close',)
         params = (('datetime', None),)
 
-    import pandas as pd
-    df = pd.DataFrame([
-        {'open': 10, 'high': 12, 'low': 8, 'close': 12},   # Hammer
-        {'open': 10, 'high': 12, 'low': 8, 'close': 8},   # Inverted Hammer
-        {'open': 10, 'high': 12, 'low': 9, 'close': 9},     # Doji
-        {'open': 10, 'high': 15, 'low': 10, 'close': 15},    # Big Bullish
-        {'open': 15, 'high': 15, 'low': 10, 'close': 10},    # Big Bearish
-        {'open': 10, 'high': 15, 'low': 9, 'close': 10.5},   # Shooting Star
-    ])
-    df.index = pd.date_range('2020-01-01', periods=len(df), freq='D')
+    values = []
 
     class CSITestStrategy(bt.Strategy):
         def __init__(self):
@@ -30,12 +16,35 @@ def test_bt_indicator():
         def next(self):
             dt = self.datas[0].datetime.date(0)
             print(f"{dt}: {self.csi[0]:.4f}")
+            values.append(self.csi[0])
 
-    cerebro = bt.Cerebro()
+    cerebro = bt.Cerebro(runonce=runonce)
     data = TestData(dataname=df)
     cerebro.adddata(data)
     cerebro.addstrategy(CSITestStrategy)
     cerebro.run()
+    return values
+
+def test_bt_indicator():
+    print("\nBacktrader Indicator tests:")
+
+    df = pd.DataFrame([
+        {'open': 10, 'high': 12, 'low': 8, 'close': 12},   # Hammer
+        {'open': 10, 'high': 12, 'low': 8, 'close': 8},   # Inverted Hammer
+        {'open': 10, 'high': 12, 'low': 9, 'close': 9},     # Doji
+        {'open': 10, 'high': 15, 'low': 10, 'close': 15},    # Big Bullish
+        {'open': 15, 'high': 15, 'low': 10, 'close': 10},    # Big Bearish
+        {'open': 10, 'high': 15, 'low': 9, 'close': 10.5},   # Shooting Star
+        {'open': 10, 'high': 10, 'low': 10, 'close': 10},   # Flat (high == low)
+    ])
+    df.index = pd.date_range('2020-01-01', periods=len(df), freq='D')
+
+    # 逐bar模式与runonce模式（向量化once）结果逐位一致
+    values_next = _run_csi(df, runonce=False)
+    values_once = _run_csi(df, runonce=True)
+    assert values_once == values_next
+    assert values_next[0] == 0.65
+    assert values_next[-1] == 0
 
 if __name__ == "__main__":
     test_bt_indicator()
@@ -0,0 +1,64 @@
+import backtrader as bt
+import numpy as np
+import pytest
+
+from maru_quant.indicator.cache import IndicatorCache, cached_indicator, get_indicator_cache, use_indicator_cache
+from maru_quant.indicator.PivotHigh import PivotHigh
+from maru_quant.strategy.trendtracking.breakout import PivotBreakout
+from maru_quant.utils.backtest_runner import BacktestRunner
+from maru_quant.utils.config_manager import config_manager
+from maru_quant.utils.dataloader import make_feed
+
+def _lines(df, runonce, cached):
+    class Probe(bt.Strategy):
+        def __init__(self):
+            self.inds = [
+                cached_indicator(PivotHigh, self.data, window=5, max_resists=3),
+                cached_indicator(bt.indicators.ExponentialMovingAverage, self.data, period=20),
+                cached_indicator(bt.indicators.ATR, self.data, period=14),
+            ]
+
+    cerebro = bt.Cerebro(runonce=runonce, stdstats=False)
+    cerebro.adddata(make_feed(df, bt.TimeFrame.Minutes, 30))
+    cerebro.addstrategy(Probe)
+    with use_indicator_cache(cached):
+        strat = cerebro.run()[0]
+    assert all(type(ind).__name__.startswith('Cached') == cached for ind in strat.inds)
+    return [np.array([line.array[:len(df)] for line in ind.lines]) for ind in strat.inds]
+
+@pytest.mark.parametrize('runonce', [True, False])
+def test_cached_lines_match_indicators(synthetic_df, runonce):
+    expected = _lines(synthetic_df, runonce, cached=False)
+    for actual, reference in zip(_lines(synthetic_df, runonce, cached=True), expected):
+        np.testing.assert_array_equal(actual, reference)
+
+def test_runner_results_unchanged_and_shared(synthetic_df, monkeypatch):
+    feed = make_feed(synthetic_df, bt.TimeFrame.Minutes, 30)
+    runner = BacktestRunner(use_cache=False)
+    param_list = [dict(window=8, take_profit_atr=tp) for tp in (3, 5, 7)]
+
+    cache = get_indicator_cache()
+    cache.clear()
+    hits = cache.hits
+    cached = runner.run_batch(PivotBreakout, feed, param_list)
+    # 三个指标只在第一组参数上计算
+    assert len(cache) == 3
+    assert cache.hits - hits == 6
+
+    monkeypatch.setitem(config_manager.cache_config, 'indicator_cache', False)
+    assert runner.run_batch(PivotBreakout, feed, param_list) == cached
+
+def test_lru_eviction_by_bytes():
+    cache = IndicatorCache(max_bytes=3 * 800)
+    for key in 'abc':
+        cache.get_or_compute(key, lambda: np.zeros(100))
+    cache.get_or_compute('a', lambda: np.ones(100))
+    cache.get_or_compute('d', lambda: np.zeros(100))
+
+    assert 'b' not in cache and all(k in cache for k in 'acd')
+    assert cache.nbytes == 3 * 800
+    values = cache.get_or_compute('a', lambda: np.ones(100))
+    assert (values == 0).all() and not values.flags.writeable
+
+    cache.put('big', np.zeros(1000))
+    assert 'big' not in cache and len(cache) == 3
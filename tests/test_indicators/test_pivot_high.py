@@ -0,0 +1,50 @@
+import math
+import backtrader as bt
+import numpy as np
+import pytest
+
+from maru_quant.indicator.PivotHigh import PivotHigh
+from maru_quant.utils.dataloader import make_feed
+
+def _reference_levels(closes, window, max_resists):
+    """重写前的逐bar算法：每根bar重新扫描左右各window根，列表队列"""
+    n = window
+    queue = []
+    rows = []
+    for i in range(len(closes)):
+        if i < 2 * n:
+            rows.append([math.nan] * 10)
+            continue
+        center = closes[i - n]
+        is_pivot = all(center > closes[i - n - k] for k in range(1, n + 1)) and \
+            all(center > closes[i - n + k] for k in range(1, n + 1))
+        if is_pivot:
+            queue.append(center)
+            if len(queue) > max_resists:
+                queue.pop(0)
+        row = [math.nan] * 10
+        for k in range(min(max_resists, 10, len(queue))):
+            row[k] = queue[-(k + 1)]
+        rows.append(row)
+    return np.array(rows).T
+
+def _run(df, runonce, **params):
+    class Probe(bt.Strategy):
+        def __init__(self):
+            self.pivot = PivotHigh(self.data, **params)
+
+    cerebro = bt.Cerebro(runonce=runonce, stdstats=False)
+    cerebro.adddata(make_feed(df, bt.TimeFrame.Minutes, 30))
+    cerebro.addstrategy(Probe)
+    pivot = cerebro.run()[0].pivot
+    return np.array([pivot.lines[i].array[:len(df)] for i in range(10)])
+
+@pytest.mark.parametrize('params', [dict(window=8, max_resists=5), dict(window=3, max_resists=12), dict(window=16, max_resists=1)])
+def test_pivot_high_matches_reference(synthetic_df, params):
+    df = synthetic_df.copy()
+    # 制造相等的收盘价，检查严格大于的判断
+    df.iloc[100:110, df.columns.get_loc('close')] = df['close'].max() + 1
+    expected = _reference_levels(df['close'].tolist(), **params)
+
+    np.testing.assert_array_equal(_run(df, runonce=False, **params), expected)
+    np.testing.assert_array_equal(_run(df, runonce=True, **params), expected)
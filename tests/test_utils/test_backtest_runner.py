@@ -0,0 +1,56 @@
+import backtrader as bt
+import pytest
+
+from maru_quant.strategy.showdata import ShowData
+from maru_quant.strategy.trendtracking.breakout import PivotBreakout, MultiPivotBreakout, SmoothedPivotBreakout
+from maru_quant.utils.backtest_runner import BacktestRunner, lean_execution
+from maru_quant.utils.dataloader import make_feed
+
+RUNNER_PARAMS = dict(cash=500, stake=1, sizer_type='fixed', tick_type='CFD', use_cache=False)
+
+class Probe(PivotBreakout):
+    def start(self):
+        super().start()
+        type(self).settings = (self.env.p.stdstats, self.env._dorunonce, self.env._exactbars)
+
+class BoundedProbe(Probe):
+    LEAN_EXECUTION = 'bounded'
+
+class Unsupported(PivotBreakout):
+    LEAN_EXECUTION = None
+
+class EquityFilter(PivotBreakout):
+    """净值低于初始资金时不开仓，依赖标准observer记录的净值"""
+    def break_signal(self):
+        return self.stats.broker.value[0] >= self.broker.startingcash and super().break_signal()
+
+def test_lean_mode_matches_default(synthetic_df):
+    feed = make_feed(synthetic_df, bt.TimeFrame.Minutes, 30)
+    expected = BacktestRunner(**RUNNER_PARAMS).run(Probe, feed, {'window': 8})
+    assert Probe.settings == (True, True, 0)
+    assert expected['total_trade'] > 0
+
+    lean = BacktestRunner(**RUNNER_PARAMS, mode='lean')
+    assert lean.run(Probe, feed, {'window': 8}) == expected
+    assert Probe.settings == (False, True, 0)
+    assert lean.run(BoundedProbe, feed, {'window': 8}) == expected
+    assert BoundedProbe.settings == (False, False, -1)
+
+def test_lean_mode_rejects_unsupported_strategy(synthetic_df):
+    feed = make_feed(synthetic_df, bt.TimeFrame.Minutes, 30)
+    with pytest.raises(ValueError):
+        BacktestRunner(**RUNNER_PARAMS, mode='lean').run(Unsupported, feed, {'window': 8})
+    with pytest.raises(ValueError):
+        BacktestRunner(mode='fast')
+    assert BacktestRunner(**RUNNER_PARAMS).run(Unsupported, feed, {'window': 8}) is not None
+
+def test_lean_mode_rejects_observer_strategy(synthetic_df):
+    feed = make_feed(synthetic_df, bt.TimeFrame.Minutes, 30)
+    assert BacktestRunner(**RUNNER_PARAMS).run(EquityFilter, feed, {'window': 8})['total_trade'] > 0
+    # 没有声明 LEAN_EXECUTION，由代码中对observer的访问识别
+    with pytest.raises(ValueError, match='observer'):
+        BacktestRunner(**RUNNER_PARAMS, mode='lean').run(EquityFilter, feed, {'window': 8})
+
+@pytest.mark.parametrize('strategy_class', [ShowData, PivotBreakout, MultiPivotBreakout, SmoothedPivotBreakout])
+def test_shipped_strategies_support_lean(strategy_class):
+    assert lean_execution(strategy_class) == 'runonce'
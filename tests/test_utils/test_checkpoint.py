@@ -0,0 +1,123 @@
+import backtrader as bt
+import pandas as pd
+import pytest
+
+from maru_quant.strategy.trendtracking.breakout import PivotBreakout
+from maru_quant.utils.backtest_runner import BacktestRunner
+from maru_quant.utils.checkpoint import ResultJournal
+from maru_quant.utils import optimizer as optimizer_module
+from maru_quant.utils.dataloader import make_feed
+from maru_quant.utils.optimizer import GridSearchOptimizer
+from maru_quant.utils.walkforward import WalkForwardAnalyzer
+
+PARAM_GRID = {'take_profit_atr': [2.0, 6.0], 'stop_loss_atr': [1.5, 3.0], 'window': [8]}
+RUNNER_PARAMS = dict(cash=500, commission=0, stake=1, sizer_type='fixed', size_percent=30, tick_type='CFD', use_cache=False)
+WINDOWS = [
+    ('2024-01-01', '2024-01-06', '2024-01-06', '2024-01-11'),
+    ('2024-01-02', '2024-01-07', '2024-01-07', '2024-01-12'),
+    ('2024-01-06', '2024-01-12', '2024-01-12', '2024-01-17'),
+]
+RUN = BacktestRunner.run
+
+def _count_runs(monkeypatch, crash_after=None):
+    """统计 BacktestRunner.run 的调用次数，crash_after 次之后模拟进程被中断"""
+    calls = []
+
+    def counting_run(self, *args, **kwargs):
+        if crash_after is not None and len(calls) == crash_after:
+            raise KeyboardInterrupt
+        calls.append(1)
+        return RUN(self, *args, **kwargs)
+
+    monkeypatch.setattr(BacktestRunner, 'run', counting_run)
+    return calls
+
+def test_journal_resumes_and_drops_torn_tail(tmp_path):
+    path = str(tmp_path / 'run.journal')
+    with ResultJournal(path, 'abc') as journal:
+        journal.record('a', {'sharpe_ratio': 1.5})
+        journal.scope('window0').record_many([('a', None), ('test', {'sharpe_ratio': float('nan')})])
+    with open(path, 'ab') as f:
+        f.write(b'{"key": "b", "res')  # 写入中断
+
+    with ResultJournal(path, 'abc') as journal:
+        assert len(journal) == 3
+        assert journal.get('a') == {'sharpe_ratio': 1.5}
+        window = journal.scope('window0')
+        assert 'a' in window and window.get('a') is None and 'b' not in journal
+        journal.record('b', {'sharpe_ratio': 2.0})
+    with ResultJournal(path, 'abc') as journal:
+        assert journal.get('b') == {'sharpe_ratio': 2.0}
+
+    # 配置或数据变化后日志作废
+    with ResultJournal(path, 'changed') as journal:
+        assert len(journal) == 0
+
+def test_optimizer_skips_finished_combos(synthetic_df, tmp_path, monkeypatch):
+    feed = make_feed(synthetic_df, bt.TimeFrame.Minutes, 30)
+    path = str(tmp_path / 'grid.journal')
+    expected = GridSearchOptimizer(PivotBreakout, feed, **RUNNER_PARAMS).optimize(PARAM_GRID)
+
+    monkeypatch.setattr(GridSearchOptimizer, 'CHECKPOINT_BATCH', 1)
+    _count_runs(monkeypatch, crash_after=3)
+    with pytest.raises(KeyboardInterrupt):
+        GridSearchOptimizer(PivotBreakout, feed, **RUNNER_PARAMS).optimize(PARAM_GRID, checkpoint=path)
+
+    calls = _count_runs(monkeypatch)
+    resumed = GridSearchOptimizer(PivotBreakout, feed, **RUNNER_PARAMS).optimize(PARAM_GRID, checkpoint=path)
+    assert len(calls) == 1
+    pd.testing.assert_frame_equal(resumed, expected)
+
+def test_parallel_checkpoint_uses_one_pool(synthetic_df, tmp_path, monkeypatch):
+    feed = make_feed(synthetic_df, bt.TimeFrame.Minutes, 30)
+    path = str(tmp_path / 'grid.journal')
+    expected = GridSearchOptimizer(PivotBreakout, feed, **RUNNER_PARAMS).optimize(PARAM_GRID)
+
+    pools = []
+    worker_pool = optimizer_module.worker_pool
+
+    def counting_pool(*args, **kwargs):
+        pools.append(1)
+        return worker_pool(*args, **kwargs)
+
+    monkeypatch.setattr(optimizer_module, 'worker_pool', counting_pool)
+    monkeypatch.setattr(GridSearchOptimizer, 'CHECKPOINT_BATCH', 1)
+    results = GridSearchOptimizer(PivotBreakout, feed, **RUNNER_PARAMS).optimize(PARAM_GRID, workers=2, checkpoint=path)
+    assert len(pools) == 1
+    pd.testing.assert_frame_equal(results, expected)
+
+    # 每批完成即写入日志，重新运行时全部从日志读取，不再创建进程池
+    resumed = GridSearchOptimizer(PivotBreakout, feed, **RUNNER_PARAMS).optimize(PARAM_GRID, workers=2, checkpoint=path)
+    assert len(pools) == 1
+    pd.testing.assert_frame_equal(resumed, expected)
+
+def test_walk_forward_resumes_after_crash(synthetic_df, tmp_path, monkeypatch):
+    data_file = str(tmp_path / 'SYN, 30_2024.csv')
+    synthetic_df.to_csv(data_file)
+    path = str(tmp_path / 'wfa.journal')
+
+    def analyzer():
+        wfa = WalkForwardAnalyzer(PivotBreakout, data_file, '', '', **RUNNER_PARAMS)
+        monkeypatch.setattr(wfa, 'generate_quarterly_windows', lambda *args: WINDOWS)
+        return wfa
+
+    expected = analyzer()
+    expected.run_walk_forward_analysis(PARAM_GRID)
+
+    # 每个窗口4个训练回测和1个测试回测；第二个窗口训练到一半时中断
+    monkeypatch.setattr(GridSearchOptimizer, 'CHECKPOINT_BATCH', 1)
+    _count_runs(monkeypatch, crash_after=7)
+    with pytest.raises(KeyboardInterrupt):
+        analyzer().run_walk_forward_analysis(PARAM_GRID, checkpoint=path)
+
+    calls = _count_runs(monkeypatch)
+    resumed = analyzer()
+    resumed.run_walk_forward_analysis(PARAM_GRID, checkpoint=path)
+    assert len(calls) == 3 * 5 - 7
+    pd.testing.assert_frame_equal(pd.DataFrame(resumed.walk_forward_results), pd.DataFrame(expected.walk_forward_results))
+    pd.testing.assert_frame_equal(pd.DataFrame(resumed.test_results), pd.DataFrame(expected.test_results))
+
+    # 进程池调度读取同一份日志，不再需要回测
+    scheduled = analyzer()
+    scheduled.run_walk_forward_analysis(PARAM_GRID, workers=2, checkpoint=path)
+    pd.testing.assert_frame_equal(pd.DataFrame(scheduled.walk_forward_results), pd.DataFrame(expected.walk_forward_results))
@@ -0,0 +1,119 @@
+import os
+import tracemalloc
+import backtrader as bt
+import numpy as np
+import pandas as pd
+import pytest
+
+from maru_quant.utils.array_feed import ArrayData, slice_feed
+from maru_quant.utils.dataloader import load_dataframe, read_csv_dataframe, clear_data_cache, slice_dataframe, make_feed
+from maru_quant.utils.parallel import SharedArrays, attach_shared_arrays
+
+def _write_csv(path, closes):
+    df = pd.DataFrame({
+        'datetime': pd.date_range('2024-01-01', periods=len(closes), freq='30min'),
+        'open': closes, 'high': closes, 'low': closes, 'close': closes,
+    })
+    df.to_csv(path, index=False)
+
+def test_data_cache_roundtrip_and_invalidation(tmp_path):
+    data_file = str(tmp_path / 'XAUUSD_30_test.csv')
+    _write_csv(data_file, [1.0, 2.0, 3.0])
+
+    load_dataframe(data_file)
+    cached = load_dataframe(data_file)
+    expected = read_csv_dataframe(data_file)
+    pd.testing.assert_frame_equal(cached, expected)
+    # 缓存命中时是只读的内存映射
+    with pytest.raises(ValueError):
+        cached.iloc[0, 0] = 0.0
+    assert len(os.listdir(tmp_path / 'cache' / 'data')) == 1
+
+    # 源文件变化后缓存自动失效
+    _write_csv(data_file, [4.0, 5.0, 6.0, 7.0])
+    os.utime(data_file, ns=(0, os.stat(data_file).st_mtime_ns + 1))
+    assert load_dataframe(data_file)['close'].tolist() == [4.0, 5.0, 6.0, 7.0]
+    assert len(os.listdir(tmp_path / 'cache' / 'data')) == 1
+
+    clear_data_cache(data_file)
+    assert os.listdir(tmp_path / 'cache' / 'data') == []
+
+def test_data_cache_disabled(tmp_path):
+    data_file = str(tmp_path / 'XAUUSD_30_test.csv')
+    _write_csv(data_file, [1.0, 2.0])
+
+    load_dataframe(data_file, use_cache=False)
+    assert not os.path.exists(tmp_path / 'cache')
+
+def test_slice_dataframe_matches_mask_and_shares_memory(tmp_path):
+    data_file = str(tmp_path / 'XAUUSD_30_test.csv')
+    _write_csv(data_file, [float(i) for i in range(200)])
+    df = load_dataframe(data_file, use_cache=False)
+
+    window = slice_dataframe(df, '2024-01-02', '2024-01-03')
+    start = pd.Timestamp('2024-01-02', tz='UTC')
+    end = pd.Timestamp('2024-01-03', tz='UTC')
+    expected = df[(df.index >= start) & (df.index <= end)]
+    pd.testing.assert_frame_equal(window, expected)
+    assert np.shares_memory(window['close'].to_numpy(), df['close'].to_numpy())
+
+def _feed_lines(feed, runonce=True, **kwargs):
+    cerebro = bt.Cerebro(runonce=runonce, stdstats=False, **kwargs)
+    cerebro.adddata(feed)
+    cerebro.addstrategy(bt.Strategy)
+    cerebro.run()
+    return {name: np.array(getattr(feed.lines, name).array) for name in feed.getlinealiases()}
+
+def test_array_feed_matches_pandas_data(synthetic_df):
+    df = synthetic_df.iloc[:300].copy()
+    # 带秒和微秒的时间戳，检查数值日期逐位相同
+    df.index = df.index + pd.to_timedelta(np.arange(len(df)) * 1234567, unit='us')
+    expected = _feed_lines(bt.feeds.PandasData(dataname=df, timeframe=bt.TimeFrame.Minutes, compression=30))
+
+    feed = make_feed(df, bt.TimeFrame.Minutes, 30)
+    for runonce in (True, False):
+        actual = _feed_lines(feed, runonce=runonce)
+        for name in expected:
+            np.testing.assert_array_equal(actual[name], expected[name])
+    # 多次回测共享同一份数组
+    assert feed.lines.close.array is feed.arrays['close']
+    assert len(feed.arrays['close']) == len(df)
+
+    # exactbars 下逐bar加载；fromdate/todate 截取
+    assert _feed_lines(make_feed(df, bt.TimeFrame.Minutes, 30), exactbars=-1)['close'].tolist() == df['close'].tolist()
+    window = ArrayData(dataname=df, fromdate=df.index[10].to_pydatetime(), todate=df.index[20].to_pydatetime())
+    assert _feed_lines(window)['close'].tolist() == df['close'].iloc[10:21].tolist()
+
+def test_array_feed_does_not_copy_columns():
+    n = 1_000_000
+    index = pd.date_range('2024-01-01', periods=n, freq='30min', tz='UTC')
+    values = np.arange(n, dtype=np.float64)
+    df = pd.DataFrame({name: values + i for i, name in enumerate(('open', 'high', 'low', 'close', 'volume'))}, index=index)
+    column_bytes = n * 8
+
+    tracemalloc.start()
+    try:
+        feed = make_feed(df, bt.TimeFrame.Minutes, 30)
+        window = slice_feed(feed, n // 4, n // 2)
+        with SharedArrays(feed.arrays) as shared:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            attached, handle = attach_shared_arrays(shared.descriptor)
+            worker_feed = ArrayData(arrays=attached, timeframe=bt.TimeFrame.Minutes, compression=30)
+            worker_window = slice_feed(worker_feed, n // 4, n // 2)
+            _, worker_peak = tracemalloc.get_traced_memory()
+            worker_peak -= before
+            assert np.shares_memory(worker_window.arrays['close'], attached['close'])
+            del worker_feed, worker_window, attached
+            handle.close()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # 价格列是 DataFrame 的视图，窗口是视图的切片；只有datetime、缺失的openinterest各分配一列
+    assert np.shares_memory(feed.arrays['close'], df['close'].to_numpy())
+    assert np.shares_memory(window.arrays['close'], feed.arrays['close'])
+    assert feed.p.dataname is None
+    assert peak < 3 * column_bytes
+    # 子进程从共享内存挂载的数据源及其窗口不分配任何列
+    assert worker_peak < column_bytes // 10
@@ -0,0 +1,91 @@
+import multiprocessing
+
+import backtrader as bt
+import pandas as pd
+import pytest
+
+from maru_quant.strategy.trendtracking.breakout import PivotBreakout
+from maru_quant.utils.dataloader import make_feed
+from maru_quant.utils.job_queue import JobQueue, JobQueueClient, QueueWorker, start_queue_server
+from maru_quant.utils.optimizer import GridSearchOptimizer
+from maru_quant.utils.walkforward import WalkForwardAnalyzer
+
+PARAM_GRID = {'take_profit_atr': [2.0, 6.0], 'stop_loss_atr': [1.5, 3.0], 'window': [8]}
+RUNNER_PARAMS = dict(cash=500, commission=0, stake=1, sizer_type='fixed', size_percent=30, tick_type='CFD', use_cache=False)
+WINDOWS = [
+    ('2024-01-01', '2024-01-06', '2024-01-06', '2024-01-11'),
+    ('2024-01-06', '2024-01-12', '2024-01-12', '2024-01-17'),
+]
+
+AUTHKEY = b'test-authkey'
+
+def _run_worker(address):
+    QueueWorker(address, AUTHKEY, poll_interval=0.05).run(idle_timeout=1.0)
+
+@pytest.fixture
+def queue_server():
+    manager = start_queue_server(AUTHKEY, lease_seconds=2.0)
+    workers = [multiprocessing.Process(target=_run_worker, args=(manager.address,)) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    with JobQueueClient(manager.address, AUTHKEY, poll_interval=0.05) as client:
+        yield client
+    for worker in workers:
+        worker.join()
+    manager.shutdown()
+
+def test_queue_matches_local_runs(synthetic_df, tmp_path, monkeypatch, queue_server):
+    feed = make_feed(synthetic_df, bt.TimeFrame.Minutes, 30)
+    expected = GridSearchOptimizer(PivotBreakout, feed, **RUNNER_PARAMS).optimize(PARAM_GRID)
+    queued = GridSearchOptimizer(PivotBreakout, feed, **RUNNER_PARAMS, job_queue=queue_server).optimize(PARAM_GRID)
+    pd.testing.assert_frame_equal(queued, expected)
+
+    data_file = str(tmp_path / 'SYN, 30_2024.csv')
+    synthetic_df.to_csv(data_file)
+    serial = WalkForwardAnalyzer(PivotBreakout, data_file, '', '', **RUNNER_PARAMS)
+    queued = WalkForwardAnalyzer(PivotBreakout, data_file, '', '', **RUNNER_PARAMS, job_queue=queue_server)
+    for wfa in (serial, queued):
+        monkeypatch.setattr(wfa, 'generate_quarterly_windows', lambda *args: WINDOWS)
+        wfa.run_walk_forward_analysis(PARAM_GRID)
+    assert len(serial.walk_forward_results) == len(WINDOWS)
+    pd.testing.assert_frame_equal(pd.DataFrame(serial.walk_forward_results), pd.DataFrame(queued.walk_forward_results))
+
+def test_expired_lease_is_released():
+    now = [0.0]
+    queue = JobQueue(lease_seconds=10, max_attempts=2, clock=lambda: now[0])
+    first, second = queue.submit([{'n': 1}, {'n': 2}])
+
+    assert queue.lease('a') == (first, {'n': 1})
+    now[0] = 8
+    assert queue.heartbeat('a') == 1
+    now[0] = 15
+    # 心跳续租后未到期，其他worker拿到下一个任务
+    assert queue.lease('b') == (second, {'n': 2})
+    assert queue.complete(second, 'b', 'ok')
+
+    # worker a 失联，租约到期后任务转给 b，a 迟到的结果被忽略
+    now[0] = 30
+    assert queue.lease('b') == (first, {'n': 1})
+    assert not queue.complete(first, 'a', 'stale')
+    assert queue.collect([first, second]) == {second: 'ok'}
+
+    # 达到最大租出次数后按失败处理
+    now[0] = 50
+    assert queue.lease('c') is None
+    assert queue.collect([first]) == {first: None}
+    assert queue.stats() == {'pending': 0, 'leased': 0, 'done': 0, 'workers': 1}
+
+def test_pending_futures_fail_when_broker_is_lost(synthetic_df):
+    feed = make_feed(synthetic_df, bt.TimeFrame.Minutes, 30)
+    runner = GridSearchOptimizer(PivotBreakout, feed, **RUNNER_PARAMS).backtest_runner
+    manager = start_queue_server(AUTHKEY)
+    with JobQueueClient(manager.address, AUTHKEY, poll_interval=0.05) as client:
+        # 没有worker时 map 按超时结束
+        with pytest.raises(TimeoutError):
+            client.map(PivotBreakout, feed, runner, [{'window': 8}], timeout=0.3)
+
+        key = client.publish_data(feed.arrays, bt.TimeFrame.Minutes, 30)
+        future = client.submit(PivotBreakout, runner, key, {'window': 8})
+        manager.shutdown()
+        with pytest.raises(ConnectionError):
+            future.result(timeout=10)
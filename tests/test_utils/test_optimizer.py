@@ -0,0 +1,84 @@
+import backtrader as bt
+import pandas as pd
+
+from maru_quant.strategy.trendtracking.breakout import PivotBreakout
+from maru_quant.utils.dataloader import make_feed
+from maru_quant.utils.optimizer import GridSearchOptimizer, SuccessiveHalvingOptimizer, CoarseToFineOptimizer, METRIC_COLUMNS
+from maru_quant.utils.param_grid import ParamGrid
+
+PARAM_GRID = {'take_profit_atr': [2.0, 6.0], 'stop_loss_atr': [1.5, 3.0], 'window': [8]}
+
+def _optimizer(df):
+    feed = make_feed(df, bt.TimeFrame.Minutes, 30)
+    return GridSearchOptimizer(PivotBreakout, feed, cash=500, commission=0, stake=1,
+                               sizer_type='fixed', size_percent=30, tick_type='CFD', use_cache=False)
+
+def test_parallel_matches_serial(synthetic_df):
+    serial = _optimizer(synthetic_df)
+    serial_df = serial.optimize(PARAM_GRID)
+    parallel = _optimizer(synthetic_df)
+    parallel_df = parallel.optimize(PARAM_GRID, workers=2, chunksize=1)
+
+    assert len(serial_df) == 4
+    assert serial_df['total_trade'].sum() > 0
+    pd.testing.assert_frame_equal(serial_df, parallel_df)
+    assert serial.get_best_params() == parallel.get_best_params()
+
+def test_successive_halving_keeps_top_combos(synthetic_df):
+    feed = make_feed(synthetic_df, bt.TimeFrame.Minutes, 30)
+    grid = {'take_profit_atr': [2.0, 4.0, 6.0, 8.0], 'stop_loss_atr': [1.5, 3.0], 'window': [8]}
+    halving = SuccessiveHalvingOptimizer(PivotBreakout, feed, cash=500, commission=0, stake=1,
+                                         sizer_type='fixed', size_percent=30, tick_type='CFD', use_cache=False)
+    df = halving.optimize(grid, eta=2, min_fraction=0.25)
+
+    assert len(df) == 8
+    assert df['data_fraction'].value_counts().to_dict() == {0.25: 4, 0.5: 2, 1.0: 2}
+    assert df['data_fraction'].is_monotonic_decreasing
+
+    # 每轮保留的是上一轮指标最高的组合
+    prefix = _optimizer(synthetic_df.iloc[:200]).optimize(grid)
+    assert set(prefix['take_profit_atr'].head(4) * 10 + prefix['stop_loss_atr'].head(4)) == \
+        set(df.loc[df['data_fraction'] > 0.25, 'take_profit_atr'] * 10 + df.loc[df['data_fraction'] > 0.25, 'stop_loss_atr'])
+
+    # 完整回测的组合与网格搜索结果相同
+    full = _optimizer(synthetic_df).optimize(grid).set_index(['take_profit_atr', 'stop_loss_atr'])
+    for _, row in df[df['data_fraction'] == 1.0].iterrows():
+        assert row['sharpe_ratio'] == full.loc[(row['take_profit_atr'], row['stop_loss_atr']), 'sharpe_ratio']
+    best = halving.get_best_params()
+    assert best == df[df['data_fraction'] == 1.0].iloc[0].drop(METRIC_COLUMNS).to_dict()
+
+def test_coarse_to_fine_refines_around_best(synthetic_df):
+    feed = make_feed(synthetic_df, bt.TimeFrame.Minutes, 30)
+    grid = {'take_profit_atr': [2.0, 6.0, 10.0], 'atr_period': [10, 14, 18], 'window': [8]}
+    refiner = CoarseToFineOptimizer(PivotBreakout, feed, cash=500, commission=0, stake=1,
+                                    sizer_type='fixed', size_percent=30, tick_type='CFD', use_cache=False)
+    df = refiner.optimize(grid, rounds=2, top_n=1)
+
+    coarse = df[df['refine_round'] == 0]
+    assert len(coarse) == 9
+    assert df['refine_round'].max() == 2
+    # 每个组合只回测一次，整数参数保持整数，取值不超出粗网格范围
+    assert not df.duplicated(['take_profit_atr', 'atr_period']).any()
+    assert all(isinstance(v, int) for v in df['atr_period'].tolist())
+    assert df['take_profit_atr'].between(2, 10).all() and df['atr_period'].between(10, 18).all()
+    # 步长 4 -> 2 -> 1，第2轮的组合落在第1轮最佳组合的 ±1 以内
+    first = df[df['refine_round'] == 1].iloc[0]
+    second = df[df['refine_round'] == 2]
+    assert ((second['take_profit_atr'] - first['take_profit_atr']).abs() <= 1).all()
+    assert df['sharpe_ratio'].max() >= coarse['sharpe_ratio'].max()
+    # 远少于同等分辨率的稠密网格（9 x 9 组）
+    assert refiner.dense_combos == 81 and len(df) < 81 / 2
+
+    # 结果与直接回测相同
+    best = refiner.get_best_params()
+    direct = _optimizer(synthetic_df).optimize({k: [v] for k, v in best.items()})
+    assert direct['sharpe_ratio'].iloc[0] == df['sharpe_ratio'].iloc[0]
+
+def test_coarse_to_fine_dense_count_uses_last_run_round(synthetic_df):
+    feed = make_feed(synthetic_df, bt.TimeFrame.Minutes, 30)
+    # 约束去掉所有加密出的组合，第1轮没有运行，稠密网格按粗网格的步长计算
+    grid = ParamGrid({'take_profit_atr': [2.0, 6.0], 'window': [8]}, constraints=['take_profit_atr in (2.0, 6.0)'])
+    refiner = CoarseToFineOptimizer(PivotBreakout, feed, cash=500, commission=0, stake=1,
+                                    sizer_type='fixed', size_percent=30, tick_type='CFD', use_cache=False)
+    df = refiner.optimize(grid, rounds=2, top_n=1)
+    assert (df['refine_round'] == 0).all() and refiner.dense_combos == 2
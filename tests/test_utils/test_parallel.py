@@ -0,0 +1,17 @@
+import numpy as np
+
+from maru_quant.utils.dataloader import make_feed
+from maru_quant.utils.parallel import SharedArrays, attach_shared_arrays
+
+def test_shared_arrays_roundtrip(synthetic_df):
+    feed = make_feed(synthetic_df, None, 30)
+    with SharedArrays(feed.arrays) as shared:
+        attached, handle = attach_shared_arrays(shared.descriptor)
+        assert list(attached) == list(feed.arrays)
+        for name, values in feed.arrays.items():
+            np.testing.assert_array_equal(attached[name], values)
+        # 挂载后是只读视图而不是副本
+        assert not attached['close'].flags.writeable
+        assert np.shares_memory(attached['close'], np.ndarray((len(attached), len(synthetic_df)), dtype=np.float64, buffer=handle.buf))
+        del attached
+        handle.close()
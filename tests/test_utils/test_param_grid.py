@@ -0,0 +1,54 @@
+import backtrader as bt
+import pandas as pd
+import pytest
+
+from maru_quant.strategy.trendtracking.breakout import PivotBreakout
+from maru_quant.utils.dataloader import make_feed
+from maru_quant.utils.optimizer import GridSearchOptimizer, grid_param_list
+from maru_quant.utils.param_grid import ParamGrid
+
+RUNNER_PARAMS = dict(cash=500, commission=0, stake=1, sizer_type='fixed', size_percent=30, tick_type='CFD', use_cache=False)
+
+def test_constraints_and_ignored_params_prune_grid():
+    grid = ParamGrid({
+        'take_profit_atr': [2.0, 6.0, 6],
+        'stop_loss_atr': [1.5, 5.0],
+        'max_hold_bars': [-1, 24, 36],
+        'window': [8, 16],
+    }, strategy_class=PivotBreakout, constraints=[
+        'take_profit_atr >= 0.5 * stop_loss_atr',
+        'window <= max_resists * 4',  # max_resists 不在网格中，取策略默认值5
+    ], ignore_when={'window': 'max_hold_bars == 36'})
+
+    combos = list(grid)
+    expected = [
+        params for params in grid_param_list({'take_profit_atr': [2.0, 6.0], 'stop_loss_atr': [1.5, 5.0],
+                                              'max_hold_bars': [-1, 24, 36], 'window': [8, 16]})
+        if params['take_profit_atr'] >= 0.5 * params['stop_loss_atr']
+        and not (params['max_hold_bars'] == 36 and params['window'] != 8)
+    ]
+    assert combos == expected
+    # 原始 3*2*3*2=36 组：重复的6去掉12组，window被忽略合并4组，止盈过小剪掉5组
+    assert grid.stats == {'total': 36, 'pruned': 5, 'duplicate': 16, 'combos': 15}
+    assert len(grid) == 15 and grid.saved == 21
+
+def test_grid_rejects_unknown_params_and_unsafe_expressions():
+    with pytest.raises(ValueError, match='threshold'):
+        ParamGrid({'threshold': [0], 'window': [16]}, strategy_class=PivotBreakout)
+    with pytest.raises(ValueError):
+        ParamGrid({'window': [16]}, strategy_class=PivotBreakout, constraints=['window > threshold'])
+    with pytest.raises(ValueError):
+        ParamGrid({'window': [16]}, constraints=['__import__("os").getcwd()'])
+    with pytest.raises(ValueError):
+        ParamGrid({'window': [16]}, ignore_when={'atr_period': 'window > 8'})
+
+def test_optimizer_runs_only_remaining_combos(synthetic_df):
+    feed = make_feed(synthetic_df, bt.TimeFrame.Minutes, 30)
+    grid = ParamGrid({'take_profit_atr': [2.0, 6.0], 'stop_loss_atr': [1.5, 5.0], 'window': [8]},
+                     strategy_class=PivotBreakout, constraints=['take_profit_atr >= 0.5 * stop_loss_atr'])
+    results = GridSearchOptimizer(PivotBreakout, feed, **RUNNER_PARAMS).optimize(grid)
+    expected = GridSearchOptimizer(PivotBreakout, feed, **RUNNER_PARAMS).optimize(
+        {'take_profit_atr': [2.0, 6.0], 'stop_loss_atr': [1.5, 5.0], 'window': [8]})
+    expected = expected[expected['take_profit_atr'] >= 0.5 * expected['stop_loss_atr']]
+    assert len(results) == 3
+    pd.testing.assert_frame_equal(results.reset_index(drop=True), expected.reset_index(drop=True))
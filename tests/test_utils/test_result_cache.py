@@ -0,0 +1,80 @@
+import sys
+import datetime
+import importlib
+import backtrader as bt
+import numpy as np
+
+from maru_quant.strategy.trendtracking.breakout import PivotBreakout
+from maru_quant.utils.backtest_runner import BacktestRunner
+from maru_quant.utils.dataloader import make_feed
+from maru_quant.utils.result_cache import ResultCache, CachedResult, get_result_cache, _module_sources
+
+RUNNER_PARAMS = dict(cash=500, commission=0, stake=1, sizer_type='fixed', size_percent=30, tick_type='CFD')
+
+def test_runner_returns_cached_result(synthetic_df):
+    feed = make_feed(synthetic_df, bt.TimeFrame.Minutes, 30)
+    runner = BacktestRunner(**RUNNER_PARAMS)
+    first = runner.run(PivotBreakout, feed, {'window': 8})
+    assert len(get_result_cache()) == 1
+
+    # 同样的数据内容、参数和配置，新建的feed也能命中
+    second = runner.run(PivotBreakout, make_feed(synthetic_df.copy(), bt.TimeFrame.Minutes, 30), {'window': 8})
+    assert second == first
+    assert len(get_result_cache()) == 1
+
+    runner.run(PivotBreakout, feed, {'window': 10})
+    BacktestRunner(**dict(RUNNER_PARAMS, cash=1000)).run(PivotBreakout, feed, {'window': 8})
+    assert len(get_result_cache()) == 3
+
+def test_runner_cache_opt_out(synthetic_df):
+    feed = make_feed(synthetic_df, bt.TimeFrame.Minutes, 30)
+    BacktestRunner(**RUNNER_PARAMS, use_cache=False).run(PivotBreakout, feed, {'window': 8})
+    assert len(get_result_cache()) == 0
+
+def test_eviction_by_age_and_size(tmp_path):
+    cache = ResultCache(str(tmp_path / 'results.db'))
+    for i in range(5):
+        cache.put(f'key{i}', 'S', {'sharpe_ratio': i, 'P/L_ratio': float('inf')})
+    assert cache.get('key4') == {'sharpe_ratio': 4, 'P/L_ratio': float('inf')}
+
+    with cache.db.bind_ctx([CachedResult]):
+        CachedResult.update(created_at=datetime.datetime.now() - datetime.timedelta(days=40)).where(
+            CachedResult.key == 'key0').execute()
+    assert cache.evict(max_age_days=30) == 1
+    assert cache.evict(max_entries=2) == 2
+    assert cache.get('key1') is None and cache.get('key4') is not None
+    assert len(cache) == 2
+
+def test_cache_key_includes_feed_period(synthetic_df):
+    runner = BacktestRunner(**RUNNER_PARAMS)
+    key = runner._cache_key(PivotBreakout, make_feed(synthetic_df, bt.TimeFrame.Minutes, 30), {'window': 8})
+    assert key == runner._cache_key(PivotBreakout, make_feed(synthetic_df, bt.TimeFrame.Minutes, 30), {'window': 8})
+    assert key != runner._cache_key(PivotBreakout, make_feed(synthetic_df, bt.TimeFrame.Minutes, 60), {'window': 8})
+    assert key != runner._cache_key(PivotBreakout, make_feed(synthetic_df, bt.TimeFrame.Days, 30), {'window': 8})
+
+def test_module_sources_are_transitive(tmp_path, monkeypatch):
+    # a 只引用 b，b 引用 c：c 的源码也计入 a 的指纹
+    (tmp_path / 'maru_quant_dep_a.py').write_text('from maru_quant_dep_b import helper\n')
+    (tmp_path / 'maru_quant_dep_b.py').write_text('import maru_quant_dep_c\ndef helper():\n    return maru_quant_dep_c.VALUE\n')
+    (tmp_path / 'maru_quant_dep_c.py').write_text('VALUE = 1\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    for name in ('maru_quant_dep_a', 'maru_quant_dep_b', 'maru_quant_dep_c'):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    importlib.import_module('maru_quant_dep_a')
+
+    sources = _module_sources('maru_quant_dep_a', set())
+    assert sources[-1] == 'VALUE = 1\n'
+    assert len(sources) == 3
+
+def test_cache_write_failure_keeps_result(synthetic_df, monkeypatch):
+    def broken_put(self, key, strategy_name, result):
+        raise RuntimeError('database is locked')
+
+    monkeypatch.setattr(ResultCache, 'put', broken_put)
+    result = BacktestRunner(**RUNNER_PARAMS).run(PivotBreakout, make_feed(synthetic_df, bt.TimeFrame.Minutes, 30), {'window': 8})
+    assert result is not None and result['total_trade'] > 0
+
+def test_numpy_values_roundtrip(tmp_path):
+    cache = ResultCache(str(tmp_path / 'results.db'))
+    cache.put('key', 'S', {'total_trade': np.int64(3), 'sharpe_ratio': np.float64(1.5), 'value': np.array([1.0, 2.0])})
+    assert cache.get('key') == {'total_trade': 3, 'sharpe_ratio': 1.5, 'value': [1.0, 2.0]}
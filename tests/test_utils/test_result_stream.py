@@ -0,0 +1,67 @@
+import os
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+from maru_quant.strategy.trendtracking.breakout import PivotBreakout
+from maru_quant.utils.dataloader import make_feed
+from maru_quant.utils.optimizer import GridSearchOptimizer, StreamingGridSearchOptimizer, select_best_params
+from maru_quant.utils.result_stream import ColumnarResultWriter, TopK, read_columnar
+
+RUNNER_PARAMS = dict(cash=500, commission=0, stake=1, sizer_type='fixed', size_percent=30, tick_type='CFD', use_cache=False)
+PARAM_GRID = {'take_profit_atr': [2.0, 4.0, 6.0], 'stop_loss_atr': [1.5, 3.0], 'window': [6, 8]}
+
+def test_streaming_matches_grid_search(synthetic_df, tmp_path):
+    feed = make_feed(synthetic_df, bt.TimeFrame.Minutes, 30)
+    grid = GridSearchOptimizer(PivotBreakout, feed, **RUNNER_PARAMS)
+    expected = grid.optimize(PARAM_GRID)
+    streaming = StreamingGridSearchOptimizer(PivotBreakout, feed, **RUNNER_PARAMS,
+                                             result_path=str(tmp_path / 'results'), top_k=3, batch_size=5)
+    top = streaming.optimize(PARAM_GRID)
+
+    assert streaming.results == []
+    # 缺失的指标（None）在文件中存为NaN
+    pd.testing.assert_frame_equal(streaming.read_results().fillna(-1), expected.fillna(-1), check_dtype=False)
+    pd.testing.assert_frame_equal(top, expected.head(3).reset_index(drop=True))
+    for metric in ('sharpe_ratio', 'total_return', 'win_rate'):
+        assert streaming.get_best_params(metric) == grid.get_best_params(metric)
+
+def test_top_k_keeps_largest_and_first_ties():
+    rng = np.random.default_rng(0)
+    results = [{'m': float(v), 'i': i} for i, v in enumerate(rng.integers(0, 20, 500))]
+    results[10]['m'] = None
+    results[11]['m'] = float('nan')
+    top = TopK(5, 'm')
+    for result in results:
+        top.push(result)
+
+    valid = [r for r in results if r['m'] is not None and not np.isnan(r['m'])]
+    expected = sorted(valid, key=lambda r: (-r['m'], r['i']))[:5]
+    assert top.results() == expected
+    assert top.best() == expected[0]
+    assert top.best()['i'] == select_best_params(results, 'm')['i']
+
+def test_writer_appends_columns_and_drops_torn_tail(tmp_path):
+    path = str(tmp_path / 'results')
+    with ColumnarResultWriter(path, flush_rows=2) as writer:
+        writer.append({'a': 1, 'b': 'x'})
+        writer.append({'a': 2, 'b': None})
+        writer.append({'a': 3.5, 'b': 'y', 'c': True})
+
+    # 模拟写入中断：列文件比 schema 多出半行
+    with open(os.path.join(path, 'col0.bin'), 'ab') as f:
+        f.write(b'\x00' * 4)
+    with ColumnarResultWriter(path) as writer:
+        assert writer.committed_rows == 3
+        writer.append({'a': 4, 'b': 'x', 'c': False})
+
+    df = read_columnar(path)
+    assert df['a'].tolist() == [1.0, 2.0, 3.5, 4.0]
+    assert [None if pd.isna(v) else v for v in df['b']] == ['x', None, 'y', 'x']
+    assert [None if pd.isna(v) else v for v in df['c']] == [None, None, True, False]
+
+    with ColumnarResultWriter(str(tmp_path / 'ints')) as writer:
+        writer.append({'n': 1})
+        writer.append({'n': 2})
+    assert read_columnar(str(tmp_path / 'ints'))['n'].dtype == np.int64
@@ -0,0 +1,79 @@
+import random
+
+import backtrader as bt
+import numpy as np
+
+from maru_quant.strategy.trendtracking.breakout import PivotBreakout
+from maru_quant.utils import optimizer as optimizer_module
+from maru_quant.utils.dataloader import make_feed
+from maru_quant.utils.optimizer import TPEOptimizer
+from maru_quant.utils.tpe import TPESampler
+
+GRID = {'a': list(range(20)), 'b': [x / 2 for x in range(20)], 'c': ['x', 'y', 'z']}
+
+def _objective(p):
+    # 最优为 a=13, b=2.5, c='y'；只有 (a, b) 都命中时目标值不小于0
+    return -((p['a'] - 13) ** 2 + (p['b'] * 2 - 5) ** 2) + (3 if p['c'] == 'y' else 0)
+
+def test_sampler_beats_random_search():
+    combos = [dict(a=a, b=b, c=c) for a in GRID['a'] for b in GRID['b'] for c in GRID['c']]
+    tpe_best, random_best = [], []
+    for seed in range(5):
+        sampler = TPESampler(GRID, seed=seed)
+        seen = set()
+        for _ in range(80):
+            indices = sampler.ask()
+            assert indices not in seen
+            seen.add(indices)
+            sampler.tell(indices, _objective(sampler.params(indices)))
+        tpe_best.append(max(score for _, score in sampler._observations))
+        random_best.append(max(_objective(p) for p in random.Random(seed).sample(combos, 80)))
+
+    assert min(tpe_best) >= 0
+    assert np.mean(tpe_best) > np.mean(random_best)
+
+def test_sampler_exhausts_small_grid():
+    sampler = TPESampler({'a': [1, 2, 3], 'b': ['x', 'y']}, n_startup=2, seed=1)
+    proposed = []
+    while not sampler.exhausted:
+        indices = sampler.ask()
+        sampler.tell(indices, None)
+        proposed.append(indices)
+    assert len(set(proposed)) == 6 and sampler.ask() is None
+
+def test_optimizer_respects_budget(synthetic_df):
+    feed = make_feed(synthetic_df, bt.TimeFrame.Minutes, 30)
+    optimizer = TPEOptimizer(PivotBreakout, feed, cash=500, commission=0, stake=1,
+                             sizer_type='fixed', size_percent=30, tick_type='CFD', use_cache=False)
+    grid = {'take_profit_atr': [2.0, 4.0, 6.0, 8.0], 'stop_loss_atr': [1.5, 3.0, 4.5], 'window': [6, 8]}
+    df = optimizer.optimize(grid, max_evals=7, batch_size=3, seed=0, n_startup=3)
+
+    assert len(df) == 7
+    assert not df.duplicated(list(grid)).any()
+    history = optimizer.convergence_frame()
+    assert history['evaluations'].tolist() == [3, 6, 7]
+    assert history['best_sharpe_ratio'].iloc[-1] == df['sharpe_ratio'].max()
+    assert history['best_sharpe_ratio'].is_monotonic_increasing
+
+    # 时间预算用完后不再提交新的一批，但至少评估一批
+    assert len(optimizer.optimize(grid, max_seconds=0, batch_size=2, seed=0)) == 7 + 2
+
+def test_parallel_search_uses_one_pool(synthetic_df, monkeypatch):
+    feed = make_feed(synthetic_df, bt.TimeFrame.Minutes, 30)
+    params = dict(cash=500, commission=0, stake=1, sizer_type='fixed', size_percent=30, tick_type='CFD', use_cache=False)
+    grid = {'take_profit_atr': [2.0, 4.0, 6.0, 8.0], 'stop_loss_atr': [1.5, 3.0, 4.5], 'window': [6, 8]}
+    expected = TPEOptimizer(PivotBreakout, feed, **params).optimize(grid, max_evals=6, batch_size=2, seed=0, n_startup=2)
+
+    pools = []
+    worker_pool = optimizer_module.worker_pool
+
+    def counting_pool(*args, **kwargs):
+        pools.append(1)
+        return worker_pool(*args, **kwargs)
+
+    monkeypatch.setattr(optimizer_module, 'worker_pool', counting_pool)
+    optimizer = TPEOptimizer(PivotBreakout, feed, **params)
+    df = optimizer.optimize(grid, workers=2, max_evals=6, batch_size=2, seed=0, n_startup=2)
+    # 三批提议都提交到同一个进程池
+    assert len(pools) == 1 and len(optimizer.convergence_frame()) == 3
+    assert df.reset_index(drop=True).equals(expected.reset_index(drop=True))
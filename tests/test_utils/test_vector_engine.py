@@ -0,0 +1,84 @@
+import backtrader as bt
+import numpy as np
+import pandas as pd
+import pytest
+
+from maru_quant.broker.commission_info import comm_ibkr_XAUUSD
+from maru_quant.strategy.trendtracking.breakout import PivotBreakout, MultiPivotBreakout, SmoothedPivotBreakout
+from maru_quant.utils.backtest_runner import BacktestRunner
+from maru_quant.utils.dataloader import make_feed
+from maru_quant.utils.optimizer import GridSearchOptimizer
+from maru_quant.utils.vector_engine import VectorBacktestRunner, grouped_median
+
+RUNNER_PARAMS = dict(cash=500, commission=0, stake=1, sizer_type='fixed', size_percent=30, tick_type='CFD', use_cache=False)
+
+@pytest.mark.parametrize('strategy_class, params, runner_params', [
+    (PivotBreakout, {'window': 8}, {}),
+    (PivotBreakout, {'window': 5, 'max_hold_bars': 4, 'take_profit_atr': 2, 'stop_loss_atr': 1.5}, {}),
+    (MultiPivotBreakout, {'window': 5, 'max_resists': 8}, {}),
+    (SmoothedPivotBreakout, {'window': 6, 'max_hold_bars': -1}, {}),
+    (PivotBreakout, {'window': 5}, {'sizer_type': 'percents', 'cash': 100000}),
+    # 资金不足时拒单
+    (PivotBreakout, {'window': 5, 'take_profit_atr': 2, 'stop_loss_atr': 3}, {'cash': 11}),
+])
+def test_vector_matches_cerebro(synthetic_df, strategy_class, params, runner_params):
+    runner_params = dict(RUNNER_PARAMS, **runner_params)
+    expected = BacktestRunner(**runner_params).run(strategy_class, make_feed(synthetic_df, bt.TimeFrame.Minutes, 30), params)
+    result = VectorBacktestRunner(**runner_params).run(strategy_class, make_feed(synthetic_df, bt.TimeFrame.Minutes, 30), params)
+
+    assert expected['total_trade'] > 0
+    assert result == pytest.approx(expected, rel=1e-9)
+
+def test_vector_matches_cerebro_with_commission(synthetic_df, monkeypatch):
+    # 胜负统计按扣除佣金后的净盈亏
+    monkeypatch.setattr(comm_ibkr_XAUUSD.p, 'commission', 0.3)
+    feed = make_feed(synthetic_df, bt.TimeFrame.Minutes, 30)
+    expected = BacktestRunner(**RUNNER_PARAMS).run(PivotBreakout, feed, {'window': 5})
+    result = VectorBacktestRunner(**RUNNER_PARAMS).run(PivotBreakout, feed, {'window': 5})
+    assert expected['total_trade'] > 0
+    assert result == pytest.approx(expected, rel=1e-9)
+
+@pytest.mark.parametrize('minutes', [10, 15, 60])
+def test_vector_matches_cerebro_other_timeframes(synthetic_df, minutes):
+    # 夏普率与Cerebro一样按30分钟周期划分收益，而不是逐bar收益
+    df = synthetic_df.copy()
+    df.index = df.index[0] + pd.to_timedelta(np.arange(len(df)) * minutes, unit='min')
+    expected = BacktestRunner(**RUNNER_PARAMS).run(PivotBreakout, make_feed(df, bt.TimeFrame.Minutes, minutes), {'window': 5})
+    result = VectorBacktestRunner(**RUNNER_PARAMS).run(PivotBreakout, make_feed(df, bt.TimeFrame.Minutes, minutes), {'window': 5})
+    assert expected['total_trade'] > 0
+    assert result == pytest.approx(expected, rel=1e-9)
+
+def test_unsupported_strategy_falls_back(synthetic_df):
+    class CustomExit(PivotBreakout):
+        def next(self):
+            super().next()
+
+    runner = VectorBacktestRunner(**RUNNER_PARAMS)
+    feed = make_feed(synthetic_df, bt.TimeFrame.Minutes, 30)
+    assert not runner.supports(CustomExit, feed)
+    assert runner.supports(MultiPivotBreakout, feed)
+    # 未知参数与Cerebro一样导致回测失败
+    assert runner.run(PivotBreakout, feed, {'threshold': 1}) is None
+
+def test_batch_matches_single_runs(synthetic_df):
+    feed = make_feed(synthetic_df, bt.TimeFrame.Minutes, 30)
+    param_list = [{'window': w, 'sma_period': sma, 'take_profit_atr': tp, 'max_hold_bars': hold}
+                  for w in (5, 8) for sma in (10, 20) for tp in (2, 5) for hold in (12, -1)]
+    runner = VectorBacktestRunner(**RUNNER_PARAMS)
+    batch = runner.run_batch(PivotBreakout, feed, param_list)
+    assert batch == [runner.run(PivotBreakout, feed, params) for params in param_list]
+
+    optimizer = GridSearchOptimizer(PivotBreakout, feed, vectorized=True, **RUNNER_PARAMS)
+    df = optimizer.optimize({'window': [5, 8], 'take_profit_atr': [2, 5]})
+    assert len(df) == 4
+
+
+@pytest.mark.parametrize('total', [5, 6, 9])
+def test_grouped_median_counts_fill_values(total):
+    rng = np.random.default_rng(0)
+    counts = np.array([1, 3, 4, 2])
+    values = rng.normal(size=counts.sum())
+    fill = np.array([0.0, 0.5, -1.0, 0.0])
+    expected = [np.median(np.concatenate((row, np.full(total - len(row), f))))
+                for row, f in zip(np.split(values, np.cumsum(counts)[:-1]), fill)]
+    assert grouped_median(values, counts, fill, total, block=8).tolist() == expected
@@ -0,0 +1,53 @@
+import pandas as pd
+
+from maru_quant.strategy.trendtracking.breakout import PivotBreakout
+from maru_quant.utils.walkforward import WalkForwardAnalyzer
+
+PARAM_GRID = {'take_profit_atr': [2.0, 6.0], 'stop_loss_atr': [1.5, 3.0], 'window': [8]}
+
+# 合成数据只有十几天，用按天划分的窗口代替季度窗口
+WINDOWS = [
+    ('2024-01-01', '2024-01-06', '2024-01-06', '2024-01-11'),
+    ('2024-01-02', '2024-01-07', '2024-01-07', '2024-01-12'),
+    ('2024-01-06', '2024-01-12', '2024-01-12', '2024-01-17'),
+]
+
+def _analyzer(data_file, monkeypatch):
+    wfa = WalkForwardAnalyzer(PivotBreakout, data_file, '', '', cash=500, commission=0, stake=1,
+                              sizer_type='fixed', size_percent=30, tick_type='CFD', use_cache=False)
+    monkeypatch.setattr(wfa, 'generate_quarterly_windows', lambda *args: WINDOWS)
+    return wfa
+
+def test_scheduled_matches_serial(synthetic_df, tmp_path, monkeypatch):
+    data_file = str(tmp_path / 'SYN, 30_2024.csv')
+    synthetic_df.to_csv(data_file)
+
+    serial = _analyzer(data_file, monkeypatch)
+    serial.run_walk_forward_analysis(PARAM_GRID)
+    parallel = _analyzer(data_file, monkeypatch)
+    parallel.run_walk_forward_analysis(PARAM_GRID, workers=2)
+
+    assert len(serial.walk_forward_results) == len(WINDOWS)
+    assert [r['best_params'] for r in serial.train_results] == [r['best_params'] for r in parallel.train_results]
+    pd.testing.assert_frame_equal(pd.DataFrame(serial.walk_forward_results), pd.DataFrame(parallel.walk_forward_results))
+    pd.testing.assert_frame_equal(pd.DataFrame(serial.test_results), pd.DataFrame(parallel.test_results))
+
+class Idle(PivotBreakout):
+    """从不开仓，训练期没有可用的夏普率"""
+    def break_signal(self):
+        return False
+
+def test_window_without_best_params_skips_test(synthetic_df, tmp_path, monkeypatch):
+    data_file = str(tmp_path / 'SYN, 30_2024.csv')
+    synthetic_df.to_csv(data_file)
+
+    results = []
+    for workers in (None, 2):
+        wfa = _analyzer(data_file, monkeypatch)
+        wfa.strategy_class = Idle
+        wfa.run_walk_forward_analysis(PARAM_GRID, workers=workers)
+        results.append(wfa)
+
+    for wfa in results:
+        assert [r['best_params'] for r in wfa.train_results] == [{}] * len(WINDOWS)
+        assert wfa.test_results == [] and wfa.walk_forward_results == []